@@ -0,0 +1,308 @@
+"""Headless batch OCR of a whole OCRA project.
+
+For every page with Rects (or for a page range), the page is rendered,
+its Rects are cropped and OCRed, and the result is written as the page's
+transcript. The pages are processed in a pool of worker processes. The
+finished pages are recorded in the project folder so that an interrupted
+run resumes where it stopped. A failing page does not stop the run; its
+error is recorded in the project folder, too, and the page is processed
+again by the next run. The transformed page images are only kept in
+memory, i.e., no page image file is written.
+
+Usage example:
+
+```sh
+python batch_ocr.py path/to/project_folder --first_page 1 --last_page 800 --workers 4
+```
+
+By default, the project's Tesseract settings are used. --ocr_engine and
+--text_layer/--no-text_layer override them for this run only.
+"""
+
+# IMPORTS SECTION #
+## EXTERNAL IMPORTS ##
+import argparse
+import fitz
+import multiprocessing
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from time import perf_counter
+from typing import Callable
+
+## INTERNAL IMPORTS ##
+from ocra import OCRAProject
+from project_store import open_project_store
+from tesseract_engine import OCR_ENGINE_NAMES
+from utils import is_file_existing, json_load, json_write, standardize_folder_path
+
+# GLOBAL VARIABLES SECTION #
+_g_worker_project: OCRAProject | None = None
+"""The worker process's own OCRA project instance."""
+
+
+# WORKER FUNCTIONS SECTION #
+def _init_worker(
+    folder_path: str, ocr_engine: str | None, is_text_layer_used: bool | None
+) -> None:
+    global _g_worker_project
+    _g_worker_project = OCRAProject(
+        cache_memory_budget=256 * 1024**2, cache_disk_budget=0, prefetch_radius=0
+    )
+    _g_worker_project.is_transformed_image_export_active = False
+    # The project's current page is not rendered, as each worker OCRs its own pages
+    _g_worker_project.load_ocra_project(
+        folder_path=folder_path, is_current_page_prepared=False
+    )
+    # The pages themselves are processed in parallel
+    _g_worker_project.tesseract_config.ocr_workers = 1
+    # Overrides of the run are not written into the project
+    if ocr_engine is not None:
+        _g_worker_project.tesseract_config.ocr_engine = ocr_engine
+    if is_text_layer_used is not None:
+        _g_worker_project.tesseract_config.is_text_layer_used = is_text_layer_used
+
+
+def _ocr_page(page: int) -> int:
+    project = _g_worker_project
+    project.current_page = page
+    project.current_image_config = project.get_current_image_config()
+    project.set_current_image_transcript(project.perform_ocr())
+    # A worker OCRs many pages, so that no page's full-DPI Rect crops are kept
+    project.rect_image_store.clear()
+    return page
+
+
+# PUBLIC FUNCTIONS SECTION #
+def format_duration(*, seconds: float) -> str:
+    """Returns the given duration in the format HH:MM:SS.
+
+    Args:
+        seconds (float): The duration in seconds.
+
+    Returns:
+        str: The formatted duration.
+    """
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+def get_batch_failures_file_path(*, folder_path: str) -> str:
+    """Returns the path of the JSON file which maps the pages failed in batch OCR runs to their errors.
+
+    Args:
+        folder_path (str): The OCRA project's folder path.
+
+    Returns:
+        str: The failures file's path.
+    """
+    return f"{standardize_folder_path(folder_path=folder_path)}batch_ocr_failures.json"
+
+
+def get_batch_progress_file_path(*, folder_path: str) -> str:
+    """Returns the path of the JSON file which lists the pages finished by batch OCR runs.
+
+    Args:
+        folder_path (str): The OCRA project's folder path.
+
+    Returns:
+        str: The progress file's path.
+    """
+    return f"{standardize_folder_path(folder_path=folder_path)}batch_ocr_progress.json"
+
+
+def get_pages_with_rects(
+    *, project: OCRAProject, first_page: int, last_page: int
+) -> list[int]:
+    """Returns the numbers of all pages in the given range which have at least one Rect.
+
+    Args:
+        project (OCRAProject): The OCRA project with loaded page index.
+        first_page (int): The range's first page number.
+        last_page (int): The range's last page number (inclusive).
+
+    Returns:
+        list[int]: The page numbers in ascending order.
+    """
+    return [
+        page
+        for page in project.page_index.get_pages_with_rects()
+        if first_page <= page <= last_page
+    ]
+
+
+def run_batch_ocr(
+    *,
+    folder_path: str,
+    first_page: int = 1,
+    last_page: int | None = None,
+    workers: int = 0,
+    is_restarted: bool = False,
+    ocr_engine: str | None = None,
+    is_text_layer_used: bool | None = None,
+    print_function: Callable[[str], None] = print,
+) -> list[int]:
+    """Performs the OCR of all pages with Rects in the given range and writes their transcripts.
+
+    Pages which were finished by an earlier (e.g., interrupted) run are skipped unless
+    is_restarted is true. Failing pages do not stop the run. Their errors are written
+    into the failures file (see get_batch_failures_file_path()), and they are not
+    marked as finished, i.e., the next run processes them again.
+
+    Args:
+        folder_path (str): The OCRA project's folder path.
+        first_page (int, optional): The range's first page number. Defaults to 1.
+        last_page (int | None, optional): The range's last page number (inclusive). If None,
+         the PDF's last page is used. Defaults to None.
+        workers (int, optional): The number of worker processes. If 0, the CPU count is used. Defaults to 0.
+        is_restarted (bool, optional): If true, already finished pages are processed again. Defaults to False.
+        ocr_engine (str | None, optional): The OCR engine (one of OCR_ENGINE_NAMES) of this run. If None,
+         the project's Tesseract setting is used. Defaults to None.
+        is_text_layer_used (bool | None, optional): Whether or not the PDF text layer is used in this run
+         (see TesseractConfig). If None, the project's Tesseract setting is used. Defaults to None.
+        print_function (Callable[[str], None], optional): Receives the progress lines. Defaults to print.
+
+    Returns:
+        list[int]: The page numbers which were successfully processed in this run.
+    """
+    folder_path = standardize_folder_path(folder_path=folder_path)
+    # Only the project's paths and stored data are needed here, i.e., no page is rendered
+    project = OCRAProject(cache_disk_budget=0, prefetch_radius=0)
+    project.folder_path = folder_path
+    project.project_store = open_project_store(folder_path=folder_path)
+    project.page_index.load(project_store=project.project_store)
+    with fitz.open(project.get_project_pdf_file_path()) as pdf_document:
+        page_count = len(pdf_document)
+    if last_page is None:
+        last_page = page_count
+    last_page = min(last_page, page_count)
+
+    progress_file_path = get_batch_progress_file_path(folder_path=folder_path)
+    finished_pages: set[int] = set()
+    if (not is_restarted) and is_file_existing(filepath=progress_file_path):
+        finished_pages = set(json_load(file_path=progress_file_path))
+    failures_file_path = get_batch_failures_file_path(folder_path=folder_path)
+    failed_pages: dict[str, str] = {}
+    if is_file_existing(filepath=failures_file_path):
+        failed_pages = json_load(file_path=failures_file_path)
+    pages = [
+        page
+        for page in get_pages_with_rects(
+            project=project, first_page=first_page, last_page=last_page
+        )
+        if page not in finished_pages
+    ]
+    project.project_store.close()
+    if not pages:
+        print_function("No (unfinished) pages with Rects in the given range.")
+        return []
+
+    workers = workers or os.cpu_count() or 1
+    processed_pages: list[int] = []
+    run_failed_pages: list[int] = []
+    start_time = perf_counter()
+    executor = ProcessPoolExecutor(
+        max_workers=min(workers, len(pages)),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(folder_path, ocr_engine, is_text_layer_used),
+    )
+    try:
+        page_by_future: dict[Future, int] = {
+            executor.submit(_ocr_page, page): page for page in pages
+        }
+        futures = set(page_by_future)
+        while futures:
+            done_futures, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done_futures:
+                page = page_by_future[future]
+                try:
+                    future.result()
+                except Exception as error:
+                    run_failed_pages.append(page)
+                    failed_pages[str(page)] = f"{type(error).__name__}: {error}"
+                    page_status = f"page {page} FAILED ({failed_pages[str(page)]})"
+                else:
+                    processed_pages.append(page)
+                    finished_pages.add(page)
+                    failed_pages.pop(str(page), None)
+                    page_status = f"page {page} done"
+            json_write(file_path=progress_file_path, json_data=sorted(finished_pages))
+            json_write(file_path=failures_file_path, json_data=failed_pages)
+
+            done_count = len(processed_pages) + len(run_failed_pages)
+            elapsed_minutes = (perf_counter() - start_time) / 60
+            pages_per_minute = done_count / elapsed_minutes
+            eta_seconds = (len(pages) - done_count) / pages_per_minute * 60
+            print_function(
+                f"[{done_count:>{len(str(len(pages)))}}/{len(pages)}] "
+                f"{100 * done_count / len(pages):5.1f}% | "
+                f"{pages_per_minute:.1f} pages/min | "
+                f"ETA {format_duration(seconds=eta_seconds)} | "
+                f"{page_status}"
+            )
+        if run_failed_pages:
+            print_function(
+                f"{len(run_failed_pages)} pages failed: "
+                f"{', '.join(str(x) for x in sorted(run_failed_pages))}. "
+                f"See {failures_file_path}; the next run processes them again."
+            )
+    except KeyboardInterrupt:
+        print_function(
+            f"Interrupted after {len(processed_pages)} pages. "
+            "Run the same command again to resume."
+        )
+        raise
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return processed_pages
+
+
+# MAIN ROUTINE SECTION #
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Performs the Tesseract OCR of all pages with Rects of an OCRA project."
+    )
+    parser.add_argument("folder_path", help="The OCRA project's folder.")
+    parser.add_argument("--first_page", type=int, default=1)
+    parser.add_argument(
+        "--last_page", type=int, default=None, help="Defaults to the last PDF page."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Number of worker processes. Defaults to the CPU count.",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Also process the pages which were finished by an earlier run.",
+    )
+    parser.add_argument(
+        "--ocr_engine",
+        choices=OCR_ENGINE_NAMES,
+        default=None,
+        help="The OCR engine of this run. Defaults to the project's Tesseract setting.",
+    )
+    parser.add_argument(
+        "--text_layer",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Whether or not the text of Rects with PDF text is taken from the PDF's "
+        "text layer. Defaults to the project's Tesseract setting.",
+    )
+    args = parser.parse_args()
+
+    try:
+        run_batch_ocr(
+            folder_path=args.folder_path,
+            first_page=args.first_page,
+            last_page=args.last_page,
+            workers=args.workers,
+            is_restarted=args.restart,
+            ocr_engine=args.ocr_engine,
+            is_text_layer_used=args.text_layer,
+        )
+    except KeyboardInterrupt:
+        sys.exit(130)
@@ -0,0 +1,419 @@
+"""Benchmark suite of OCRA's hot paths, i.e., of the page rendering, the Rect crops, the data updates, the page changes and the OCR.
+
+The suite creates a synthetic multi-page PDF (text, vector graphics and an
+embedded scan-like image on each page) and an OCRA project of it. The OCR
+uses a fake Tesseract executable, so that the suite runs without Tesseract.
+Each benchmark is run for a number of rounds, and its minimal and median
+durations (plus e.g. payload sizes) are reported. The results can be saved
+as a JSON baseline, and a later run can be compared against it:
+
+```sh
+python benchmark.py --save benchmark_baseline.json
+python benchmark.py --compare benchmark_baseline.json
+```
+
+The comparison lists every benchmark whose median duration grew by more
+than the tolerance, and then exits with status 1.
+"""
+
+# IMPORTS SECTION #
+## EXTERNAL IMPORTS ##
+import argparse
+import fitz
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from PIL import Image
+from time import perf_counter
+from typing import Any, Callable
+
+## INTERNAL IMPORTS ##
+from ocra import OCRAProject
+from render import PREVIEW_REDUCTIONS
+
+# CONSTANTS SECTION #
+FAKE_TESSERACT_SOURCE: str = """
+import os
+import sys
+
+from PIL import Image
+
+arguments = sys.argv[1:]
+input_path, output_base = arguments[0], arguments[1]
+lang = arguments[arguments.index("-l") + 1] if "-l" in arguments else "eng"
+if "bad" in lang:
+    sys.stderr.write("Failed loading language 'bad'")
+    sys.exit(1)
+if input_path.endswith(".txt"):
+    with open(input_path, encoding="utf-8") as f:
+        image_paths = [x for x in f.read().splitlines() if x]
+else:
+    image_paths = [input_path]
+text = ""
+for image_path in image_paths:
+    with Image.open(image_path) as image:
+        text += f"{lang} {image.width}x{image.height}\\n\\f"
+if output_base == "stdout":
+    sys.stdout.write(text)
+else:
+    with open(f"{output_base}.txt", "w", encoding="utf-8") as f:
+        f.write(text)
+"""
+"""Source of a fake Tesseract executable which 'recognizes' the language and size of each image."""
+BINARIZATION_METHODS: tuple[str, ...] = ("", "global", "otsu", "sauvola")
+"""The benchmarked binarization methods. The empty method stands for no binarization."""
+
+
+# PUBLIC FUNCTIONS SECTION #
+def compare_benchmark_results(
+    *,
+    baseline: dict[str, Any],
+    results: dict[str, Any],
+    tolerance: float = 0.25,
+    min_difference_ms: float = 1.0,
+) -> list[str]:
+    """Returns a line for each benchmark whose median duration regressed against the baseline.
+
+    Benchmarks which only exist in one of both result sets are ignored.
+
+    Args:
+        baseline (dict[str, Any]): The baseline's results, as returned by run_benchmarks().
+        results (dict[str, Any]): The new results, as returned by run_benchmarks().
+        tolerance (float, optional): The allowed relative growth of a median duration.
+         Defaults to 0.25, i.e., +25%.
+        min_difference_ms (float, optional): Growths below this absolute difference in ms
+         are ignored as measurement noise. Defaults to 1.0.
+
+    Returns:
+        list[str]: The regression lines. Is empty if no benchmark regressed.
+    """
+    regressions: list[str] = []
+    for name, result in results["benchmarks"].items():
+        baseline_result = baseline["benchmarks"].get(name)
+        if baseline_result is None:
+            continue
+        baseline_ms = baseline_result["median_ms"]
+        new_ms = result["median_ms"]
+        if (new_ms > baseline_ms * (1 + tolerance)) and (
+            new_ms - baseline_ms >= min_difference_ms
+        ):
+            regressions.append(
+                f"{name}: {baseline_ms:.2f} ms -> {new_ms:.2f} ms "
+                f"(+{100 * (new_ms / baseline_ms - 1):.0f}%)"
+            )
+    return regressions
+
+
+def create_synthetic_pdf(*, file_path: str, page_count: int = 4) -> None:
+    """Creates a PDF whose pages contain text, vector graphics and an embedded scan-like image.
+
+    Args:
+        file_path (str): The PDF's path.
+        page_count (int, optional): The number of pages. Defaults to 4.
+    """
+    scan_image = Image.effect_noise((600, 300), 64).convert("RGB")
+    scan_bytes = io.BytesIO()
+    scan_image.save(scan_bytes, format="PNG")
+
+    document = fitz.open()
+    for page_index in range(page_count):
+        page = document.new_page()
+        for line_index in range(30):
+            page.insert_text(
+                (50, 60 + 14 * line_index),
+                f"Page {page_index + 1}, line {line_index + 1}: The quick brown fox.",
+                fontsize=11,
+            )
+        for shape_index in range(50):
+            page.draw_rect(
+                fitz.Rect(50 + 9 * shape_index, 500, 55 + 9 * shape_index, 540),
+                color=(0, 0, 0),
+                width=0.5,
+            )
+        page.insert_image(fitz.Rect(50, 560, 550, 810), stream=scan_bytes.getvalue())
+    document.save(file_path)
+
+
+def run_benchmark(
+    *,
+    function: Callable[[], Any],
+    rounds: int,
+    setup: Callable[[], None] | None = None,
+) -> dict[str, Any]:
+    """Runs the given function for the given number of rounds and returns its timing statistics.
+
+    Args:
+        function (Callable[[], Any]): The benchmarked function.
+        rounds (int): The number of rounds.
+        setup (Callable[[], None] | None, optional): If given, it is called (untimed) before
+         each round, e.g. for clearing caches. Defaults to None.
+
+    Returns:
+        dict[str, Any]: {"rounds", "min_ms", "median_ms"}
+    """
+    durations_ms: list[float] = []
+    for _ in range(rounds):
+        if setup is not None:
+            setup()
+        start_time = perf_counter()
+        function()
+        durations_ms.append(1000 * (perf_counter() - start_time))
+    return {
+        "rounds": rounds,
+        "min_ms": min(durations_ms),
+        "median_ms": statistics.median(durations_ms),
+    }
+
+
+def run_benchmarks(
+    *,
+    folder_path: str,
+    rounds: int = 5,
+    dpis: tuple[int, ...] = (150, 300),
+    rotations: tuple[int, ...] = (0, 90, 3),
+    rect_count: int = 12,
+    print_function: Callable[[str], None] = print,
+) -> dict[str, Any]:
+    """Runs all benchmarks on a new synthetic OCRA project in the given folder.
+
+    Args:
+        folder_path (str): The folder of the synthetic PDF and project.
+        rounds (int, optional): The number of rounds of each benchmark. Defaults to 5.
+        dpis (tuple[int, ...], optional): The benchmarked DPIs. Defaults to (150, 300).
+        rotations (tuple[int, ...], optional): The benchmarked rotations. Defaults to (0, 90, 3).
+        rect_count (int, optional): The number of Rects of the cropped and OCRed page. Defaults to 12.
+        print_function (Callable[[str], None], optional): Receives a line for each finished
+         benchmark. Defaults to print.
+
+    Returns:
+        dict[str, Any]: {"metadata": {...}, "benchmarks": {benchmark name: statistics}}
+    """
+    pdf_file_path = os.path.join(folder_path, "benchmark.pdf")
+    create_synthetic_pdf(file_path=pdf_file_path)
+    tesseract_path = write_fake_tesseract(
+        file_path=os.path.join(folder_path, "tesseract")
+    )
+
+    project = OCRAProject(cache_disk_budget=0, prefetch_radius=0)
+    project.create_project_from_pdf(
+        pdf_file_path=pdf_file_path, folder_path=os.path.join(folder_path, "project")
+    )
+    project.change_tesseract_path(tesseract_path=tesseract_path)
+    benchmarks: dict[str, dict[str, Any]] = {}
+
+    def add_result(name: str, result: dict[str, Any]) -> None:
+        benchmarks[name] = result
+        print_function(
+            f"{name}: median {result['median_ms']:.2f} ms, min {result['min_ms']:.2f} ms"
+            + (
+                f", {result['payload_bytes']} bytes"
+                if "payload_bytes" in result
+                else ""
+            )
+        )
+
+    def clear_image_caches() -> None:
+        project.image_writer.flush()
+        # Written page images would otherwise be loaded instead of rendered
+        transformed_images_path = project.get_transformed_images_path()
+        for file_name in os.listdir(transformed_images_path):
+            os.remove(os.path.join(transformed_images_path, file_name))
+        project.image_cache.clear()
+        project.display_list_cache.clear()
+        project.tile_cache.clear()
+        project.written_image_cache_keys.clear()
+        project.current_transformed_image_page = 0
+        project.rect_image_store.clear()
+        with project.encoded_images_lock:
+            project.encoded_images.clear()
+
+    # Rendering (cold, i.e., without cached stages)
+    for dpi in dpis:
+        for rotation in rotations:
+            for binarization_method in BINARIZATION_METHODS:
+                project.current_image_config.dpi = dpi
+                project.current_image_config.rotation = rotation
+                project.current_image_config.is_binarized = binarization_method != ""
+                project.current_image_config.binarization_method = (
+                    binarization_method or "global"
+                )
+                add_result(
+                    f"transform_current_image[dpi={dpi},rotation={rotation},"
+                    f"binarization={binarization_method or 'none'}]",
+                    run_benchmark(
+                        function=project.transform_current_image,
+                        rounds=rounds,
+                        setup=clear_image_caches,
+                    ),
+                )
+
+    # Rect crops, data updates and the OCR on the largest DPI's image
+    project.current_image_config.rotation = 0
+    project.current_image_config.is_binarized = False
+    project.write_current_image_config()
+    project.transform_current_image()
+    width, height = project.get_current_transformed_image().size
+    project.set_changed_rects_from_json(
+        rects_json=[
+            {
+                "x": (rect_index % 3) * width // 3,
+                "y": (rect_index // 3) * height // (rect_count // 3 + 1),
+                "w": width // 4,
+                "h": height // (rect_count + 2),
+                "language_state": "1",
+            }
+            for rect_index in range(rect_count)
+        ]
+    )
+    add_result(
+        "create_rect_images",
+        run_benchmark(
+            function=project.create_rect_images,
+            rounds=rounds,
+            setup=project.rect_image_store.clear,
+        ),
+    )
+    payload = json.dumps(project.data_update_json())
+    add_result(
+        "data_update_json",
+        run_benchmark(
+            function=lambda: json.dumps(project.data_update_json()), rounds=rounds
+        )
+        | {"payload_bytes": len(payload.encode("utf-8"))},
+    )
+
+    def clear_encoded_images() -> None:
+        with project.encoded_images_lock:
+            project.encoded_images.clear()
+
+    for reduction in PREVIEW_REDUCTIONS:
+        add_result(
+            f"encode_preview[reduction={reduction}]",
+            run_benchmark(
+                function=lambda: project.get_current_image_preview(reduction=reduction),
+                rounds=rounds,
+                setup=clear_encoded_images,
+            )
+            | {
+                "payload_bytes": len(
+                    project.get_current_image_preview(reduction=reduction)[0]
+                )
+            },
+        )
+    add_result(
+        "perform_ocr", run_benchmark(function=project.perform_ocr, rounds=rounds)
+    )
+
+    # Page changes between two pages with the same image settings, with and without
+    # rendered pages in the image cache
+    dpi = project.current_image_config.dpi
+    project.move_to_page(new_page=2)
+    project.current_image_config.dpi = dpi
+    project.write_current_image_config()
+    pages = iter(range(10**9))
+
+    def move_to_next_page() -> None:
+        project.move_to_page(new_page=1 + next(pages) % 2)
+
+    add_result(
+        "move_to_page[cold]",
+        run_benchmark(
+            function=move_to_next_page, rounds=rounds, setup=clear_image_caches
+        ),
+    )
+    move_to_next_page()
+    move_to_next_page()
+    add_result(
+        "move_to_page[cached]",
+        run_benchmark(function=move_to_next_page, rounds=rounds),
+    )
+
+    project.image_writer.flush()
+    project.close_project_store()
+    project.release_pdf_document()
+    return {
+        "metadata": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "rounds": rounds,
+        },
+        "benchmarks": benchmarks,
+    }
+
+
+def write_fake_tesseract(*, file_path: str) -> str:
+    """Writes the fake Tesseract executable (see FAKE_TESSERACT_SOURCE) at the given path.
+
+    On Windows, where scripts cannot be run through a shebang line, the source is written
+    as "{file_path}.py" and is run by the current Python interpreter through the batch
+    file "{file_path}.cmd".
+
+    Args:
+        file_path (str): The executable's path without file extension.
+
+    Returns:
+        str: The path of the executable, i.e., the Tesseract path to be used.
+    """
+    if os.name == "nt":
+        with open(f"{file_path}.py", "w", encoding="utf-8") as f:
+            f.write(FAKE_TESSERACT_SOURCE)
+        with open(f"{file_path}.cmd", "w", encoding="utf-8") as f:
+            f.write(f'@"{sys.executable}" "{file_path}.py" %*\n')
+        return f"{file_path}.cmd"
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(f"#!{sys.executable}\n{FAKE_TESSERACT_SOURCE}")
+    os.chmod(file_path, 0o755)
+    return file_path
+
+
+# MAIN ROUTINE SECTION #
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Runs OCRA's hot path benchmarks on a synthetic PDF."
+    )
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--dpis", type=int, nargs="+", default=[150, 300])
+    parser.add_argument("--rotations", type=int, nargs="+", default=[0, 90, 3])
+    parser.add_argument(
+        "--save", default=None, help="Saves the results as JSON baseline."
+    )
+    parser.add_argument(
+        "--compare", default=None, help="Compares the results with this JSON baseline."
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed relative growth of a median duration. Defaults to 0.25.",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="ocra_benchmark_") as temp_folder_path:
+        benchmark_results = run_benchmarks(
+            folder_path=temp_folder_path,
+            rounds=args.rounds,
+            dpis=tuple(args.dpis),
+            rotations=tuple(args.rotations),
+        )
+    if args.save is not None:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(benchmark_results, f, indent=4)
+    if args.compare is not None:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline_results = json.load(f)
+        regression_lines = compare_benchmark_results(
+            baseline=baseline_results,
+            results=benchmark_results,
+            tolerance=args.tolerance,
+        )
+        if regression_lines:
+            print("\nRegressions against the baseline:")
+            print("\n".join(regression_lines))
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
@@ -0,0 +1,85 @@
+"""Coalescing of bursts of submitted values, e.g. of image config changes.
+
+While a value of a key is processed, newer values of the same key only
+replace each other. After the processing, only the latest of them is
+processed, i.e., all values in between are dropped as superseded.
+"""
+
+# IMPORTS SECTION #
+## EXTERNAL IMPORTS ##
+import threading
+from typing import Any, Callable, Hashable
+
+
+# CLASS DEFINITIONS SECTION #
+class LatestValueCoalescer:
+    """Processes only the latest submitted value per key with the given function.
+
+    The processing of a key is started by the submit() call which found the key idle.
+    Submits while the key is processed (or its processing is started) return at once.
+    """
+
+    def __init__(
+        self,
+        *,
+        function: Callable[[Hashable, Any], None],
+        start: Callable[[Callable[[], None]], Any] | None = None,
+    ):
+        """Start-up of the pending value storage.
+
+        Args:
+            function (Callable[[Hashable, Any], None]): Processes a key's value.
+            start (Callable[[Callable[[], None]], Any] | None, optional): Starts the given
+             processing of a key, e.g. by submitting it as a background job. If None, the
+             processing runs in the thread of the submit() call. Defaults to None.
+        """
+        self._function = function
+        self._start = start
+        self._lock = threading.Lock()
+        self._pending: dict[Hashable, Any] = {}
+        self._processed_keys: set[Hashable] = set()
+
+    def _process(self, key: Hashable) -> None:
+        try:
+            while True:
+                with self._lock:
+                    if key not in self._pending:
+                        self._processed_keys.discard(key)
+                        return
+                    value = self._pending.pop(key)
+                self._function(key, value)
+        except BaseException:
+            with self._lock:
+                self._processed_keys.discard(key)
+            raise
+
+    def is_superseded(self, *, key: Hashable) -> bool:
+        """Returns whether or not a newer value of the given key waits for its processing.
+
+        The processing function can use this to discard the result of an outdated value.
+
+        Args:
+            key (Hashable): The key.
+
+        Returns:
+            bool: Is true if a newer value is pending.
+        """
+        with self._lock:
+            return key in self._pending
+
+    def submit(self, *, key: Hashable, value: Any) -> None:
+        """Submits the given value. It is processed unless a newer value of its key is submitted first.
+
+        Args:
+            key (Hashable): The value's key.
+            value (Any): The value.
+        """
+        with self._lock:
+            self._pending[key] = value
+            if key in self._processed_keys:
+                return
+            self._processed_keys.add(key)
+        if self._start is None:
+            self._process(key)
+        else:
+            self._start(lambda: self._process(key))
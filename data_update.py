@@ -0,0 +1,55 @@
+"""Tracking of the data update parts which the browser already knows.
+
+Instead of sending the full data (including the page image's version, the
+transcript and all Rects) after each change, the server only emits the
+parts which differ from the last ones sent (or received from the browser).
+"""
+
+# IMPORTS SECTION #
+## EXTERNAL IMPORTS ##
+import threading
+from typing import Any
+
+
+# CLASS DEFINITIONS SECTION #
+class DataUpdateTracker:
+    """Remembers the last known state of each data update part on the browser's side."""
+
+    def __init__(self):
+        """Start-up of the (empty) known parts storage."""
+        self._lock = threading.Lock()
+        self._known_parts: dict[str, dict[str, Any]] = {}
+
+    def get_changed_parts(
+        self, *, parts: dict[str, dict[str, Any]]
+    ) -> dict[str, dict[str, Any]]:
+        """Returns all given parts which differ from the known ones, and marks them as known.
+
+        Args:
+            parts (dict[str, dict[str, Any]]): The current parts by their names.
+
+        Returns:
+            dict[str, dict[str, Any]]: The changed parts by their names, in the given order.
+        """
+        with self._lock:
+            changed_parts = {
+                part_name: part
+                for part_name, part in parts.items()
+                if self._known_parts.get(part_name) != part
+            }
+            self._known_parts |= changed_parts
+        return changed_parts
+
+    def mark_as_known(self, *, parts: dict[str, dict[str, Any]]) -> None:
+        """Marks the given parts as known, e.g. because they were sent by the browser itself.
+
+        Args:
+            parts (dict[str, dict[str, Any]]): The parts by their names.
+        """
+        with self._lock:
+            self._known_parts |= parts
+
+    def reset(self) -> None:
+        """Forgets all known parts so that the next update contains all parts."""
+        with self._lock:
+            self._known_parts.clear()
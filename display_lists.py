@@ -0,0 +1,114 @@
+"""Bounded cache of parsed PDF pages and their mupdf display lists.
+
+Rasterizing a page directly re-interprets its content stream (including
+e.g. vector paths, fonts and JBIG2 images) on each render. A display list
+records the interpreted page once, so that re-rendering the page with
+another DPI or after a changed image setting only replays the list.
+"""
+
+# IMPORTS SECTION #
+## EXTERNAL IMPORTS ##
+import fitz
+import threading
+from collections import OrderedDict
+
+## INTERNAL IMPORTS ##
+from metrics import g_cache_requests
+
+
+# PUBLIC FUNCTIONS SECTION #
+def estimate_display_list_size(*, document: fitz.Document, page: fitz.Page) -> int:
+    """Returns an estimate of the memory which the given page's display list keeps alive.
+
+    mupdf does not report a display list's size. As the list consists of the
+    interpreted drawing commands and references to the page's images, the sizes of the
+    page's (decompressed) content stream and of its (compressed) image streams are used.
+
+    Args:
+        document (fitz.Document): The page's PDF document.
+        page (fitz.Page): The PDF page.
+
+    Returns:
+        int: The estimated size in bytes.
+    """
+    size = len(page.read_contents())
+    for image_info in page.get_images():
+        size += len(document.xref_stream_raw(image_info[0]) or b"")
+    return size
+
+
+# CLASS DEFINITIONS SECTION #
+class DisplayListCache:
+    """LRU cache of the parsed pages and display lists of one PDF document, with a memory budget.
+
+    The cached display lists belong to the document which they were created from, so that
+    the cache has to be cleared before this document is closed or replaced.
+    """
+
+    def __init__(self, *, memory_budget: int):
+        """Start-up of the (empty) cache.
+
+        Args:
+            memory_budget (int): The maximal estimated size of all display lists in bytes
+             (see estimate_display_list_size()). The most recently used display list is
+             always kept, even if it alone exceeds the budget. If 0, nothing is cached.
+        """
+        self.memory_budget: int = memory_budget
+        """The maximal estimated size of all display lists in bytes."""
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[int, tuple[fitz.Page, fitz.DisplayList, int]] = (
+            OrderedDict()
+        )
+        self._size = 0
+
+    def clear(self) -> None:
+        """Removes all cached pages and display lists."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def get(self, *, document: fitz.Document, page: int) -> fitz.DisplayList:
+        """Returns the display list of the given page, which is created if it is not cached yet.
+
+        Args:
+            document (fitz.Document): The PDF document of the cache.
+            page (int): The page's number.
+
+        Returns:
+            fitz.DisplayList: The page's display list.
+        """
+        with self._lock:
+            entry = self._entries.get(page)
+            if entry is not None:
+                self._entries.move_to_end(page)
+                g_cache_requests.inc(cache="display_list", result="memory_hit")
+                return entry[1]
+            g_cache_requests.inc(cache="display_list", result="miss")
+            pdf_page = document.load_page(page - 1)
+            display_list = pdf_page.get_displaylist()
+            if self.memory_budget <= 0:
+                return display_list
+            size = estimate_display_list_size(document=document, page=pdf_page)
+            self._entries[page] = (pdf_page, display_list, size)
+            self._size += size
+            while (self._size > self.memory_budget) and (len(self._entries) > 1):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+            return display_list
+
+    def get_memory_size(self) -> int:
+        """Returns the summed estimated size of all cached display lists.
+
+        Returns:
+            int: The size in bytes.
+        """
+        return self._size
+
+    def get_pages(self) -> list[int]:
+        """Returns the numbers of all pages whose display list is cached.
+
+        Returns:
+            list[int]: The page numbers, from the least to the most recently used.
+        """
+        with self._lock:
+            return list(self._entries)
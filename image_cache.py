@@ -0,0 +1,236 @@
+"""LRU cache for rendered and transformed PDF page images.
+
+The cache has a memory tier and an optional disk tier, each with its
+own byte budget. Images which are evicted from the memory tier are
+moved to the disk tier, and images which are evicted from the disk
+tier are deleted.
+"""
+
+# IMPORTS SECTION #
+## EXTERNAL IMPORTS ##
+import os
+import threading
+from collections import OrderedDict
+from PIL import Image
+from typing import Hashable
+
+## INTERNAL IMPORTS ##
+from metrics import g_cache_requests
+from render import BackgroundImageWriter
+from utils import ensure_folder_existence, standardize_folder_path
+
+
+# PUBLIC FUNCTIONS SECTION #
+def get_image_cache_key(
+    *,
+    page: int,
+    dpi: int,
+    rotation: int,
+    is_binarized: bool,
+    binarization_method: str,
+    binarization_threshold: int,
+) -> tuple[int, int, int, bool, str, int]:
+    """Returns the cache key of a transformed page image with the given settings.
+
+    The binarization method is only part of the key if the image is binarized, and
+    the threshold only if the image is binarized with the "global" method.
+
+    Args:
+        page (int): The page's number.
+        dpi (int): The DPI resolution.
+        rotation (int): The rotation in degrees (°).
+        is_binarized (bool): Whether or not the image is binarized.
+        binarization_method (str): The binarization method, see binarization.py.
+        binarization_threshold (int): The binarization threshold.
+
+    Returns:
+        tuple[int, int, int, bool, str, int]: (page, dpi, rotation, is_binarized,
+         binarization_method, binarization_threshold)
+    """
+    if not is_binarized:
+        binarization_method = ""
+    return (
+        page,
+        dpi,
+        rotation % 360,
+        is_binarized,
+        binarization_method,
+        binarization_threshold if binarization_method == "global" else 0,
+    )
+
+
+def get_image_size_in_bytes(*, image: Image.Image) -> int:
+    """Returns the (approximate) size of the given image in memory.
+
+    Args:
+        image (Image.Image): The image.
+
+    Returns:
+        int: The image's size in bytes. Multi-band images use 4 bytes per pixel in Pillow.
+    """
+    bytes_per_pixel = 1 if len(image.getbands()) == 1 else 4
+    return image.width * image.height * bytes_per_pixel
+
+
+# CLASS DEFINITIONS SECTION #
+class PageImageCache:
+    """Thread-safe two-tier (memory and disk) LRU cache of page images.
+
+    Keys are arbitrary hashable tuples, e.g. (page, dpi) for base rasterizations,
+    (page, dpi, rotation) for rotated rasterizations and (page, dpi, rotation,
+    is_binarized, binarization_method, binarization_threshold) for transformed images.
+    """
+
+    def __init__(self, *, memory_budget: int, disk_budget: int):
+        """Start-up of the cache tiers.
+
+        Args:
+            memory_budget (int): The maximal summed size of all images in memory in bytes.
+            disk_budget (int): The maximal summed size of all images on disk in bytes. The
+             uncompressed image size is used as an upper bound of an image file's size.
+        """
+        self.memory_budget: int = memory_budget
+        """The maximal summed size of all images in memory in bytes."""
+        self.disk_budget: int = disk_budget
+        """The maximal summed (uncompressed) size of all images on disk in bytes."""
+        self.disk_folder_path: str | None = None
+        """The disk tier's folder. If None, the disk tier is inactive."""
+        self.hits: int = 0
+        """Number of successful lookups since start-up."""
+        self.misses: int = 0
+        """Number of unsuccessful lookups since start-up."""
+        self._lock = threading.RLock()
+        self._memory: OrderedDict[Hashable, tuple[Image.Image, int]] = OrderedDict()
+        self._memory_size = 0
+        self._disk: OrderedDict[Hashable, tuple[str, int]] = OrderedDict()
+        self._disk_size = 0
+        self._disk_counter = 0
+        self._writer = BackgroundImageWriter()
+
+    def _evict_disk(self) -> None:
+        while self._disk and (self._disk_size > self.disk_budget):
+            _, (path, size) = self._disk.popitem(last=False)
+            self._disk_size -= size
+            self._remove_file(path)
+
+    def _remove_file(self, path: str) -> None:
+        if (not self._writer.discard(path)) and os.path.isfile(path):
+            os.remove(path)
+
+    def _evict_memory(self) -> None:
+        while self._memory and (self._memory_size > self.memory_budget):
+            key, (image, size) = self._memory.popitem(last=False)
+            self._memory_size -= size
+            if (self.disk_folder_path is None) or (size > self.disk_budget):
+                continue
+            self._disk_counter += 1
+            path = f"{self.disk_folder_path}{self._disk_counter}.png"
+            self._writer.schedule(path=path, image=image)
+            self._disk[key] = (path, size)
+            self._disk_size += size
+            self._evict_disk()
+
+    def clear(self) -> None:
+        """Removes all images from both cache tiers."""
+        with self._lock:
+            for path, _ in self._disk.values():
+                self._remove_file(path)
+            self._memory.clear()
+            self._disk.clear()
+            self._memory_size = 0
+            self._disk_size = 0
+
+    def contains(self, key: Hashable) -> bool:
+        """Checks if an image is cached under the given key without marking it as used.
+
+        Args:
+            key (Hashable): The image's key.
+
+        Returns:
+            bool: Is true if the image is cached in either tier.
+        """
+        with self._lock:
+            return (key in self._memory) or (key in self._disk)
+
+    def get(self, key: Hashable) -> Image.Image | None:
+        """Returns the cached image of the given key and marks it as recently used.
+
+        Images from the disk tier are loaded and moved back into the memory tier.
+
+        Args:
+            key (Hashable): The image's key.
+
+        Returns:
+            Image.Image | None: The cached image or None if it is not cached.
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                g_cache_requests.inc(cache="page_image", result="memory_hit")
+                return self._memory[key][0]
+            if key not in self._disk:
+                self.misses += 1
+                g_cache_requests.inc(cache="page_image", result="miss")
+                return None
+            path, size = self._disk.pop(key)
+            self._disk_size -= size
+            image = self._writer.get_pending(path)
+            if image is None:
+                with Image.open(path) as file_image:
+                    file_image.load()
+                    image = file_image.copy()
+            self._remove_file(path)
+            self.hits += 1
+            g_cache_requests.inc(cache="page_image", result="disk_hit")
+            self.put(key, image)
+            return image
+
+    def get_memory_size(self) -> int:
+        """Returns the summed size of all images in the memory tier.
+
+        Returns:
+            int: The memory tier's size in bytes.
+        """
+        return self._memory_size
+
+    def put(self, key: Hashable, image: Image.Image) -> None:
+        """Stores the given image under the given key in the memory tier.
+
+        An older image of the key in the disk tier is removed, so that it is never returned.
+
+        Args:
+            key (Hashable): The image's key.
+            image (Image.Image): The image.
+        """
+        size = get_image_size_in_bytes(image=image)
+        with self._lock:
+            if key in self._memory:
+                self._memory_size -= self._memory.pop(key)[1]
+            if key in self._disk:
+                path, disk_size = self._disk.pop(key)
+                self._disk_size -= disk_size
+                self._remove_file(path)
+            self._memory[key] = (image, size)
+            self._memory_size += size
+            self._evict_memory()
+
+    def set_disk_folder_path(self, *, folder_path: str | None) -> None:
+        """Sets the disk tier's folder. All cached images are removed.
+
+        Already existing files in the folder are deleted as they cannot be associated with keys.
+
+        Args:
+            folder_path (str | None): The disk tier's folder. If None, the disk tier is deactivated.
+        """
+        self.clear()
+        with self._lock:
+            if folder_path is None:
+                self.disk_folder_path = None
+                return
+            folder_path = standardize_folder_path(folder_path=folder_path)
+            ensure_folder_existence(folder_path=folder_path)
+            for filename in os.listdir(folder_path):
+                if filename.endswith(".png"):
+                    os.remove(f"{folder_path}{filename}")
+            self.disk_folder_path = folder_path
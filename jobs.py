@@ -0,0 +1,147 @@
+"""Background execution of OCRA's long-running jobs (rendering, page moves and OCR).
+
+The server's Socket.IO handlers only submit jobs and return at once, so that
+the server stays responsive, e.g. for Rect edits, while a long OCR runs.
+Each job gets a job ID and its lifecycle is reported through the given
+emit function with the following events:
+* "job_started": {"job_id", "kind"}
+* "job_progress": {"job_id", "kind", "progress" (0.0 to 1.0), "message"}
+* "job_done": {"job_id", "kind", "is_successful", "error"}
+"""
+
+# IMPORTS SECTION #
+## EXTERNAL IMPORTS ##
+import threading
+import traceback
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+## INTERNAL IMPORTS ##
+from metrics import g_job_seconds, g_profiler
+
+# TYPE ALIASES SECTION #
+ProgressCallback = Callable[[float, str], None]
+"""Receives a job's progress (0.0 to 1.0) and a short progress message."""
+
+
+# CLASS DEFINITIONS SECTION #
+class JobExecutor:
+    """Runs submitted jobs in a worker thread pool and reports their lifecycle.
+
+    With the default of one worker, the jobs run one after another in their submission
+    order. This keeps jobs which change the same OCRA project (e.g. a page move after an
+    OCR) consistent.
+    """
+
+    def __init__(
+        self, *, emit: Callable[[str, dict[str, Any]], None], max_workers: int = 1
+    ):
+        """Start-up of the worker thread pool.
+
+        Args:
+            emit (Callable[[str, dict[str, Any]], None]): Sends an event with its data, e.g.
+             to the browser.
+            max_workers (int, optional): The number of concurrently running jobs. Defaults to 1.
+        """
+        self._emit = emit
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ocra_job"
+        )
+        self._lock = threading.Lock()
+        self._futures: list[Future] = []
+
+    def _run(
+        self,
+        job_id: str,
+        kind: str,
+        function: Callable[[ProgressCallback], Any],
+        on_done: Callable[[Any], None] | None,
+    ) -> None:
+        def report_progress(progress: float, message: str) -> None:
+            self._emit(
+                "job_progress",
+                {
+                    "job_id": job_id,
+                    "kind": kind,
+                    "progress": progress,
+                    "message": message,
+                },
+            )
+
+        self._emit("job_started", {"job_id": job_id, "kind": kind})
+        error = ""
+        try:
+            with g_job_seconds.time(kind=kind), g_profiler.profile(f"job_{kind}"):
+                result = function(report_progress)
+            if on_done is not None:
+                on_done(result)
+        except Exception as exception:
+            traceback.print_exc()
+            error = f"{type(exception).__name__}: {exception}"
+        self._emit(
+            "job_done",
+            {
+                "job_id": job_id,
+                "kind": kind,
+                "is_successful": not error,
+                "error": error,
+            },
+        )
+
+    def flush(self) -> None:
+        """Blocks until all submitted jobs are done."""
+        while True:
+            with self._lock:
+                futures = self._futures
+                self._futures = []
+            if not futures:
+                return
+            for future in futures:
+                future.result()
+
+    def is_idle(self) -> bool:
+        """Returns whether or not no submitted job is waiting or running.
+
+        Returns:
+            bool: Is true if all submitted jobs are done.
+        """
+        with self._lock:
+            return all(future.done() for future in self._futures)
+
+    def shutdown(self, *, wait: bool = False) -> None:
+        """Cancels all waiting jobs and stops the worker threads after their current jobs are done.
+
+        Args:
+            wait (bool, optional): If true, it blocks until the current jobs are done, e.g.
+             before the data which they change is closed. Defaults to False.
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def submit(
+        self,
+        *,
+        kind: str,
+        function: Callable[[ProgressCallback], Any],
+        on_done: Callable[[Any], None] | None = None,
+    ) -> str:
+        """Submits the given job.
+
+        Args:
+            kind (str): The job's kind, e.g. "ocr", which is part of all its events.
+            function (Callable[[ProgressCallback], Any]): The job itself. It gets a
+             progress callback.
+            on_done (Callable[[Any], None] | None, optional): If given, it is called with
+             the job function's result in the job's thread, before "job_done" is emitted.
+             Defaults to None.
+
+        Returns:
+            str: The job's ID.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._futures = [x for x in self._futures if not x.done()]
+            self._futures.append(
+                self._executor.submit(self._run, job_id, kind, function, on_done)
+            )
+        return job_id
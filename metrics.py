@@ -0,0 +1,354 @@
+"""Timing, size and cache metrics of OCRA's hot paths, plus an opt-in per-event profiler.
+
+The metrics are collected process-wide in g_metrics and are exposed by the
+server under "/metrics" in the Prometheus text format. They cover:
+* The durations of the server's Socket.IO events and background jobs.
+* The durations of the render stages (e.g. rasterize, rotate, binarize),
+  of the image encodings, of the project data writes and of the Tesseract
+  calls.
+* The sizes of the sent data updates and images.
+* The hits and misses of the page image and preview caches.
+
+If the environment variable OCRA_PROFILE_FOLDER is set, the server runs each
+Socket.IO event and background job under cProfile and dumps its profile as
+"{time}_{event or job}.prof" into this folder (e.g. for snakeviz or pstats).
+For sampling profilers such as py-spy, the jobs run in threads named
+"ocra_job_*" and the Tesseract calls in threads named "ocra_ocr_*".
+"""
+
+# IMPORTS SECTION #
+## EXTERNAL IMPORTS ##
+import cProfile
+import os
+import threading
+import time
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Iterator
+
+# CONSTANTS SECTION #
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+"""The upper bounds of the latency histograms' buckets in seconds."""
+SIZE_BUCKETS: tuple[float, ...] = tuple(float(4**x * 256) for x in range(10))
+"""The upper bounds of the size histograms' buckets in bytes, from 256 B to 64 MiB."""
+
+
+# CLASS DEFINITIONS SECTION #
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    def __init__(self, *, name: str, description: str):
+        """Start-up of the (empty) counter.
+
+        Args:
+            name (str): The metric's name, ending with "_total".
+            description (str): The metric's help text.
+        """
+        self.name: str = name
+        """The metric's name."""
+        self.description: str = description
+        """The metric's help text."""
+        self._lock = threading.Lock()
+        self._values: dict[tuple[tuple[str, str], ...], float] = {}
+
+    def get(self, **labels: str) -> float:
+        """Returns the counter's value of the given labels.
+
+        Returns:
+            float: The value. Is 0.0 if the labels were never counted.
+        """
+        with self._lock:
+            return self._values.get(tuple(sorted(labels.items())), 0.0)
+
+    def inc(self, value: float = 1.0, **labels: str) -> None:
+        """Increases the counter of the given labels by the given value.
+
+        Args:
+            value (float, optional): The increase. Defaults to 1.0.
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def render(self) -> list[str]:
+        """Returns the counter's lines in the Prometheus text format.
+
+        Returns:
+            list[str]: The lines.
+        """
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{format_labels(labels=key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Counts the observed values per label set in cumulative buckets, Prometheus-style."""
+
+    def __init__(self, *, name: str, description: str, buckets: tuple[float, ...]):
+        """Start-up of the (empty) histogram.
+
+        Args:
+            name (str): The metric's name.
+            description (str): The metric's help text.
+            buckets (tuple[float, ...]): The buckets' ascending upper bounds.
+        """
+        self.name: str = name
+        """The metric's name."""
+        self.description: str = description
+        """The metric's help text."""
+        self.buckets: tuple[float, ...] = buckets
+        """The buckets' ascending upper bounds."""
+        self._lock = threading.Lock()
+        # Per label set: bucket counts (the last one is +Inf), sum and count
+        self._values: dict[
+            tuple[tuple[str, str], ...], tuple[list[int], float, int]
+        ] = {}
+
+    def get_count(self, **labels: str) -> int:
+        """Returns the number of observed values of the given labels.
+
+        Returns:
+            int: The number of observed values.
+        """
+        with self._lock:
+            values = self._values.get(tuple(sorted(labels.items())))
+        return 0 if values is None else values[2]
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Adds the given value as observation of the given labels.
+
+        Args:
+            value (float): The observed value, e.g. a duration in seconds.
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            bucket_counts, value_sum, count = self._values.get(
+                key, ([0] * (len(self.buckets) + 1), 0.0, 0)
+            )
+            for bucket_index, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    bucket_counts[bucket_index] += 1
+                    break
+            else:
+                bucket_counts[-1] += 1
+            self._values[key] = (bucket_counts, value_sum + value, count + 1)
+
+    def render(self) -> list[str]:
+        """Returns the histogram's lines in the Prometheus text format.
+
+        Returns:
+            list[str]: The lines.
+        """
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            for key, (bucket_counts, value_sum, count) in sorted(self._values.items()):
+                cumulative_count = 0
+                for upper_bound, bucket_count in zip(
+                    self.buckets + (float("inf"),), bucket_counts
+                ):
+                    cumulative_count += bucket_count
+                    le = "+Inf" if upper_bound == float("inf") else f"{upper_bound:g}"
+                    lines.append(
+                        f"{self.name}_bucket{format_labels(labels=key + (('le', le),))} "
+                        f"{cumulative_count}"
+                    )
+                lines.append(f"{self.name}_sum{format_labels(labels=key)} {value_sum}")
+                lines.append(f"{self.name}_count{format_labels(labels=key)} {count}")
+        return lines
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observes the duration of the enclosed code block in seconds."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, **labels)
+
+
+class MetricsRegistry:
+    """The registry of all metrics of the process."""
+
+    def __init__(self):
+        """Start-up of the (empty) registry."""
+        self.metrics: list[Counter | Histogram] = []
+        """The registered metrics, in registration order."""
+
+    def counter(self, *, name: str, description: str) -> Counter:
+        """Registers and returns a new counter.
+
+        Args:
+            name (str): The metric's name, ending with "_total".
+            description (str): The metric's help text.
+
+        Returns:
+            Counter: The counter.
+        """
+        counter = Counter(name=name, description=description)
+        self.metrics.append(counter)
+        return counter
+
+    def histogram(
+        self, *, name: str, description: str, buckets: tuple[float, ...]
+    ) -> Histogram:
+        """Registers and returns a new histogram.
+
+        Args:
+            name (str): The metric's name.
+            description (str): The metric's help text.
+            buckets (tuple[float, ...]): The buckets' ascending upper bounds.
+
+        Returns:
+            Histogram: The histogram.
+        """
+        histogram = Histogram(name=name, description=description, buckets=buckets)
+        self.metrics.append(histogram)
+        return histogram
+
+    def render(self) -> str:
+        """Returns all metrics in the Prometheus text format.
+
+        Returns:
+            str: The metrics text.
+        """
+        lines: list[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class EventProfiler:
+    """Profiles code blocks with cProfile and dumps each profile into a folder, if enabled."""
+
+    def __init__(self, *, folder_path: str | None):
+        """Start-up of the profiler.
+
+        Args:
+            folder_path (str | None): The folder of the profile files. If None or empty,
+             nothing is profiled.
+        """
+        self.folder_path: str | None = folder_path or None
+        """The folder of the profile files. Is None if profiling is disabled."""
+        # cProfile only supports one active profiler per thread
+        self._local = threading.local()
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[None]:
+        """Profiles the enclosed code block and dumps its profile as "{time}_{name}.prof".
+
+        Nested blocks of the same thread are part of the outermost block's profile.
+
+        Args:
+            name (str): The profiled event's name.
+        """
+        if (self.folder_path is None) or getattr(self._local, "is_active", False):
+            yield
+            return
+        self._local.is_active = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._local.is_active = False
+            os.makedirs(self.folder_path, exist_ok=True)
+            profiler.dump_stats(
+                os.path.join(
+                    self.folder_path,
+                    f"{time.strftime('%Y%m%d-%H%M%S')}-{time.perf_counter_ns()}_{name}.prof",
+                )
+            )
+
+
+# PUBLIC FUNCTIONS SECTION #
+def format_labels(*, labels: tuple[tuple[str, str], ...]) -> str:
+    """Returns the given labels in the Prometheus text format, e.g. '{stage="rotate"}'.
+
+    Args:
+        labels (tuple[tuple[str, str], ...]): The (name, value) pairs of the labels.
+
+    Returns:
+        str: The formatted labels. Is empty if there are no labels.
+    """
+    if not labels:
+        return ""
+    escaped_labels = [
+        (
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels
+    ]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped_labels) + "}"
+
+
+# GLOBAL VARIABLES SECTION #
+g_metrics: MetricsRegistry = MetricsRegistry()
+"""The registry of all metrics of the process."""
+g_profiler: EventProfiler = EventProfiler(
+    folder_path=os.environ.get("OCRA_PROFILE_FOLDER")
+)
+"""Profiles the server's events and jobs if OCRA_PROFILE_FOLDER is set."""
+g_event_seconds: Histogram = g_metrics.histogram(
+    name="ocra_socketio_event_seconds",
+    description="Duration of the server's Socket.IO event handlers.",
+    buckets=LATENCY_BUCKETS,
+)
+g_job_seconds: Histogram = g_metrics.histogram(
+    name="ocra_job_seconds",
+    description="Duration of the server's background jobs (renders, page moves and OCRs).",
+    buckets=LATENCY_BUCKETS,
+)
+g_render_stage_seconds: Histogram = g_metrics.histogram(
+    name="ocra_render_stage_seconds",
+    description="Duration of the page rendering stages (e.g. rasterize, rotate, binarize).",
+    buckets=LATENCY_BUCKETS,
+)
+g_encode_seconds: Histogram = g_metrics.histogram(
+    name="ocra_image_encode_seconds",
+    description="Duration of the preview and tile image encodings.",
+    buckets=LATENCY_BUCKETS,
+)
+g_write_seconds: Histogram = g_metrics.histogram(
+    name="ocra_project_write_seconds",
+    description="Duration of the project data writes (JSON and text files, file syncs, store flushes).",
+    buckets=LATENCY_BUCKETS,
+)
+g_tesseract_seconds: Histogram = g_metrics.histogram(
+    name="ocra_tesseract_seconds",
+    description="Duration of the Tesseract calls, per single image or batch of images.",
+    buckets=LATENCY_BUCKETS,
+)
+g_payload_bytes: Histogram = g_metrics.histogram(
+    name="ocra_payload_bytes",
+    description="Size of the data updates and images which are sent to the browser.",
+    buckets=SIZE_BUCKETS,
+)
+g_cache_requests: Counter = g_metrics.counter(
+    name="ocra_cache_requests_total",
+    description="Lookups of the page image and preview caches by their result (hit or miss).",
+)
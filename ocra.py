@@ -2,29 +2,67 @@
 
 # IMPORTS SECTION #
 ## EXTERNAL IMPORTS ##
-import base64
 import fitz
 import os
-import pytesseract
-from io import BytesIO
+import threading
+import uuid
+from collections import OrderedDict
 from PIL import Image
 from pydantic import BaseModel
 from pydantic.tools import parse_obj_as
 from shutil import copy
-from time import sleep
-from typing import Any
+from typing import Any, Callable
 
 ## INTERNAL IMPORTS ##
+from display_lists import DisplayListCache
+from image_cache import PageImageCache, get_image_cache_key
+from metrics import g_cache_requests, g_encode_seconds, g_render_stage_seconds
+from prefetch import PagePrefetcher
+from project_store import (
+    ProjectStore,
+    WriteBehindProjectStore,
+    create_project_store,
+    open_project_store,
+)
+from rect_store import RectImageStore
+from render import (
+    BackgroundImageWriter,
+    NativePageImage,
+    StageTimer,
+    encode_preview_image,
+    extract_native_page_image,
+    get_native_page_image,
+    get_pdf_clip_rect,
+    pixmap_to_image,
+    rasterize_display_list,
+    transform_image,
+)
+from tesseract_engine import (
+    OCR_ENGINE_NAMES,
+    OCREngine,
+    TesseractBatchEngine,
+    create_ocr_engine,
+)
+from tiles import TileCache
 from utils import (
     ensure_folder_existence,
-    get_filenames_of_folder,
     is_file_existing,
-    json_load,
-    json_write,
     standardize_file_path,
     standardize_folder_path,
 )
 
+# CONSTANTS SECTION #
+DATA_UPDATE_PART_NAMES: tuple[str, ...] = (
+    "project",
+    "config",
+    "rects",
+    "transcript",
+    "image",
+)
+"""The names of all parts of a data update, see OCRAProject.get_data_update_parts()."""
+NATIVE_DPI_RANGE: tuple[int, int] = (150, 700)
+"""The DPI range (as of the browser's DPI slider) in which a scanned page's native DPI becomes its default DPI."""
+
 
 # UTILITY CLASS DEFINITIONS SECTION #
 class Rect(BaseModel):
@@ -41,6 +79,28 @@ class Rect(BaseModel):
     language_state: str
     """Marks if the language '1', '2' or '1_and_2' are marked. TODO: Replace by enum"""
 
+    def get_box(self) -> tuple[int, int, int, int]:
+        """Returns the Rect's area as box with the upper left and lower right coordinates.
+
+        Negative widths and heights (i.e., Rects drawn to the left or top) are resolved.
+
+        Returns:
+            tuple[int, int, int, int]: (x_upper_left, y_upper_left, x_lower_right, y_lower_right)
+        """
+        if self.width >= 0.0:
+            x_upper_left = self.coord_x
+            x_lower_right = self.coord_x + self.width
+        else:
+            x_upper_left = self.coord_x + self.width
+            x_lower_right = self.coord_x
+        if self.height >= 0.0:
+            y_upper_left = self.coord_y
+            y_lower_right = self.coord_y + self.height
+        else:
+            y_lower_right = self.coord_y
+            y_upper_left = self.coord_y + self.height
+        return (x_upper_left, y_upper_left, x_lower_right, y_lower_right)
+
 
 class ImageConfig(BaseModel):
     """The general image settings of a shown PDF page."""
@@ -55,6 +115,8 @@ class ImageConfig(BaseModel):
     """If true, only black and white are shown. If false, all colors are possible."""
     binarization_threshold: int = 130
     """Sets the threshold for binarization. Only effective if is_binarized is True."""
+    binarization_method: str = "global"
+    """The binarization method, i.e., 'global' (uses binarization_threshold), 'otsu' or 'sauvola'."""
     dpi: int = 500
     """The PDF page's DPI resolution. Affects the X/Y coordinates so that rects usually have to be redrawn."""
     rects: list[Rect] = []
@@ -72,26 +134,247 @@ class TesseractConfig(BaseModel):
     """The language (in Tesseract format) of the Rects which are set for the 'language 1'."""
     language_2: str = ""
     """The language (in Tesseract format) of the Rects which are set for the 'language 1'."""
+    ocr_workers: int = 0
+    """The maximal number of concurrently running Tesseract processes. If 0, the CPU count is used. If 1, Rects are OCRed one after another."""
+    ocr_engine: str = "batch"
+    """Either 'batch' (one Tesseract process per batch of same-language Rects, with fallback to 'pytesseract') or 'pytesseract' (one Tesseract process per Rect)."""
+    is_text_layer_used: bool = False
+    """If true, the text of Rects which contain (visible or invisible) PDF text is taken from this text layer instead of Tesseract."""
+
+
+class PageIndex:
+    """In-memory index of the stored ImageConfigs and transcript states of all pages of a project.
+
+    It is loaded once from the project store and then kept up to date by the project's
+    own writes. Thus, page changes and whole-project queries (e.g. the pages with Rects
+    but without transcript) need no disk I/O and no JSON parsing. Writes of other
+    processes (e.g. of a running batch OCR) are only seen after the next load().
+    """
+
+    def __init__(self):
+        """Start-up of the (empty) index."""
+        self.image_configs: dict[int, ImageConfig] = {}
+        """The stored ImageConfig of each page which has one."""
+        self.transcribed_pages: set[int] = set()
+        """The numbers of all pages with a non-empty transcript."""
+
+    def get_image_config(self, *, page: int) -> ImageConfig | None:
+        """Returns a copy of the given page's ImageConfig, so that changing it does not change the index.
+
+        Args:
+            page (int): The page's number.
+
+        Returns:
+            ImageConfig | None: The ImageConfig or None if the page has none.
+        """
+        image_config = self.image_configs.get(page)
+        if image_config is None:
+            return None
+        return image_config.copy(deep=True)
+
+    def get_pages_with_rects(self) -> list[int]:
+        """Returns the numbers of all pages which have at least one Rect.
+
+        Returns:
+            list[int]: The page numbers in ascending order.
+        """
+        return sorted(
+            page
+            for page, image_config in self.image_configs.items()
+            if image_config.rects
+        )
+
+    def get_untranscribed_pages_with_rects(self) -> list[int]:
+        """Returns the numbers of all pages which have at least one Rect but no transcript.
+
+        Returns:
+            list[int]: The page numbers in ascending order.
+        """
+        return [
+            page
+            for page in self.get_pages_with_rects()
+            if page not in self.transcribed_pages
+        ]
+
+    def has_image_config(self, *, page: int) -> bool:
+        """Returns whether or not the given page has a stored ImageConfig.
+
+        Args:
+            page (int): The page's number.
+
+        Returns:
+            bool: Is true if the page has an ImageConfig.
+        """
+        return page in self.image_configs
+
+    def load(self, *, project_store: ProjectStore) -> None:
+        """(Re-)loads the index from the given project store.
+
+        Args:
+            project_store (ProjectStore): The project's store.
+        """
+        self.image_configs = {
+            page: parse_obj_as(ImageConfig, image_config_json)
+            for page, image_config_json in project_store.read_image_configs().items()
+        }
+        self.transcribed_pages = {
+            page for page, text in project_store.read_transcripts().items() if text
+        }
+
+    def set_image_config(self, *, page: int, image_config: ImageConfig) -> None:
+        """Sets (a copy of) the given ImageConfig as the given page's one.
+
+        Args:
+            page (int): The page's number.
+            image_config (ImageConfig): The page's new ImageConfig.
+        """
+        self.image_configs[page] = image_config.copy(deep=True)
+
+    def set_transcript(self, *, page: int, text: str) -> None:
+        """Updates the given page's transcript state according to its new transcript.
+
+        Args:
+            page (int): The page's number.
+            text (str): The page's new transcript text.
+        """
+        if text:
+            self.transcribed_pages.add(page)
+        else:
+            self.transcribed_pages.discard(page)
 
 
 # MAIN CLASS DEFINITION SECTION #
 class OCRAProject:
     """Main OCRA class containing all major functions and project-representing member variables."""
 
-    def __init__(self):
-        """Start-up of all project-representing member variables."""
+    def __init__(
+        self,
+        *,
+        cache_memory_budget: int = 1024**3,
+        cache_disk_budget: int = 4 * 1024**3,
+        prefetch_radius: int = 2,
+        prefetch_workers: int = 2,
+        get_shared_image_cache: Callable[[str], PageImageCache] | None = None,
+        write_delay: float = 0.0,
+        display_list_memory_budget: int = 256 * 1024**2,
+    ):
+        """Start-up of all project-representing member variables.
+
+        Args:
+            cache_memory_budget (int, optional): The page image cache's memory budget in bytes. Defaults to 1 GiB.
+            cache_disk_budget (int, optional): The page image cache's disk budget in bytes. If 0, the
+             cache's disk tier is not used. Defaults to 4 GiB.
+            prefetch_radius (int, optional): The number of pages which are prefetched in each
+             direction of the shown page. If 0, nothing is prefetched. Defaults to 2.
+            prefetch_workers (int, optional): The number of prefetching worker processes. Defaults to 2.
+            get_shared_image_cache (Callable[[str], PageImageCache] | None, optional): If given,
+             it returns the image cache of the given PDF file path which is shared with other
+             projects of the same PDF (e.g. by the server's client sessions). The cache
+             budgets are then ignored. Defaults to None, i.e., the project has its own cache.
+            write_delay (float, optional): If greater than 0, changed project data (e.g. Rects
+             and transcripts) is kept in memory and written in the background after this
+             delay in seconds, on page changes and on close_project_store() (see
+             WriteBehindProjectStore). Defaults to 0.0, i.e., changes are written at once.
+            display_list_memory_budget (int, optional): The (estimated) memory budget of the
+             cached display lists of the PDF's pages in bytes (see display_lists.py). If 0,
+             each render parses its page anew. Defaults to 256 MiB.
+        """
         self.folder_path: str = ""
         """The OCRA project's full folder path."""
         self.current_image_config: ImageConfig = ImageConfig()
         """The OCRA project's ImageConfig instance."""
         self.tesseract_config: TesseractConfig = TesseractConfig()
         """The OCRA project's TesseractConfig instance."""
+        self.project_store: ProjectStore = ProjectStore(folder_path="")
+        """Stores the loaded project's page data, current page and TesseractConfig (see project_store.py)."""
+        self.write_delay: float = write_delay
+        """If greater than 0, the delay in seconds after which changed project data is written."""
+        self.page_index: PageIndex = PageIndex()
+        """The in-memory ImageConfigs and transcript states of all pages, loaded once from the project store."""
         self.current_page: int = 1
         """The currently viewed and editable page's number."""
         self.pdf_document = fitz.Document()
         """The mupdf (i.e., fitz) instance of the currently opened PDF page."""
+        self.current_transformed_image: Image.Image | None = None
+        """The in-memory transformed image of the page given in current_transformed_image_page."""
+        self.current_transformed_image_page: int = 0
+        """The page number of current_transformed_image. Is 0 if no image is held in memory."""
+        self.image_writer: BackgroundImageWriter = BackgroundImageWriter()
+        """Writes the transformed images lazily in the background."""
+        self.last_render_timer: StageTimer = StageTimer()
+        """The per-stage durations of the latest transform_current_image() run."""
+        self.image_cache: PageImageCache = PageImageCache(
+            memory_budget=cache_memory_budget, disk_budget=cache_disk_budget
+        )
+        """LRU cache of base rasterizations and transformed page images."""
+        self.display_list_cache: DisplayListCache = DisplayListCache(
+            memory_budget=display_list_memory_budget
+        )
+        """The parsed pages and display lists of the PDF, so that re-renders do not parse the pages again."""
+        self.native_page_images: dict[int, NativePageImage | None] = {}
+        """The embedded images of the pages which consist of nothing but one image (else None), by page."""
+        self.get_shared_image_cache: Callable[[str], PageImageCache] | None = (
+            get_shared_image_cache
+        )
+        """If not None, returns the shared image cache of a loaded project's PDF."""
+        self.written_image_cache_keys: dict[
+            int, tuple[int, int, int, bool, str, int]
+        ] = {}
+        """The image cache keys of the transformed image files written during this session, by page."""
+        self.prefetch_radius: int = prefetch_radius
+        """The number of pages which are prefetched in each direction of the shown page."""
+        self.prefetch_workers: int = prefetch_workers
+        """The number of prefetching worker processes."""
+        self.prefetcher: PagePrefetcher | None = None
+        """Renders the pages around the shown page in the background. Is None if no project is loaded."""
+        self.rect_image_store: RectImageStore = RectImageStore()
+        """In-memory crops of the Rects, addressed by page and Rect index."""
+        self.page_lock = threading.RLock()
+        """Lock of the current page's switch, as page-tagged edits arrive from the server's request threads."""
+        self.project_token: str = uuid.uuid4().hex[:8]
+        """Random token of the loaded project which makes image versions unique across projects."""
+        self.encoded_images: OrderedDict[tuple[str, int], tuple[bytes, str]] = (
+            OrderedDict()
+        )
+        """The encoded previews of the latest transformed images, by image version and reduction."""
+        self.encoded_images_lock = threading.Lock()
+        """Lock of encoded_images, as the images are served from the server's request threads."""
+        self.tile_cache: TileCache = TileCache()
+        """The tiles of the latest transformed images, for the browser's tile mode."""
+        self.ocr_engine: OCREngine | None = None
+        """The long-lived OCR engine of the current TesseractConfig. Is None until the first OCR."""
+        self.is_rect_image_export_active: bool = False
+        """If true, perform_ocr() also stores the Rect images in the rect images folder (e.g., for debugging)."""
+        self.is_transformed_image_export_active: bool = True
+        """If true, the transformed images are also written into the transformed images folder. Headless runs (e.g. batch OCR) switch this off."""
+
+    def _start_prefetcher(self) -> None:
+        if self.prefetch_radius > 0:
+            self.prefetcher = PagePrefetcher(
+                pdf_file_path=self.get_project_pdf_file_path(),
+                image_cache=self.image_cache,
+                radius=self.prefetch_radius,
+                max_workers=self.prefetch_workers,
+            )
+
+    def _open_project_store(self) -> ProjectStore:
+        project_store = open_project_store(folder_path=self.folder_path)
+        if self.write_delay <= 0:
+            return project_store
+        return WriteBehindProjectStore(
+            project_store=project_store, delay=self.write_delay
+        )
 
     ## GET FOLDER PATHS SECTION ##
+    def get_image_cache_path(self) -> str:
+        """Returns the current full image cache folder's path.
+
+
+        Returns:
+            str: The current full image cache folder's path.
+        """
+        return standardize_folder_path(folder_path=f"{self.folder_path}image_cache/")
+
     def get_image_configs_path(self) -> str:
         """Returns the current full image config folder's path.
 
@@ -139,7 +422,7 @@ class OCRAProject:
         Returns:
             str: The current page's ImageConfig JSON file path.
         """
-        return f"{self.get_image_configs_path()}{self.current_page}.json"
+        return self.get_page_image_config_file_path(page=self.current_page)
 
     def get_current_image_transcript_file_path(self) -> str:
         """Returns the full path of the current page's transcript text file.
@@ -179,16 +462,31 @@ class OCRAProject:
         )
 
     def get_existing_current_rect_images(self) -> list[str]:
-        """Returns full paths of all images which represent the user-made Rects of the current page.
+        """Returns the file names of all exported images of the Rects of the current page, in Rect order.
+
+        As the file names are deterministic, the files are looked up directly instead of listing
+        the (potentially large) rect images folder.
 
         Returns:
-            list[str]: A list of full paths of all images which represent the user-made Rects of the current page.
+            list[str]: A list of the file names of all exported Rect images of the current page.
         """
-        return [
-            x
-            for x in get_filenames_of_folder(folder_path=self.get_rect_images_path())
-            if x.startswith(str(self.current_page) + "_")
-        ]
+        filenames: list[str] = []
+        while is_file_existing(
+            filepath=self.get_current_rect_image_path(len(filenames))
+        ):
+            filenames.append(f"{self.current_page}_{len(filenames)}.png")
+        return filenames
+
+    def get_page_image_config_file_path(self, *, page: int) -> str:
+        """Returns the full path of the given page's ImageConfig JSON file.
+
+        Args:
+            page (int): The page's number.
+
+        Returns:
+            str: The given page's ImageConfig JSON file path.
+        """
+        return f"{self.get_image_configs_path()}{page}.json"
 
     def get_project_pdf_file_path(self) -> str:
         """Returns the current project's PDF full path.
@@ -218,74 +516,338 @@ class OCRAProject:
 
         I.e., if none exists, a new empty one with standard values is created.
         """
-        if not is_file_existing(filepath=self.get_current_image_config_file_path()):
-            self.current_image_config = ImageConfig()
+        if not self.page_index.has_image_config(page=self.current_page):
+            self.current_image_config = self.get_default_image_config(
+                page=self.current_page
+            )
             self.write_current_image_config()
 
     def ensure_current_transformed_image_existence(self) -> None:
         """Ensures that the current transformed PDF page's image exists.
 
-        I.e., if none exists, a new one with the transformation is created.
+        I.e., the image is taken from the image cache. Otherwise, it is created with the
+        transformation, which takes its stages (e.g. the page's rasterization at the
+        current DPI) from the image cache where possible. The page's image file is only
+        an export and is never read, as it may be outdated or from another session.
         """
-        if not is_file_existing(
-            filepath=self.get_current_transformed_image_file_path()
-        ):
+        if self.current_transformed_image_page == self.current_page:
+            return
+        cache_key = self.get_current_image_cache_key()
+        image = None
+        # contains() first, so that a miss is only counted once, by the transformation
+        if self.image_cache.contains(cache_key):
+            image = self.image_cache.get(cache_key)
+        if image is None:
+            # The foreground rendering never waits for the prefetch workers
+            if self.prefetcher is not None:
+                self.prefetcher.cancel(page=self.current_page)
             self.transform_current_image()
+            return
+        if self.is_transformed_image_export_active and (
+            self.written_image_cache_keys.get(self.current_page) != cache_key
+        ):
+            # The image was prefetched, i.e., its file is not written yet
+            self.image_writer.schedule(
+                path=self.get_current_transformed_image_file_path(), image=image
+            )
+            self.written_image_cache_keys[self.current_page] = cache_key
+        self.current_transformed_image = image
+        self.current_transformed_image_page = self.current_page
 
     ## GET CURRENT FILES SECTION ##
     def get_current_image_config(self) -> ImageConfig:
-        """Returns the current ImageConfig from the image config JSON of the current project.
+        """Returns the current page's stored ImageConfig.
 
         Returns:
             ImageConfig: The current PDF page image configuration.
         """
-        return parse_obj_as(
-            ImageConfig, json_load(file_path=self.get_current_image_config_file_path())
+        return self.get_page_image_config(page=self.current_page)
+
+    def get_current_image_cache_key(self) -> tuple[int, int, int, bool, str, int]:
+        """Returns the image cache key of the current page's transformed image.
+
+        Returns:
+            tuple[int, int, int, bool, str, int]: (page, dpi, rotation, is_binarized,
+             binarization_method, binarization_threshold)
+        """
+        return self.get_page_image_cache_key(
+            page=self.current_page, image_config=self.current_image_config
+        )
+
+    def get_current_image_preview(self, *, reduction: int = 1) -> tuple[bytes, str]:
+        """Returns the current transformed page image, downscaled by the given factor and encoded.
+
+        The browser only displays the page image, so that it loads the pyramid level which
+        fits its zoom instead of the full-DPI image. The full-DPI image itself stays in
+        memory for the Rect crops. The encodings of the latest few image versions and levels
+        are kept, so that repeated requests of the same image are not encoded again.
+
+        Args:
+            reduction (int, optional): The downscaling factor, one of PREVIEW_REDUCTIONS.
+             Defaults to 1, i.e., the full-DPI image as PNG.
+
+        Returns:
+            tuple[bytes, str]: The encoded image and its MIME type.
+        """
+        key = (self.get_current_image_version(), reduction)
+        with self.encoded_images_lock:
+            if key in self.encoded_images:
+                self.encoded_images.move_to_end(key)
+                g_cache_requests.inc(cache="preview", result="memory_hit")
+                return self.encoded_images[key]
+        g_cache_requests.inc(cache="preview", result="miss")
+        image = self.get_current_transformed_image()
+        with g_encode_seconds.time(kind="preview", reduction=str(reduction)):
+            preview = encode_preview_image(image=image, reduction=reduction)
+        with self.encoded_images_lock:
+            self.encoded_images[key] = preview
+            while len(self.encoded_images) > 8:
+                self.encoded_images.popitem(last=False)
+        return preview
+
+    def get_current_image_tile(
+        self, *, reduction: int, tile_x: int, tile_y: int
+    ) -> tuple[bytes, str] | None:
+        """Returns the given tile of the current transformed page image (see tiles.py).
+
+        Args:
+            reduction (int): The pyramid level's downscaling factor, one of PREVIEW_REDUCTIONS.
+            tile_x (int): The tile's column, starting with 0 at the left.
+            tile_y (int): The tile's row, starting with 0 at the top.
+
+        Returns:
+            tuple[bytes, str] | None: The encoded tile and its MIME type or None if the
+             tile is outside of the image.
+        """
+        return self.tile_cache.get_tile(
+            image_version=self.get_current_image_version(),
+            reduction=reduction,
+            tile_x=tile_x,
+            tile_y=tile_y,
+            get_image=self.get_current_transformed_image,
+        )
+
+    def get_current_image_version(self) -> str:
+        """Returns the version of the current transformed page image.
+
+        The version is unique for the loaded project, the page and the image settings, so
+        that clients can cache the image under it.
+
+        Returns:
+            str: The image version.
+        """
+        return "-".join(
+            [self.project_token]
+            + [
+                str(int(x)) if isinstance(x, bool) else str(x)
+                for x in self.get_current_image_cache_key()
+            ]
+        )
+
+    def get_current_rect_images(
+        self, *, rect_indexes: list[int] | None = None
+    ) -> list[Image.Image]:
+        """Returns in-memory crops of all Rects of the current page, in Rect order.
+
+        Crops which are still up to date are taken from the Rect image store, which only
+        keeps the current page's crops. The crops are marked as BMP images so that
+        Tesseract gets them uncompressed.
+
+        Args:
+            rect_indexes (list[int] | None, optional): If given, only the crops of the Rects
+             with these indexes are returned, in the given order. Defaults to None.
+
+        Returns:
+            list[Image.Image]: The Rect images.
+        """
+        image = self.get_current_transformed_image()
+        image_cache_key = self.get_current_image_cache_key()
+        rects = self.current_image_config.rects
+        self.rect_image_store.keep_page(page=self.current_page)
+        self.rect_image_store.truncate_page(
+            page=self.current_page, rect_count=len(rects)
+        )
+        if rect_indexes is None:
+            rect_indexes = list(range(len(rects)))
+        rect_images: list[Image.Image] = []
+        for rect_index in rect_indexes:
+            rect = rects[rect_index]
+            source_key = (image_cache_key, rect.get_box())
+            rect_image = self.rect_image_store.get(
+                page=self.current_page, rect_index=rect_index, source_key=source_key
+            )
+            if rect_image is None:
+                rect_image = image.crop(rect.get_box())
+                rect_image.format = "BMP"
+                self.rect_image_store.put(
+                    page=self.current_page,
+                    rect_index=rect_index,
+                    source_key=source_key,
+                    image=rect_image,
+                )
+            rect_images.append(rect_image)
+        return rect_images
+
+    def get_current_rect_text_layer_texts(self) -> list[str | None]:
+        """Returns the PDF text layer's texts inside the Rects of the current page, in Rect order.
+
+        Each Rect is mapped back into the PDF page's coordinates (see get_pdf_clip_rect()),
+        so that neither the page image nor Tesseract is needed.
+
+        Returns:
+            list[str | None]: The Rect texts. A text is None if the Rect contains no text or
+             text with unmappable characters (e.g. of fonts without Unicode mapping).
+        """
+        page = self.get_pdf_document().load_page(self.current_page - 1)
+        image_config = self.current_image_config
+        texts: list[str | None] = []
+        for rect in image_config.rects:
+            clip = get_pdf_clip_rect(
+                page=page,
+                box=rect.get_box(),
+                dpi=image_config.dpi,
+                rotation=image_config.rotation,
+            )
+            text = page.get_text("text", clip=clip)
+            if (text.strip() == "") or ("\ufffd" in text):
+                texts.append(None)
+            else:
+                texts.append(text if text.endswith("\n") else f"{text}\n")
+        return texts
+
+    def get_current_transformed_image(self) -> Image.Image:
+        """Returns the user-settings-transformed current page image.
+
+        The image is taken from memory if possible. Otherwise, it is taken from the
+        image cache, loaded from its file or, if no file exists, newly rendered.
+
+        Returns:
+            Image.Image: The transformed current page image.
+        """
+        self.ensure_current_transformed_image_existence()
+        return self.current_transformed_image
+
+    def get_page_image_cache_key(
+        self, *, page: int, image_config: ImageConfig | None = None
+    ) -> tuple[int, int, int, bool, str, int]:
+        """Returns the image cache key of the given page's transformed image.
+
+        Args:
+            page (int): The page's number.
+            image_config (ImageConfig | None, optional): The page's ImageConfig. If None, the
+             page's stored ImageConfig is used. Defaults to None.
+
+        Returns:
+            tuple[int, int, int, bool, str, int]: (page, dpi, rotation, is_binarized,
+             binarization_method, binarization_threshold)
+        """
+        if image_config is None:
+            image_config = self.get_page_image_config(page=page)
+        return get_image_cache_key(
+            page=page,
+            dpi=image_config.dpi,
+            rotation=image_config.rotation,
+            is_binarized=image_config.is_binarized,
+            binarization_method=image_config.binarization_method,
+            binarization_threshold=image_config.binarization_threshold,
         )
 
+    def get_default_image_config(self, *, page: int) -> ImageConfig:
+        """Returns the standard ImageConfig of the given page.
+
+        If the page consists of nothing but one embedded image (e.g. a scan) whose
+        native DPI is in NATIVE_DPI_RANGE, this native DPI is used, so that the image
+        is extracted without any rasterization or resizing.
+
+        Args:
+            page (int): The page's number.
+
+        Returns:
+            ImageConfig: The page's standard ImageConfig.
+        """
+        image_config = ImageConfig()
+        native_page_image = self.get_native_page_image(page=page)
+        if (native_page_image is not None) and (
+            NATIVE_DPI_RANGE[0] <= native_page_image.native_dpi <= NATIVE_DPI_RANGE[1]
+        ):
+            image_config.dpi = native_page_image.native_dpi
+        return image_config
+
+    def get_page_image_config(self, *, page: int) -> ImageConfig:
+        """Returns (a copy of) the stored ImageConfig of the given page from the page index.
+
+        Args:
+            page (int): The page's number.
+
+        Returns:
+            ImageConfig: The page's stored ImageConfig or its standard one if none is stored.
+        """
+        image_config = self.page_index.get_image_config(page=page)
+        if image_config is None:
+            return self.get_default_image_config(page=page)
+        return image_config
+
     def get_current_image_transcript(self) -> str:
         """Returns the current full page OCR transcript text.
 
         Returns:
             str: The current full page OCR transcript text.
         """
-        transcript_path = self.get_current_image_transcript_file_path()
-        if is_file_existing(filepath=transcript_path):
-            with open(transcript_path, "r", encoding="utf-8") as f:
-                text = f.read()
-        else:
-            text = ""
-        return text
+        return self.project_store.read_transcript(page=self.current_page)
 
     ## WRITE FILES SECTION ##
     def write_current_image_config(self) -> None:
-        """Weites the current ImageConfig as JSON file."""
-        json_write(
-            file_path=self.get_current_image_config_file_path(),
-            json_data=self.current_image_config.dict(),
+        """Writes the current ImageConfig into the page index and the project store."""
+        self.page_index.set_image_config(
+            page=self.current_page, image_config=self.current_image_config
+        )
+        self.project_store.write_image_config(
+            page=self.current_page, image_config_json=self.current_image_config.dict()
         )
 
     def write_current_page(self) -> None:
-        """Writes the current page number in its associated JSON file."""
-        json_write(
-            file_path=self.get_current_page_file_path(), json_data=self.current_page
-        )
+        """Writes the current page number into the project store."""
+        self.project_store.write_current_page(page=self.current_page)
 
     def write_tesseract_config(self) -> None:
-        """Writes the current TesseractConfig in its associated JSON file."""
-        with open(self.get_tesseract_config_file_path(), "w", encoding="utf-8") as f:
-            f.write(self.tesseract_config.json())
+        """Writes the current TesseractConfig into the project store."""
+        self.project_store.write_tesseract_config(
+            tesseract_config_json=self.tesseract_config.dict()
+        )
 
     def set_current_image_transcript(self, text: str) -> None:
-        """Sets the current page's text transcript to the given text and stores it in its text file.
+        """Sets the current page's text transcript to the given text and stores it in the project store.
+
+        Args:
+            text (str): The changed (new) text transcript.
+        """
+        self.set_page_transcript(page=self.current_page, text=text)
+
+    def append_page_transcript(self, *, page: int, text: str) -> None:
+        """Appends the given text to the given page's transcript, e.g. an OCR result.
+
+        Args:
+            page (int): The page's number.
+            text (str): The appended text.
+        """
+        with self.page_lock:
+            self.set_page_transcript(
+                page=page, text=self.project_store.read_transcript(page=page) + text
+            )
+
+    def set_page_transcript(self, *, page: int, text: str) -> None:
+        """Sets the given page's text transcript to the given text and stores it in the project store.
+
+        Unlike set_current_image_transcript(), the page does not have to be the current one,
+        e.g. if the browser's edit arrives after a page change.
 
         Args:
+            page (int): The page's number.
             text (str): The changed (new) text transcript.
         """
-        with open(
-            self.get_current_image_transcript_file_path(), "w", encoding="utf-8"
-        ) as f:
-            f.write(text)
+        with self.page_lock:
+            self.page_index.set_transcript(page=page, text=text)
+            self.project_store.write_transcript(page=page, text=text)
 
     ## MAIN FUNCTIONS SECTION ##
     def change_tesseract_arguments(self, *, arguments: str) -> None:
@@ -316,12 +878,41 @@ class OCRAProject:
         self.tesseract_config.command_path = tesseract_path
         self.write_tesseract_config()
 
-    def create_project_from_pdf(self, *, pdf_file_path: str, folder_path: str) -> None:
+    def change_tesseract_ocr_settings(self, *, settings_json: dict[str, Any]) -> None:
+        """Changes the current OCR run settings by re-writing the associated file.
+
+        Args:
+            settings_json (dict[str, Any]): Dictionary containing the changed settings, i.e.,
+             "ocr_workers" (int), "ocr_engine" (str, one of OCR_ENGINE_NAMES) and
+             "is_text_layer_used" (bool). Settings which are not contained (or are invalid)
+             are not changed.
+        """
+        if "ocr_workers" in settings_json:
+            self.tesseract_config.ocr_workers = max(
+                0, int(settings_json["ocr_workers"])
+            )
+        if settings_json.get("ocr_engine") in OCR_ENGINE_NAMES:
+            self.tesseract_config.ocr_engine = settings_json["ocr_engine"]
+        if "is_text_layer_used" in settings_json:
+            self.tesseract_config.is_text_layer_used = bool(
+                settings_json["is_text_layer_used"]
+            )
+        self.write_tesseract_config()
+
+    def close_project_store(self) -> None:
+        """Writes all pending project data and closes the project store, e.g. on shutdown."""
+        self.project_store.close()
+
+    def create_project_from_pdf(
+        self, *, pdf_file_path: str, folder_path: str, store_type: str = "folder"
+    ) -> None:
         """Creates a new project from a PDF by generating the OCRA project files in the given folder.
 
         Args:
             pdf_file_path (str): The original PDF file's path.
             folder_path (str): The OCRA project's path.
+            store_type (str, optional): The project store type, i.e., "folder" (one file
+             per page) or "sqlite" (one database file), see project_store.py. Defaults to "folder".
         """
         pdf_file_path = standardize_file_path(file_path=pdf_file_path)
         folder_path = standardize_folder_path(folder_path=folder_path)
@@ -334,115 +925,262 @@ class OCRAProject:
 
         ensure_folder_existence(folder_path=f"{self.folder_path}")
         ensure_folder_existence(folder_path=self.get_transformed_images_path())
-        ensure_folder_existence(folder_path=self.get_image_transcripts_path())
         ensure_folder_existence(folder_path=self.get_rect_images_path())
-        ensure_folder_existence(folder_path=self.get_image_configs_path())
 
-        self.tesseract_config = TesseractConfig()
-        self.write_tesseract_config()
-        self.current_page = 1
-        self.write_current_page()
-        self.current_image_config = ImageConfig()
-        self.ensure_current_image_config()
-        self.write_current_image_config()
+        self.project_store.close()
+        self.project_store = create_project_store(
+            folder_path=folder_path, store_type=store_type
+        )
+        with self.project_store.batch():
+            self.tesseract_config = TesseractConfig()
+            self.write_tesseract_config()
+            self.current_page = 1
+            self.write_current_page()
 
         self.load_ocra_project(folder_path=folder_path)
 
-    def create_rect_images(self) -> None:
-        """Creates images of all Rects from the transformed PDF page image and stores them.
+    def create_rect_images(
+        self, *, rect_images: list[Image.Image] | None = None
+    ) -> None:
+        """Stores images of all Rects of the current page in the rect images folder.
+
+        This is an optional export (e.g., for debugging), as the OCR uses in-memory images.
 
-        These files are later used for OCR with Tesseract.
+        Args:
+            rect_images (list[Image.Image] | None, optional): The already cropped Rect images.
+             If None, they are newly cropped. Defaults to None.
         """
-        self.ensure_current_transformed_image_existence()
         for file in self.get_existing_current_rect_images():
-            while not os.access(self.get_rect_images_path() + file, mode=os.W_OK):
-                sleep(0.1)
-            os.remove(self.get_rect_images_path() + file)
-        image = Image.open(self.get_current_transformed_image_file_path())
-        rect_counter = 0
-        for rect in self.current_image_config.rects:
-            if rect.width >= 0.0:
-                x_upper_left = rect.coord_x
-                x_lower_right = rect.coord_x + rect.width
-            else:
-                x_upper_left = rect.coord_x + rect.width
-                x_lower_right = rect.coord_x
-            if rect.height >= 0.0:
-                y_upper_left = rect.coord_y
-                y_lower_right = rect.coord_y + rect.height
-            else:
-                y_lower_right = rect.coord_y
-                y_upper_left = rect.coord_y + rect.height
-            cropped_image = image.crop(
-                (x_upper_left, y_upper_left, x_lower_right, y_lower_right)
+            try:
+                os.remove(self.get_rect_images_path() + file)
+            except FileNotFoundError:
+                pass
+        if rect_images is None:
+            rect_images = self.get_current_rect_images()
+        for rect_counter, rect_image in enumerate(rect_images):
+            rect_image.save(
+                self.get_current_rect_image_path(rect_counter), format="PNG"
             )
-            cropped_image.save(self.get_current_rect_image_path(rect_counter))
-            rect_counter += 1
-        image.close()
 
     def data_update_json(self) -> dict[str, Any]:
-        """Returns a full data update for all Rects and the image in base64 format.
+        """Returns a full data update, i.e., all data update parts merged into one dictionary.
 
         Returns:
             dict[str, Any]: The full data update.
         """
-        image = Image.open(self.get_current_transformed_image_file_path())
-        buffer = BytesIO()
-        image.save(buffer, format="PNG")
-        base64_str = "data:image/png;base64," + base64.b64encode(
-            buffer.getvalue()
-        ).decode("utf-8")
-        image.close()
-
-        rects = []
-        for rect in self.current_image_config.rects:
-            rects.append(
-                {
-                    "x": rect.coord_x,
-                    "y": rect.coord_y,
-                    "w": rect.width,
-                    "h": rect.height,
-                    "language_state": rect.language_state,
+        data_update_json: dict[str, Any] = {}
+        for part in self.get_data_update_parts().values():
+            data_update_json |= part
+        return data_update_json
+
+    def get_data_update_parts(
+        self, *, part_names: tuple[str, ...] = DATA_UPDATE_PART_NAMES
+    ) -> dict[str, dict[str, Any]]:
+        """Returns the given parts of the data which is shown in the browser.
+
+        The parts are:
+        * "project": Page number, current page and the Tesseract config.
+        * "config": The current page's image settings (zoom, rotation, DPI, binarization).
+        * "rects": The current page's Rects.
+        * "transcript": The current page's transcript text.
+        * "image": The current page image's version and full-DPI size. The image itself
+          is not part of the update. Instead, clients load a preview of it from the
+          server's page image route when its version changed.
+
+        Args:
+            part_names (tuple[str, ...], optional): The names of the returned parts.
+             Defaults to all parts.
+
+        Returns:
+            dict[str, dict[str, Any]]: The parts by their names, in the order of part_names.
+        """
+        parts: dict[str, dict[str, Any]] = {}
+        for part_name in part_names:
+            if part_name == "project":
+                parts[part_name] = {
+                    "page_number": len(self.get_pdf_document()),
+                    "current_page": self.current_page,
+                    "tesseract_path": self.tesseract_config.command_path,
+                    "tesseract_arguments": self.tesseract_config.extra_arguments,
+                    "tesseract_language_1": self.tesseract_config.language_1,
+                    "tesseract_language_2": self.tesseract_config.language_2,
+                    "tesseract_ocr_workers": self.tesseract_config.ocr_workers,
+                    "tesseract_ocr_engine": self.tesseract_config.ocr_engine,
+                    "tesseract_is_text_layer_used": self.tesseract_config.is_text_layer_used,
                 }
+            elif part_name == "config":
+                parts[part_name] = {
+                    "x_zoom": self.current_image_config.x_zoom,
+                    "y_zoom": self.current_image_config.y_zoom,
+                    "rotation": self.current_image_config.rotation,
+                    "dpi": self.current_image_config.dpi,
+                    "is_binarized": self.current_image_config.is_binarized,
+                    "binarization_method": self.current_image_config.binarization_method,
+                    "binarization_threshold": self.current_image_config.binarization_threshold,
+                }
+            elif part_name == "rects":
+                parts[part_name] = {
+                    "rects": [
+                        {
+                            "x": rect.coord_x,
+                            "y": rect.coord_y,
+                            "w": rect.width,
+                            "h": rect.height,
+                            "language_state": rect.language_state,
+                        }
+                        for rect in self.current_image_config.rects
+                    ]
+                }
+            elif part_name == "transcript":
+                parts[part_name] = {"text": self.get_current_image_transcript()}
+            elif part_name == "image":
+                self.ensure_current_transformed_image_existence()
+                width, height = self.get_current_transformed_image().size
+                parts[part_name] = {
+                    "image_version": self.get_current_image_version(),
+                    "image_width": width,
+                    "image_height": height,
+                }
+        return parts
+
+    def get_native_page_image(self, *, page: int) -> NativePageImage | None:
+        """Returns the embedded image of the given page if the page consists of nothing but it.
+
+        The result of get_native_page_image() (see render.py) is cached per page.
+
+        Args:
+            page (int): The page's number.
+
+        Returns:
+            NativePageImage | None: The page's image or None if the page has to be rasterized.
+        """
+        if page not in self.native_page_images:
+            self.native_page_images[page] = get_native_page_image(
+                page=self.get_pdf_document().load_page(page - 1)
             )
-        data_update_json = {
-            "page_number": len(self.pdf_document),
-            "current_page": self.current_page,
-            "tesseract_path": self.tesseract_config.command_path,
-            "tesseract_arguments": self.tesseract_config.extra_arguments,
-            "tesseract_language_1": self.tesseract_config.language_1,
-            "tesseract_language_2": self.tesseract_config.language_2,
-            "x_zoom": self.current_image_config.x_zoom,
-            "y_zoom": self.current_image_config.y_zoom,
-            "text": self.get_current_image_transcript(),
-            "rotation": self.current_image_config.rotation,
-            "dpi": self.current_image_config.dpi,
-            "is_binarized": self.current_image_config.is_binarized,
-            "binarization_threshold": self.current_image_config.binarization_threshold,
-            "rects": rects,
-            "image_base64": base64_str,
-        }
-        return data_update_json
+        return self.native_page_images[page]
+
+    def get_ocr_engine(self) -> OCREngine:
+        """Returns the OCR engine of the current TesseractConfig.
+
+        The engine is kept (including its worker pool) until the engine type, the Tesseract
+        path or the number of workers changes.
+
+        Returns:
+            OCREngine: The OCR engine.
+        """
+        engine_type = (
+            TesseractBatchEngine
+            if self.tesseract_config.ocr_engine == "batch"
+            else OCREngine
+        )
+        command_path = self.tesseract_config.command_path or "tesseract"
+        workers = self.tesseract_config.ocr_workers or os.cpu_count() or 1
+        if (
+            (type(self.ocr_engine) is not engine_type)
+            or (self.ocr_engine.command_path != command_path)
+            or (self.ocr_engine.workers != workers)
+        ):
+            if self.ocr_engine is not None:
+                self.ocr_engine.shutdown()
+            self.ocr_engine = create_ocr_engine(
+                engine=self.tesseract_config.ocr_engine,
+                command_path=command_path,
+                workers=workers,
+            )
+        return self.ocr_engine
+
+    def get_pdf_document(self) -> fitz.Document:
+        """Returns the mupdf instance of the project's PDF, which is reopened if it was released.
+
+        Returns:
+            fitz.Document: The mupdf instance.
+        """
+        if self.pdf_document.is_closed:
+            self.pdf_document = fitz.open(self.get_project_pdf_file_path())
+            self._start_prefetcher()
+        return self.pdf_document
 
-    def load_ocra_project(self, *, folder_path: str) -> None:
+    def get_rect_language(self, *, rect: Rect) -> str:
+        """Returns the Tesseract language string of the given Rect.
+
+        Unset languages are replaced by 'eng'.
+
+        Args:
+            rect (Rect): The Rect.
+
+        Returns:
+            str: The Tesseract language string, e.g. 'eng' or 'eng+deu'.
+        """
+        get_lang_string = lambda string: string if (string != "") else "eng"
+
+        if rect.language_state == "1":
+            return get_lang_string(self.tesseract_config.language_1)
+        elif rect.language_state == "2":
+            return get_lang_string(self.tesseract_config.language_2)
+        return (
+            get_lang_string(self.tesseract_config.language_1)
+            + "+"
+            + get_lang_string(self.tesseract_config.language_2)
+        )
+
+    def load_ocra_project(
+        self, *, folder_path: str, is_current_page_prepared: bool = True
+    ) -> None:
         """Load an already existing OCRA project from its folder.
 
         Args:
             folder_path (str): The OCRA project's folder path.
+            is_current_page_prepared (bool, optional): If true, the current page's ImageConfig
+             is created if missing, its image is rendered and the neighbouring pages are
+             prefetched. Headless runs (e.g. batch OCR) which work on other pages set it to
+             false. Defaults to True.
         """
         folder_path = standardize_folder_path(folder_path=folder_path)
         self.folder_path = folder_path
 
         pdf_destination = self.get_project_pdf_file_path()
+        self.display_list_cache.clear()
+        self.native_page_images = {}
+        self.pdf_document.close()
         self.pdf_document = fitz.open(pdf_destination)
-
+        self.current_transformed_image = None
+        self.current_transformed_image_page = 0
+        self.written_image_cache_keys = {}
+        self.project_token = uuid.uuid4().hex[:8]
+        with self.encoded_images_lock:
+            self.encoded_images.clear()
+        self.rect_image_store.clear()
+        self.tile_cache.clear()
+        if self.get_shared_image_cache is not None:
+            self.image_cache = self.get_shared_image_cache(pdf_destination)
+        else:
+            self.image_cache.set_disk_folder_path(
+                folder_path=(
+                    self.get_image_cache_path()
+                    if self.image_cache.disk_budget > 0
+                    else None
+                )
+            )
+        if self.prefetcher is not None:
+            self.prefetcher.shutdown()
+            self.prefetcher = None
+        self._start_prefetcher()
+
+        self.project_store.close()
+        self.project_store = self._open_project_store()
+        self.page_index.load(project_store=self.project_store)
         self.tesseract_config = parse_obj_as(
-            TesseractConfig, json_load(file_path=self.get_tesseract_config_file_path())
+            TesseractConfig, self.project_store.read_tesseract_config()
         )
-        self.current_page: int = json_load(file_path=self.get_current_page_file_path())
+        self.current_page: int = self.project_store.read_current_page()
+        if is_current_page_prepared:
+            self.ensure_current_image_config()
         self.current_image_config = self.get_current_image_config()
 
-        self.ensure_current_transformed_image_existence()
+        if is_current_page_prepared:
+            self.ensure_current_transformed_image_existence()
+            self.prefetch_neighbour_pages()
 
     def move_to_page(self, *, new_page: int) -> None:
         """Loads the content and settings of the new page (or creates it if not already existing).
@@ -450,51 +1188,111 @@ class OCRAProject:
         Args:
             new_page (int): The new page's number.
         """
-        self.current_page = new_page
+        # The previous page's pending changes are written before the page change
+        self.project_store.flush()
+        with self.page_lock:
+            self.current_page = new_page
+            # The previous page's full-DPI Rect crops are not kept
+            self.rect_image_store.keep_page(page=new_page)
+            self.ensure_current_image_config()
+            self.write_current_page()
+            self.current_image_config = self.get_current_image_config()
         self.ensure_current_transformed_image_existence()
-        self.ensure_current_image_config()
-        self.write_current_page()
-        self.current_image_config = self.get_current_image_config()
-        self.data_update_json()
+        self.prefetch_neighbour_pages()
 
-    def perform_ocr(self) -> str:
+    def perform_ocr(
+        self, *, report_progress: Callable[[int, int], None] | None = None
+    ) -> str:
         """Performs a Tesseract OCR on the current page with the current settings.
 
+        If the TesseractConfig's is_text_layer_used is true, Tesseract only runs for the Rects
+        without text in the PDF's text layer, and each Rect's start marker states whether its
+        text is from the "text layer" or from "tesseract".
+
+        Args:
+            report_progress (Callable[[int, int], None] | None, optional): If given, it is
+             called with the numbers of OCRed and all Rects during the OCR. Defaults to None.
+
         Returns:
             str: The OCR result text.
         """
-        get_lang_string = lambda string: string if (string != "") else "eng"
+        rects = self.current_image_config.rects
+        is_text_layer_used = self.tesseract_config.is_text_layer_used
+        if is_text_layer_used:
+            text_layer_texts = self.get_current_rect_text_layer_texts()
+        else:
+            text_layer_texts = [None] * len(rects)
+        ocr_rect_indexes = [
+            rect_index
+            for rect_index, text in enumerate(text_layer_texts)
+            if text is None
+        ]
+        if self.is_rect_image_export_active:
+            self.create_rect_images()
 
-        pytesseract.pytesseract.tesseract_cmd = self.tesseract_config.command_path
-        self.create_rect_images()
-        rect_image_paths = self.get_existing_current_rect_images()
-        ocr_string = f"~PAGE {self.current_page}~\n"
-        rect_counter = 0
-        for rect_image_path in rect_image_paths:
-            rect_image_path = self.get_rect_images_path() + rect_image_path
-            current_rect = self.current_image_config.rects[rect_counter]
-            if current_rect.language_state == "1":
-                lang = get_lang_string(self.tesseract_config.language_1)
-            elif current_rect.language_state == "2":
-                lang = get_lang_string(self.tesseract_config.language_2)
-            elif current_rect.language_state == "1_and_2":
-                lang = (
-                    get_lang_string(self.tesseract_config.language_1)
-                    + "+"
-                    + get_lang_string(self.tesseract_config.language_2)
-                )
+        tesseract_results: list[str] = []
+        # If all Rects have a text layer, the page image is not even rendered
+        if ocr_rect_indexes or (not is_text_layer_used):
+            rect_images = self.get_current_rect_images(rect_indexes=ocr_rect_indexes)
             config = self.tesseract_config.extra_arguments
-            with Image.open(rect_image_path) as rect_image:
-                tesseract_result = pytesseract.image_to_string(
-                    image=rect_image, lang=lang, config=config
-                )
-            ocr_string += f"↓↓↓↓↓START RECT # {rect_counter}\n"
-            ocr_string += tesseract_result
+            langs = [
+                self.get_rect_language(rect=rects[rect_index])
+                for rect_index in ocr_rect_indexes
+            ]
+            text_layer_count = len(rects) - len(ocr_rect_indexes)
+            tesseract_results = self.get_ocr_engine().ocr_images(
+                images=rect_images,
+                langs=langs,
+                config=config,
+                report_progress=(
+                    None
+                    if report_progress is None
+                    else lambda done, total: report_progress(
+                        done + text_layer_count, total + text_layer_count
+                    )
+                ),
+            )
+
+        ocr_string = f"~PAGE {self.current_page}~\n"
+        tesseract_result_iterator = iter(tesseract_results)
+        for rect_counter, text_layer_text in enumerate(text_layer_texts):
+            if text_layer_text is None:
+                text, source = next(tesseract_result_iterator), "tesseract"
+            else:
+                text, source = text_layer_text, "text layer"
+            ocr_string += f"↓↓↓↓↓START RECT # {rect_counter}"
+            ocr_string += f" ({source})\n" if is_text_layer_used else "\n"
+            ocr_string += text
             ocr_string += f"↑↑↑↑↑END RECT # {rect_counter}\n"
-            rect_image.close()
-            rect_counter += 1
         return ocr_string
 
+    def prefetch_neighbour_pages(self) -> None:
+        """Starts the background rendering of the pages around the current page.
+
+        Each page is rendered with its own stored ImageConfig.
+        """
+        if self.prefetcher is None:
+            return
+        self.prefetcher.prefetch(
+            center_page=self.current_page,
+            page_count=len(self.get_pdf_document()),
+            get_cache_key=lambda page: self.get_page_image_cache_key(page=page),
+        )
+
+    def release_pdf_document(self) -> None:
+        """Closes the mupdf instance of the PDF and stops the prefetching worker processes.
+
+        This frees their file handles and memory while the project is idle. Both are
+        restarted by the next get_pdf_document() call. Does nothing if no project is loaded.
+        """
+        if (not self.folder_path) or self.pdf_document.is_closed:
+            return
+        self.display_list_cache.clear()
+        self.pdf_document.close()
+        if self.prefetcher is not None:
+            self.prefetcher.shutdown()
+            self.prefetcher = None
+
     def set_changed_image_config_from_json(
         self, *, config_json: dict[str, float | int | bool]
     ) -> bool:
@@ -512,6 +1310,9 @@ class OCRAProject:
             rotation=config_json["rotation"],
             is_binarized=config_json["is_binarized"],
             binarization_threshold=config_json["binarization_threshold"],
+            binarization_method=config_json.get(
+                "binarization_method", self.current_image_config.binarization_method
+            ),
             dpi=config_json["dpi"],
             rects=self.current_image_config.rects,
         )
@@ -526,6 +1327,11 @@ class OCRAProject:
             != self.current_image_config.binarization_threshold
         ):
             is_effectively_changed = True
+        if (
+            new_image_config.binarization_method
+            != self.current_image_config.binarization_method
+        ):
+            is_effectively_changed = True
         if new_image_config.dpi != self.current_image_config.dpi:
             is_effectively_changed = True
 
@@ -537,11 +1343,16 @@ class OCRAProject:
         self.transform_current_image()
         return True
 
-    def set_changed_rects_from_json(self, *, rects_json: dict[str, float]) -> None:
-        """Set the Rects of the current page according to the ones from the given JSON.
+    def set_changed_rects_from_json(
+        self, *, rects_json: dict[str, float], page: int | None = None
+    ) -> None:
+        """Set the Rects of the given page according to the ones from the given JSON.
 
         Args:
             rects_json (dict[str, float]): A JSON describing the new Rects list.
+            page (int | None, optional): The Rects' page, which does not have to be the current
+             one, e.g. if the browser's edit arrives after a page change. If None, the current
+             page is used. Defaults to None.
         """
         new_rects: list[Rect] = []
         for json_rect in rects_json:
@@ -553,30 +1364,107 @@ class OCRAProject:
                 language_state=json_rect["language_state"],
             )
             new_rects.append(new_rect)
-        self.current_image_config.rects = new_rects
-        self.write_current_image_config()
+        with self.page_lock:
+            if (page is None) or (page == self.current_page):
+                self.current_image_config.rects = new_rects
+                self.write_current_image_config()
+                return
+            image_config = self.get_page_image_config(page=page)
+            image_config.rects = new_rects
+            self.page_index.set_image_config(page=page, image_config=image_config)
+            self.project_store.write_image_config(
+                page=page, image_config_json=image_config.dict()
+            )
 
     def transform_current_image(self) -> None:
-        """Transforms the current PDF page's image according to the user settings."""
+        """Transforms the current PDF page's image according to the user settings.
+
+        The page is rendered, rotated and binarized in memory. Base rasterizations
+        (per page and DPI), rotated images (per page, DPI and rotation) and transformed
+        images are taken from the image cache if possible. New base rasterizations replay
+        the page's cached display list, i.e., the page is only parsed once. Pages which
+        consist of nothing but one embedded image (e.g. scans) are not rasterized, but
+        their image is extracted at its native resolution (see get_native_page_image()). The resulting image is kept as
+        current_transformed_image and written to its file in the background. The stage
+        durations are stored in last_render_timer.
+        """
         self.ensure_current_image_config()
 
-        image_path = self.get_current_transformed_image_file_path()
-
-        page = self.pdf_document.load_page(self.current_page - 1)
-        image = page.get_pixmap(
-            matrix=fitz.Matrix(
-                self.current_image_config.dpi / 72, self.current_image_config.dpi / 72
+        timer = StageTimer()
+        cache_key = self.get_current_image_cache_key()
+        with timer.stage("cache_lookup"):
+            image = self.image_cache.get(cache_key)
+        if image is None:
+            # Each stage (rasterize -> rotate -> binarize) is cached on its own inputs, so
+            # that e.g. a threshold change only re-runs the binarization.
+            image_config = self.current_image_config
+            rotated_cache_key = (
+                self.current_page,
+                image_config.dpi,
+                image_config.rotation % 360,
             )
-        )
-
-        image.save(image_path)
-        image = Image.open(image_path)
-        image = image.rotate(self.current_image_config.rotation)
-        if self.current_image_config.is_binarized:
-            image = image.convert("1", dither=Image.NONE)
-            image = image.point(
-                lambda p: p > self.current_image_config.binarization_threshold and 255
+            with timer.stage("cache_lookup"):
+                rotated_image = self.image_cache.get(rotated_cache_key)
+            if rotated_image is None:
+                base_cache_key = (self.current_page, image_config.dpi)
+                with timer.stage("cache_lookup"):
+                    base_image = self.image_cache.get(base_cache_key)
+                if base_image is None:
+                    with timer.stage("load_page"):
+                        native_page_image = self.get_native_page_image(
+                            page=self.current_page
+                        )
+                    if native_page_image is not None:
+                        with timer.stage("extract_image"):
+                            base_image = extract_native_page_image(
+                                document=self.get_pdf_document(),
+                                native_page_image=native_page_image,
+                                dpi=image_config.dpi,
+                            )
+                    else:
+                        with timer.stage("load_page"):
+                            display_list = self.display_list_cache.get(
+                                document=self.get_pdf_document(),
+                                page=self.current_page,
+                            )
+                        with timer.stage("rasterize"):
+                            pixmap = rasterize_display_list(
+                                display_list=display_list, dpi=image_config.dpi
+                            )
+                        with timer.stage("to_image"):
+                            base_image = pixmap_to_image(pixmap=pixmap)
+                    self.image_cache.put(base_cache_key, base_image)
+                rotated_image = transform_image(
+                    image=base_image,
+                    rotation=image_config.rotation,
+                    is_binarized=False,
+                    binarization_method="",
+                    binarization_threshold=0,
+                    timer=timer,
+                )
+                if rotated_image is not base_image:
+                    self.image_cache.put(rotated_cache_key, rotated_image)
+            image = transform_image(
+                image=rotated_image,
+                rotation=0,
+                is_binarized=image_config.is_binarized,
+                binarization_method=image_config.binarization_method,
+                binarization_threshold=image_config.binarization_threshold,
+                timer=timer,
             )
+            if image is not rotated_image:
+                self.image_cache.put(cache_key, image)
 
-        image.save(image_path)
-        image.close()
+        if self.is_transformed_image_export_active and (
+            self.written_image_cache_keys.get(self.current_page) != cache_key
+        ):
+            with timer.stage("schedule_write"):
+                self.image_writer.schedule(
+                    path=self.get_current_transformed_image_file_path(), image=image
+                )
+            self.written_image_cache_keys[self.current_page] = cache_key
+        self.current_transformed_image = image
+        self.current_transformed_image_page = self.current_page
+        self.last_render_timer = timer
+        for stage_name, duration in timer.durations.items():
+            g_render_stage_seconds.observe(duration / 1000, stage=stage_name)
@@ -0,0 +1,158 @@
+"""Background prefetching of the pages around the currently shown PDF page.
+
+The pages are rendered in worker processes so that the rasterization,
+which holds the GIL in mupdf, never blocks the server's own rendering
+of the page the user actually moved to.
+"""
+
+# IMPORTS SECTION #
+## EXTERNAL IMPORTS ##
+import fitz
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from PIL import Image
+from typing import Callable
+
+## INTERNAL IMPORTS ##
+from image_cache import PageImageCache
+from render import render_page_image
+
+# GLOBAL VARIABLES SECTION #
+_g_worker_document: fitz.Document | None = None
+"""The worker process's own mupdf instance of the prefetched PDF."""
+
+
+# WORKER FUNCTIONS SECTION #
+def _init_worker(pdf_file_path: str) -> None:
+    global _g_worker_document
+    _g_worker_document = fitz.open(pdf_file_path)
+
+
+def _render_page(
+    page: int,
+    dpi: int,
+    rotation: int,
+    is_binarized: bool,
+    binarization_method: str,
+    binarization_threshold: int,
+) -> tuple[str, tuple[int, int], bytes]:
+    image = render_page_image(
+        page=_g_worker_document.load_page(page - 1),
+        dpi=dpi,
+        rotation=rotation,
+        is_binarized=is_binarized,
+        binarization_method=binarization_method,
+        binarization_threshold=binarization_threshold,
+    )
+    return image.mode, image.size, image.tobytes()
+
+
+# CLASS DEFINITIONS SECTION #
+class PagePrefetcher:
+    """Renders the pages N±1..N±radius of a shown page N into a PageImageCache.
+
+    The cache keys have the form (page, dpi, rotation, is_binarized, binarization_method,
+    binarization_threshold), i.e., as returned by image_cache.get_image_cache_key().
+    """
+
+    def __init__(
+        self,
+        *,
+        pdf_file_path: str,
+        image_cache: PageImageCache,
+        radius: int,
+        max_workers: int,
+    ):
+        """Start-up of the (lazily started) worker pool.
+
+        Args:
+            pdf_file_path (str): The PDF file's path. Each worker process opens it once.
+            image_cache (PageImageCache): The cache in which the prefetched images are stored.
+            radius (int): The number of prefetched pages in each direction. If 0, nothing is prefetched.
+            max_workers (int): The number of worker processes.
+        """
+        self.image_cache: PageImageCache = image_cache
+        """The cache in which the prefetched images are stored."""
+        self.radius: int = radius
+        """The number of prefetched pages in each direction."""
+        self._lock = threading.Lock()
+        self._jobs: dict[int, tuple[tuple, Future]] = {}
+        self._executor = ProcessPoolExecutor(
+            max_workers=max(1, max_workers),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(pdf_file_path,),
+        )
+
+    def _store(self, cache_key: tuple, future: Future) -> None:
+        if future.cancelled() or (future.exception() is not None):
+            return
+        mode, size, data = future.result()
+        self.image_cache.put(cache_key, Image.frombytes(mode, size, data))
+
+    def cancel(self, *, page: int) -> None:
+        """Cancels the prefetch job of the given page if it has not started yet.
+
+        Args:
+            page (int): The page's number.
+        """
+        with self._lock:
+            if page in self._jobs:
+                _, future = self._jobs[page]
+                if future.cancel():
+                    del self._jobs[page]
+
+    def prefetch(
+        self,
+        *,
+        center_page: int,
+        page_count: int,
+        get_cache_key: Callable[[int], tuple],
+    ) -> None:
+        """Schedules the rendering of the pages around the given page.
+
+        The nearest pages are scheduled first. Jobs of pages which are no longer in the
+        neighbourhood, or whose settings changed, are cancelled if they have not started
+        yet. Pages which are already cached or in flight are not scheduled again.
+        Prefetching is best-effort, i.e., if the worker pool breaks, it is deactivated.
+
+        Args:
+            center_page (int): The shown page's number.
+            page_count (int): The PDF's number of pages.
+            get_cache_key (Callable[[int], tuple]): Returns the cache key, i.e., the stored
+             render settings, of the given page number.
+        """
+        wanted_pages: list[int] = []
+        for distance in range(1, self.radius + 1):
+            for page in (center_page + distance, center_page - distance):
+                if 1 <= page <= page_count:
+                    wanted_pages.append(page)
+        wanted_cache_keys = {page: get_cache_key(page) for page in wanted_pages}
+
+        with self._lock:
+            for page, (cache_key, future) in list(self._jobs.items()):
+                if future.done():
+                    del self._jobs[page]
+                elif wanted_cache_keys.get(page) != cache_key:
+                    future.cancel()
+                    del self._jobs[page]
+            for page in wanted_pages:
+                cache_key = wanted_cache_keys[page]
+                if (page in self._jobs) or self.image_cache.contains(cache_key):
+                    continue
+                try:
+                    future = self._executor.submit(_render_page, *cache_key)
+                except BrokenProcessPool:
+                    self.radius = 0
+                    return
+                future.add_done_callback(partial(self._store, cache_key))
+                self._jobs[page] = (cache_key, future)
+
+    def shutdown(self) -> None:
+        """Cancels all waiting jobs and stops the worker processes without waiting for them."""
+        with self._lock:
+            self._jobs.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
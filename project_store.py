@@ -0,0 +1,647 @@
+"""Storage of an OCRA project's page data, current page and Tesseract config.
+
+Two project stores are available:
+* "folder": The classic project folder layout, i.e., one JSON file per
+  page in image_configs/, one text file per page in image_transcripts/,
+  current_page.json and tesseract_config.json.
+* "sqlite": A single SQLite database file (project.sqlite) in the project
+  folder, in WAL mode. Opening, iterating over and exporting large projects
+  then touches one file instead of thousands, and a batch of writes (see
+  ProjectStore.batch()) is committed as one transaction.
+In both cases, the PDF itself stays as file.pdf in the project folder. If a
+project folder contains a project.sqlite, the SQLite store is used.
+
+Either store can be wrapped in a WriteBehindProjectStore, which keeps changed
+data in memory and writes it in the background shortly afterwards, so that
+e.g. drawing Rects or typing a transcript in the browser does not write to
+the disk on each event.
+
+Projects can be copied between the stores (i.e., imported and exported)
+through copy_project() or on the command line:
+
+```sh
+python project_store.py path/to/folder_project path/to/new_sqlite_project --store sqlite
+```
+"""
+
+# IMPORTS SECTION #
+## EXTERNAL IMPORTS ##
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from shutil import copy
+from typing import Any, Iterator
+
+## INTERNAL IMPORTS ##
+from metrics import g_write_seconds
+from utils import (
+    atomic_write,
+    ensure_folder_existence,
+    is_file_existing,
+    json_load,
+    standardize_file_path,
+    standardize_folder_path,
+    sync_file,
+)
+
+# CONSTANTS SECTION #
+SQLITE_FILE_NAME: str = "project.sqlite"
+"""The file name of the SQLite store's database in the project folder."""
+PROJECT_STORE_TYPES: tuple[str, ...] = ("folder", "sqlite")
+"""The names of all project store types, see this module's description."""
+
+
+# CLASS DEFINITIONS SECTION #
+class ProjectStore:
+    """Base class of all project stores. Its default behavior is the one of the "folder" store."""
+
+    def __init__(self, *, folder_path: str):
+        """Start-up of the store of the given project folder.
+
+        Args:
+            folder_path (str): The OCRA project's folder path.
+        """
+        self.folder_path: str = (
+            standardize_folder_path(folder_path=folder_path) if folder_path else ""
+        )
+        """The OCRA project's full folder path."""
+        self._unsynced_lock = threading.Lock()
+        self._unsynced_file_paths: set[str] = set()
+
+    def _get_image_config_file_path(self, page: int) -> str:
+        return f"{self.folder_path}image_configs/{page}.json"
+
+    def _get_transcript_file_path(self, page: int) -> str:
+        return f"{self.folder_path}image_transcripts/{page}.txt"
+
+    def _get_page_numbers(self, folder_name: str, extension: str) -> list[int]:
+        folder_path = f"{self.folder_path}{folder_name}/"
+        if not os.path.isdir(folder_path):
+            return []
+        return sorted(
+            int(filename[: -len(extension)])
+            for filename in os.listdir(folder_path)
+            if filename.endswith(extension) and filename[: -len(extension)].isdigit()
+        )
+
+    def _write_file(self, file_path: str, text: str) -> None:
+        with g_write_seconds.time(kind="file"):
+            atomic_write(file_path=file_path, text=text)
+        with self._unsynced_lock:
+            self._unsynced_file_paths.add(file_path)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Groups the writes inside of the with block, e.g. of an import.
+
+        The folder store writes each file at once, i.e., the block has no effect.
+        """
+        yield
+
+    def close(self) -> None:
+        """Releases the store's resources. The folder store syncs its written files, see flush()."""
+        self.flush()
+
+    def flush(self) -> None:
+        """Writes all data which is not written yet and syncs it to disk.
+
+        The folder store writes each file at once, but only syncs (fsync) the files
+        which were written since the last flush here, i.e., off the request path.
+        """
+        with self._unsynced_lock:
+            file_paths = self._unsynced_file_paths
+            self._unsynced_file_paths = set()
+        if not file_paths:
+            return
+        with g_write_seconds.time(kind="sync"):
+            for file_path in file_paths:
+                try:
+                    sync_file(file_path=file_path)
+                except FileNotFoundError:
+                    pass
+
+    def initialize(self) -> None:
+        """Creates the store's (empty) structure in the project folder."""
+        ensure_folder_existence(folder_path=f"{self.folder_path}image_configs/")
+        ensure_folder_existence(folder_path=f"{self.folder_path}image_transcripts/")
+
+    def has_image_config(self, *, page: int) -> bool:
+        """Returns whether or not an ImageConfig of the given page is stored.
+
+        Args:
+            page (int): The page's number.
+
+        Returns:
+            bool: Is true if the page's ImageConfig is stored.
+        """
+        return is_file_existing(filepath=self._get_image_config_file_path(page))
+
+    def read_current_page(self) -> int:
+        """Returns the stored current page number.
+
+        Returns:
+            int: The current page's number.
+        """
+        return json_load(
+            file_path=standardize_file_path(
+                file_path=f"{self.folder_path}current_page.json"
+            )
+        )
+
+    def read_image_config(self, *, page: int) -> dict[str, Any] | None:
+        """Returns the stored ImageConfig JSON of the given page.
+
+        Args:
+            page (int): The page's number.
+
+        Returns:
+            dict[str, Any] | None: The ImageConfig JSON or None if none is stored.
+        """
+        file_path = self._get_image_config_file_path(page)
+        if not is_file_existing(filepath=file_path):
+            return None
+        return json_load(file_path=file_path)
+
+    def read_image_configs(self) -> dict[int, dict[str, Any]]:
+        """Returns the ImageConfig JSONs of all pages which have one.
+
+        Returns:
+            dict[int, dict[str, Any]]: The ImageConfig JSONs by page number, in page order.
+        """
+        return {
+            page: json_load(file_path=self._get_image_config_file_path(page))
+            for page in self._get_page_numbers("image_configs", ".json")
+        }
+
+    def read_tesseract_config(self) -> dict[str, Any]:
+        """Returns the stored TesseractConfig JSON.
+
+        Returns:
+            dict[str, Any]: The TesseractConfig JSON.
+        """
+        return json_load(
+            file_path=standardize_file_path(
+                file_path=f"{self.folder_path}tesseract_config.json"
+            )
+        )
+
+    def read_transcript(self, *, page: int) -> str:
+        """Returns the stored transcript text of the given page.
+
+        Args:
+            page (int): The page's number.
+
+        Returns:
+            str: The transcript text. Is empty if none is stored.
+        """
+        file_path = self._get_transcript_file_path(page)
+        if not is_file_existing(filepath=file_path):
+            return ""
+        with open(file_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def read_transcripts(self) -> dict[int, str]:
+        """Returns the transcript texts of all pages which have one.
+
+        Returns:
+            dict[int, str]: The transcript texts by page number, in page order.
+        """
+        return {
+            page: self.read_transcript(page=page)
+            for page in self._get_page_numbers("image_transcripts", ".txt")
+        }
+
+    def write_current_page(self, *, page: int) -> None:
+        """Stores the given current page number.
+
+        Args:
+            page (int): The current page's number.
+        """
+        self._write_file(
+            standardize_file_path(file_path=f"{self.folder_path}current_page.json"),
+            json.dumps(page, indent=4),
+        )
+
+    def write_image_config(
+        self, *, page: int, image_config_json: dict[str, Any]
+    ) -> None:
+        """Stores the given ImageConfig JSON of the given page.
+
+        Args:
+            page (int): The page's number.
+            image_config_json (dict[str, Any]): The ImageConfig JSON.
+        """
+        self._write_file(
+            self._get_image_config_file_path(page),
+            json.dumps(image_config_json, indent=4),
+        )
+
+    def write_tesseract_config(self, *, tesseract_config_json: dict[str, Any]) -> None:
+        """Stores the given TesseractConfig JSON.
+
+        Args:
+            tesseract_config_json (dict[str, Any]): The TesseractConfig JSON.
+        """
+        self._write_file(
+            standardize_file_path(file_path=f"{self.folder_path}tesseract_config.json"),
+            json.dumps(tesseract_config_json),
+        )
+
+    def write_transcript(self, *, page: int, text: str) -> None:
+        """Stores the given transcript text of the given page.
+
+        Args:
+            page (int): The page's number.
+            text (str): The transcript text.
+        """
+        self._write_file(self._get_transcript_file_path(page), text)
+
+
+class SQLiteProjectStore(ProjectStore):
+    """The "sqlite" project store. See this module's description."""
+
+    def __init__(self, *, folder_path: str):
+        """Opens (or creates) the project's SQLite database.
+
+        Args:
+            folder_path (str): The OCRA project's folder path.
+        """
+        super().__init__(folder_path=folder_path)
+        # The connection is shared by the server's request and job threads, and the
+        # lock keeps their statements (and a thread's batch) apart
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._connection = sqlite3.connect(
+            get_sqlite_file_path(folder_path=self.folder_path),
+            timeout=30.0,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+
+    def _read_value(self, key: str) -> Any:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM project WHERE key = ?", (key,)
+            ).fetchone()
+        return json.loads(row[0])
+
+    def _write(self, statement: str, parameters: tuple[Any, ...]) -> None:
+        with self._lock, g_write_seconds.time(kind="sqlite"):
+            self._connection.execute(statement, parameters)
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """Commits the writes inside of the with block as one transaction.
+
+        Nested blocks join the outermost block's transaction. If the block raises an
+        exception, its writes are rolled back.
+        """
+        with self._lock:
+            if self._batch_depth == 0:
+                self._connection.execute("BEGIN IMMEDIATE")
+            self._batch_depth += 1
+            try:
+                yield
+            except BaseException:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._connection.execute("ROLLBACK")
+                raise
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self._connection.execute("COMMIT")
+
+    def close(self) -> None:
+        """Closes the database connection."""
+        with self._lock:
+            self._connection.close()
+
+    def initialize(self) -> None:
+        """Creates the database's (empty) tables."""
+        with self.batch():
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS project (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS image_configs (page INTEGER PRIMARY KEY, config TEXT NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS transcripts (page INTEGER PRIMARY KEY, text TEXT NOT NULL)"
+            )
+
+    def has_image_config(self, *, page: int) -> bool:
+        with self._lock:
+            return (
+                self._connection.execute(
+                    "SELECT 1 FROM image_configs WHERE page = ?", (page,)
+                ).fetchone()
+                is not None
+            )
+
+    def read_current_page(self) -> int:
+        return self._read_value("current_page")
+
+    def read_image_config(self, *, page: int) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT config FROM image_configs WHERE page = ?", (page,)
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def read_image_configs(self) -> dict[int, dict[str, Any]]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT page, config FROM image_configs ORDER BY page"
+            ).fetchall()
+        return {page: json.loads(config) for page, config in rows}
+
+    def read_tesseract_config(self) -> dict[str, Any]:
+        return self._read_value("tesseract_config")
+
+    def read_transcript(self, *, page: int) -> str:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT text FROM transcripts WHERE page = ?", (page,)
+            ).fetchone()
+        return "" if row is None else row[0]
+
+    def read_transcripts(self) -> dict[int, str]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT page, text FROM transcripts ORDER BY page"
+            ).fetchall()
+        return dict(rows)
+
+    def write_current_page(self, *, page: int) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO project (key, value) VALUES ('current_page', ?)",
+            (json.dumps(page),),
+        )
+
+    def write_image_config(
+        self, *, page: int, image_config_json: dict[str, Any]
+    ) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO image_configs (page, config) VALUES (?, ?)",
+            (page, json.dumps(image_config_json, separators=(",", ":"))),
+        )
+
+    def write_tesseract_config(self, *, tesseract_config_json: dict[str, Any]) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO project (key, value) VALUES ('tesseract_config', ?)",
+            (json.dumps(tesseract_config_json),),
+        )
+
+    def write_transcript(self, *, page: int, text: str) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO transcripts (page, text) VALUES (?, ?)",
+            (page, text),
+        )
+
+
+class WriteBehindProjectStore(ProjectStore):
+    """Keeps written data in memory and writes it into the wrapped store later.
+
+    The pending data is written (as one batch) when the given delay elapsed after
+    the first not yet written change, when flush() is called (e.g., on a page change)
+    and when the store is closed (e.g., on shutdown). Until then, reads return the
+    pending data. If a write fails, its data stays pending for the next flush.
+    """
+
+    def __init__(self, *, project_store: ProjectStore, delay: float):
+        """Start-up of the (empty) pending data.
+
+        Args:
+            project_store (ProjectStore): The wrapped store, which gets the actual writes.
+            delay (float): The delay in seconds after which changed data is written.
+        """
+        super().__init__(folder_path=project_store.folder_path)
+        self.project_store: ProjectStore = project_store
+        """The wrapped store, which gets the actual writes."""
+        self.delay: float = delay
+        """The delay in seconds after which changed data is written."""
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: dict[tuple[str, int], Any] = {}
+        self._timer: threading.Timer | None = None
+
+    def _get_pending(self, kind: str, page: int = 0) -> Any:
+        with self._lock:
+            return self._pending.get((kind, page))
+
+    def _get_pending_pages(self, kind: str) -> dict[int, Any]:
+        with self._lock:
+            return {
+                page: value
+                for (pending_kind, page), value in self._pending.items()
+                if pending_kind == kind
+            }
+
+    def _set_pending(self, kind: str, page: int, value: Any) -> None:
+        with self._lock:
+            self._pending[(kind, page)] = value
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def close(self) -> None:
+        """Writes all pending data and closes the wrapped store."""
+        self.flush()
+        self.project_store.close()
+
+    def flush(self) -> None:
+        """Writes all pending data as one batch into the wrapped store."""
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                pending = dict(self._pending)
+            if not pending:
+                return
+            with g_write_seconds.time(kind="flush"), self.project_store.batch():
+                for (kind, page), value in pending.items():
+                    if kind == "current_page":
+                        self.project_store.write_current_page(page=value)
+                    elif kind == "image_config":
+                        self.project_store.write_image_config(
+                            page=page, image_config_json=value
+                        )
+                    elif kind == "tesseract_config":
+                        self.project_store.write_tesseract_config(
+                            tesseract_config_json=value
+                        )
+                    elif kind == "transcript":
+                        self.project_store.write_transcript(page=page, text=value)
+                self.project_store.flush()
+            # Data which changed again during the writes stays pending
+            with self._lock:
+                for key, value in pending.items():
+                    if self._pending.get(key) is value:
+                        del self._pending[key]
+
+    def initialize(self) -> None:
+        self.project_store.initialize()
+
+    def has_image_config(self, *, page: int) -> bool:
+        return (
+            self._get_pending("image_config", page) is not None
+        ) or self.project_store.has_image_config(page=page)
+
+    def read_current_page(self) -> int:
+        current_page = self._get_pending("current_page")
+        if current_page is None:
+            return self.project_store.read_current_page()
+        return current_page
+
+    def read_image_config(self, *, page: int) -> dict[str, Any] | None:
+        image_config_json = self._get_pending("image_config", page)
+        if image_config_json is None:
+            return self.project_store.read_image_config(page=page)
+        return image_config_json
+
+    def read_image_configs(self) -> dict[int, dict[str, Any]]:
+        image_configs = self.project_store.read_image_configs()
+        image_configs |= self._get_pending_pages("image_config")
+        return dict(sorted(image_configs.items()))
+
+    def read_tesseract_config(self) -> dict[str, Any]:
+        tesseract_config_json = self._get_pending("tesseract_config")
+        if tesseract_config_json is None:
+            return self.project_store.read_tesseract_config()
+        return tesseract_config_json
+
+    def read_transcript(self, *, page: int) -> str:
+        text = self._get_pending("transcript", page)
+        if text is None:
+            return self.project_store.read_transcript(page=page)
+        return text
+
+    def read_transcripts(self) -> dict[int, str]:
+        transcripts = self.project_store.read_transcripts()
+        transcripts |= self._get_pending_pages("transcript")
+        return dict(sorted(transcripts.items()))
+
+    def write_current_page(self, *, page: int) -> None:
+        self._set_pending("current_page", 0, page)
+
+    def write_image_config(
+        self, *, page: int, image_config_json: dict[str, Any]
+    ) -> None:
+        self._set_pending("image_config", page, image_config_json)
+
+    def write_tesseract_config(self, *, tesseract_config_json: dict[str, Any]) -> None:
+        self._set_pending("tesseract_config", 0, tesseract_config_json)
+
+    def write_transcript(self, *, page: int, text: str) -> None:
+        self._set_pending("transcript", page, text)
+
+
+# PUBLIC FUNCTIONS SECTION #
+def copy_project(
+    *, folder_path: str, destination_folder_path: str, store_type: str
+) -> None:
+    """Copies the given OCRA project into a new project folder with the given store type.
+
+    I.e., a folder project is imported into the SQLite store with store_type "sqlite",
+    and an SQLite project is exported to the folder layout with store_type "folder".
+    Only the PDF and the stored project data are copied, not the cached images.
+
+    Args:
+        folder_path (str): The source project's folder path.
+        destination_folder_path (str): The new project's folder path.
+        store_type (str): The new project's store type, one of PROJECT_STORE_TYPES.
+    """
+    folder_path = standardize_folder_path(folder_path=folder_path)
+    destination_folder_path = standardize_folder_path(
+        folder_path=destination_folder_path
+    )
+    ensure_folder_existence(folder_path=destination_folder_path)
+    copy(f"{folder_path}file.pdf", f"{destination_folder_path}file.pdf")
+
+    source_store = open_project_store(folder_path=folder_path)
+    destination_store = create_project_store(
+        folder_path=destination_folder_path, store_type=store_type
+    )
+    try:
+        with destination_store.batch():
+            destination_store.write_tesseract_config(
+                tesseract_config_json=source_store.read_tesseract_config()
+            )
+            destination_store.write_current_page(page=source_store.read_current_page())
+            for page, image_config_json in source_store.read_image_configs().items():
+                destination_store.write_image_config(
+                    page=page, image_config_json=image_config_json
+                )
+            for page, text in source_store.read_transcripts().items():
+                destination_store.write_transcript(page=page, text=text)
+    finally:
+        source_store.close()
+        destination_store.close()
+
+
+def create_project_store(*, folder_path: str, store_type: str) -> ProjectStore:
+    """Returns a new, initialized project store of the given type (see this module's description).
+
+    Args:
+        folder_path (str): The OCRA project's folder path.
+        store_type (str): Either "folder" or "sqlite".
+
+    Returns:
+        ProjectStore: The project store.
+    """
+    if store_type == "sqlite":
+        project_store: ProjectStore = SQLiteProjectStore(folder_path=folder_path)
+    else:
+        project_store = ProjectStore(folder_path=folder_path)
+    project_store.initialize()
+    return project_store
+
+
+def get_sqlite_file_path(*, folder_path: str) -> str:
+    """Returns the path of the SQLite store's database of the given project folder.
+
+    Args:
+        folder_path (str): The OCRA project's folder path.
+
+    Returns:
+        str: The database file's path.
+    """
+    return f"{standardize_folder_path(folder_path=folder_path)}{SQLITE_FILE_NAME}"
+
+
+def open_project_store(*, folder_path: str) -> ProjectStore:
+    """Returns the project store of the given existing project folder.
+
+    Args:
+        folder_path (str): The OCRA project's folder path.
+
+    Returns:
+        ProjectStore: The SQLite store if the folder contains its database, otherwise the folder store.
+    """
+    if is_file_existing(filepath=get_sqlite_file_path(folder_path=folder_path)):
+        return SQLiteProjectStore(folder_path=folder_path)
+    return ProjectStore(folder_path=folder_path)
+
+
+# MAIN ROUTINE SECTION #
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Copies an OCRA project into a new project folder with the given store type."
+    )
+    parser.add_argument("folder_path", help="The OCRA project's folder.")
+    parser.add_argument("destination_folder_path", help="The new project's folder.")
+    parser.add_argument("--store", choices=PROJECT_STORE_TYPES, default="sqlite")
+    args = parser.parse_args()
+
+    copy_project(
+        folder_path=args.folder_path,
+        destination_folder_path=args.destination_folder_path,
+        store_type=args.store,
+    )
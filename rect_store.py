@@ -0,0 +1,112 @@
+"""Indexed in-memory store of the cropped Rect images of PDF pages.
+
+The crops are full-DPI images, so that only the crops of a single page (i.e.,
+the current one) are kept, see RectImageStore.keep_page().
+"""
+
+# IMPORTS SECTION #
+## EXTERNAL IMPORTS ##
+import threading
+from PIL import Image
+from typing import Hashable
+
+## INTERNAL IMPORTS ##
+from image_cache import get_image_size_in_bytes
+
+
+# CLASS DEFINITIONS SECTION #
+class RectImageStore:
+    """Stores Rect crops addressed by (page, rect index) with O(1) lookup.
+
+    Each crop is stored together with a source key, e.g. the page image's cache key and
+    the Rect's box. A lookup only succeeds if the given source key is still the same, so
+    that crops of changed Rects or changed page images are never returned.
+    """
+
+    def __init__(self):
+        """Start-up of the crop storage."""
+        self._lock = threading.Lock()
+        self._images: dict[tuple[int, int], tuple[Hashable, Image.Image]] = {}
+        self._rect_counts: dict[int, int] = {}
+
+    def clear(self) -> None:
+        """Removes all stored crops."""
+        with self._lock:
+            self._images.clear()
+            self._rect_counts.clear()
+
+    def get(
+        self, *, page: int, rect_index: int, source_key: Hashable
+    ) -> Image.Image | None:
+        """Returns the stored crop of the given Rect if it was made from the given source.
+
+        Args:
+            page (int): The page's number.
+            rect_index (int): The Rect's index in the page's Rect list.
+            source_key (Hashable): The key of the crop's source (page image and Rect box).
+
+        Returns:
+            Image.Image | None: The crop or None if no up-to-date crop is stored.
+        """
+        with self._lock:
+            entry = self._images.get((page, rect_index))
+        if (entry is None) or (entry[0] != source_key):
+            return None
+        return entry[1]
+
+    def get_memory_size(self) -> int:
+        """Returns the summed size of all stored crops.
+
+        Returns:
+            int: The size in bytes.
+        """
+        with self._lock:
+            return sum(
+                get_image_size_in_bytes(image=image)
+                for _, image in self._images.values()
+            )
+
+    def keep_page(self, *, page: int) -> None:
+        """Removes the crops of all pages except the given one.
+
+        Args:
+            page (int): The page's number.
+        """
+        with self._lock:
+            if all(x == page for x in self._rect_counts):
+                return
+            self._images = {
+                key: value for key, value in self._images.items() if key[0] == page
+            }
+            self._rect_counts = {
+                x: count for x, count in self._rect_counts.items() if x == page
+            }
+
+    def put(
+        self, *, page: int, rect_index: int, source_key: Hashable, image: Image.Image
+    ) -> None:
+        """Stores the crop of the given Rect.
+
+        Args:
+            page (int): The page's number.
+            rect_index (int): The Rect's index in the page's Rect list.
+            source_key (Hashable): The key of the crop's source (page image and Rect box).
+            image (Image.Image): The crop.
+        """
+        with self._lock:
+            self._images[(page, rect_index)] = (source_key, image)
+            self._rect_counts[page] = max(
+                self._rect_counts.get(page, 0), rect_index + 1
+            )
+
+    def truncate_page(self, *, page: int, rect_count: int) -> None:
+        """Removes the crops of all Rects of the given page with an index >= rect_count.
+
+        Args:
+            page (int): The page's number.
+            rect_count (int): The page's current number of Rects.
+        """
+        with self._lock:
+            for rect_index in range(rect_count, self._rect_counts.get(page, 0)):
+                self._images.pop((page, rect_index), None)
+            self._rect_counts[page] = min(self._rect_counts.get(page, 0), rect_count)
@@ -0,0 +1,577 @@
+"""In-memory render pipeline helpers for OCRA's PDF page images.
+
+These helpers turn a PDF page into a transformed Pillow image without
+intermediate PNG files, measure the duration of each pipeline stage and
+write finished images to disk in the background.
+"""
+
+# IMPORTS SECTION #
+## EXTERNAL IMPORTS ##
+import argparse
+import fitz
+import math
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO
+from PIL import Image
+from time import perf_counter
+from typing import Iterator
+
+## INTERNAL IMPORTS ##
+from binarization import binarize_image
+
+# CONSTANTS SECTION #
+PREVIEW_REDUCTIONS: tuple[int, ...] = (1, 2, 4, 8)
+"""The levels of the preview image pyramid, as integer downscaling factors."""
+
+
+# UTILITY CLASS DEFINITIONS SECTION #
+class StageTimer:
+    """Measures the wall-clock duration of the named stages of a pipeline run."""
+
+    def __init__(self):
+        """Start-up of the stage duration storage."""
+        self.durations: dict[str, float] = {}
+        """The measured stage durations in milliseconds, in the order of their first measurement."""
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Measures the duration of the enclosed code block as the given stage.
+
+        If a stage is measured several times, its durations are summed up.
+
+        Args:
+            name (str): The stage's name.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            duration = (perf_counter() - start) * 1000
+            self.durations[name] = self.durations.get(name, 0.0) + duration
+
+    def get_total(self) -> float:
+        """Returns the summed duration of all stages.
+
+        Returns:
+            float: The summed duration of all stages in milliseconds.
+        """
+        return sum(self.durations.values())
+
+    def report(self) -> str:
+        """Returns a human-readable per-stage timing report.
+
+        Returns:
+            str: The report with one line per stage and a final total line.
+        """
+        lines = [
+            f"{name:<16}{duration:>10.1f} ms"
+            for name, duration in self.durations.items()
+        ]
+        lines.append(f"{'total':<16}{self.get_total():>10.1f} ms")
+        return "\n".join(lines)
+
+
+class BackgroundImageWriter:
+    """Writes images to disk in a background thread.
+
+    If an image is scheduled for a path which still has an unwritten image pending,
+    only the newest image is written. Until an image is written, it can be retrieved
+    through get_pending() so that readers never see an outdated file.
+    """
+
+    def __init__(self):
+        """Start-up of the writer thread and the pending image storage."""
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="ocra_writer"
+        )
+        self._lock = threading.Lock()
+        self._pending: dict[str, Image.Image] = {}
+        self._discarded: set[str] = set()
+        self._futures: list[Future] = []
+
+    def _write(self, path: str) -> None:
+        with self._lock:
+            image = self._pending.get(path)
+        if image is None:
+            return
+        # Unique per process, as e.g. batch OCR workers may write the same page image
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        image.save(temp_path, format="PNG")
+        os.replace(temp_path, path)
+        with self._lock:
+            if path in self._discarded:
+                self._discarded.remove(path)
+                os.remove(path)
+            elif self._pending.get(path) is image:
+                del self._pending[path]
+
+    def discard(self, path: str) -> bool:
+        """Cancels the pending write of the given path.
+
+        If the image is currently being written, the written file is deleted afterwards.
+
+        Args:
+            path (str): The image file's path.
+
+        Returns:
+            bool: Is true if a pending write was cancelled, false if nothing was pending.
+        """
+        with self._lock:
+            if self._pending.pop(path, None) is None:
+                return False
+            self._discarded.add(path)
+            return True
+
+    def flush(self) -> None:
+        """Blocks until all scheduled images are written."""
+        with self._lock:
+            futures = self._futures
+            self._futures = []
+        for future in futures:
+            future.result()
+
+    def get_pending(self, path: str) -> Image.Image | None:
+        """Returns the not yet written image for the given path.
+
+        Args:
+            path (str): The image file's path.
+
+        Returns:
+            Image.Image | None: The pending image or None if nothing is pending for the path.
+        """
+        with self._lock:
+            return self._pending.get(path)
+
+    def schedule(self, *, path: str, image: Image.Image) -> None:
+        """Schedules the given image to be written as PNG at the given path.
+
+        Args:
+            path (str): The image file's path.
+            image (Image.Image): The image which shall be written.
+        """
+        with self._lock:
+            self._pending[path] = image
+            self._discarded.discard(path)
+            self._futures = [x for x in self._futures if not x.done()]
+            self._futures.append(self._executor.submit(self._write, path))
+
+
+class NativePageImage:
+    """The embedded image of a PDF page which consists of nothing but this image (e.g. a scan)."""
+
+    def __init__(self, *, xref: int, native_dpi: int, page_rect: fitz.Rect):
+        """Start-up of the image description.
+
+        Args:
+            xref (int): The PDF cross-reference number of the image.
+            native_dpi (int): The image's own resolution on the page in DPI.
+            page_rect (fitz.Rect): The page's rectangle in points.
+        """
+        self.xref: int = xref
+        """The PDF cross-reference number of the image."""
+        self.native_dpi: int = native_dpi
+        """The image's own resolution on the page in DPI."""
+        self.page_rect: fitz.Rect = page_rect
+        """The page's rectangle in points."""
+
+
+# PUBLIC FUNCTIONS SECTION #
+def encode_display_image(*, image: Image.Image, is_lossless: bool) -> tuple[bytes, str]:
+    """Returns the given image encoded for display in the browser.
+
+    Args:
+        image (Image.Image): The image.
+        is_lossless (bool): If true, the image is encoded as PNG, otherwise as (much
+         smaller) JPEG.
+
+    Returns:
+        tuple[bytes, str]: The encoded image and its MIME type.
+    """
+    buffer = BytesIO()
+    if is_lossless:
+        image.save(buffer, format="PNG")
+        return buffer.getvalue(), "image/png"
+    if image.mode not in ("L", "RGB"):
+        image = image.convert("L" if image.mode in ("1", "LA") else "RGB")
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue(), "image/jpeg"
+
+
+def encode_preview_image(*, image: Image.Image, reduction: int) -> tuple[bytes, str]:
+    """Returns the given image, downscaled by the given factor, encoded for display.
+
+    The full-resolution level (reduction 1) is encoded losslessly as PNG. The downscaled
+    levels are only used for display, so that they are encoded as JPEG.
+
+    Args:
+        image (Image.Image): The full-resolution image.
+        reduction (int): The downscaling factor, one of PREVIEW_REDUCTIONS.
+
+    Returns:
+        tuple[bytes, str]: The encoded image and its MIME type.
+    """
+    return encode_display_image(
+        image=reduce_image(image=image, reduction=reduction),
+        is_lossless=(reduction == 1),
+    )
+
+
+def extract_native_page_image(
+    *, document: fitz.Document, native_page_image: NativePageImage, dpi: int
+) -> Image.Image:
+    """Returns the page image of the given DPI from the page's embedded image itself.
+
+    The image is decoded without rendering the page. Unless its native resolution is the
+    given DPI, it is resized to the size which rasterize_page() would return, so that the
+    pixel coordinates (e.g. of the Rects) do not depend on the chosen path.
+
+    Args:
+        document (fitz.Document): The page's PDF document.
+        native_page_image (NativePageImage): The page's embedded image, see get_native_page_image().
+        dpi (int): The DPI resolution.
+
+    Returns:
+        Image.Image: The page image. Is grayscale or RGB, as the embedded image.
+    """
+    pixmap = fitz.Pixmap(document, native_page_image.xref)
+    if pixmap.alpha:
+        pixmap = fitz.Pixmap(pixmap, 0)
+    if (pixmap.colorspace is None) or (pixmap.n not in (1, 3)):
+        pixmap = fitz.Pixmap(fitz.csRGB, pixmap)
+    image = pixmap_to_image(pixmap=pixmap)
+    target_rect = (native_page_image.page_rect * fitz.Matrix(dpi / 72, dpi / 72)).irect
+    if image.size != (target_rect.width, target_rect.height):
+        image = image.resize((target_rect.width, target_rect.height))
+    return image
+
+
+def get_native_page_image(*, page: fitz.Page) -> NativePageImage | None:
+    """Returns the page's embedded image if the page consists of nothing but this image.
+
+    I.e., the page has to be unrotated and fully covered by exactly one unflipped and
+    unmasked image, without any vector graphics and without any visible text. Invisible
+    text (e.g. the text layer of an already OCRed scan) is allowed. For such pages,
+    extract_native_page_image() returns (nearly) the same image as rasterize_page(),
+    but much faster. All other (i.e., mixed-content) pages have to be rasterized.
+
+    Args:
+        page (fitz.Page): The PDF page.
+
+    Returns:
+        NativePageImage | None: The page's image or None if the page has to be rasterized.
+    """
+    # The cheap checks come first, so that common text pages are rejected quickly
+    if (page.rotation != 0) or (len(page.get_images()) != 1):
+        return None
+    image_infos = page.get_image_info(xrefs=True)
+    if len(image_infos) != 1:
+        return None
+    image_info = image_infos[0]
+    transform = fitz.Matrix(image_info["transform"])
+    bbox = fitz.Rect(image_info["bbox"])
+    page_rect = page.rect
+    if (
+        (image_info["xref"] <= 0)
+        or image_info["has-mask"]
+        or (image_info["colorspace"] == 0)
+        or (transform.b != 0)
+        or (transform.c != 0)
+        or (transform.a <= 0)
+        or (transform.d <= 0)
+        or (abs(bbox.x0 - page_rect.x0) > 1)
+        or (abs(bbox.y0 - page_rect.y0) > 1)
+        or (abs(bbox.x1 - page_rect.x1) > 1)
+        or (abs(bbox.y1 - page_rect.y1) > 1)
+    ):
+        return None
+    if page.get_drawings():
+        return None
+    # Text render mode 3 is invisible text
+    if any(span["type"] != 3 for span in page.get_texttrace()):
+        return None
+    return NativePageImage(
+        xref=image_info["xref"],
+        native_dpi=round(image_info["width"] * 72 / bbox.width),
+        page_rect=page_rect,
+    )
+
+
+def get_pdf_clip_rect(
+    *, page: fitz.Page, box: tuple[int, int, int, int], dpi: int, rotation: int
+) -> fitz.Rect:
+    """Maps the given box of a transformed page image back into the PDF page's coordinates.
+
+    This reverses render_page_image(), i.e., the rotation (around the image center, as
+    with Pillow's rotate()), the DPI scaling and the page's own rotation. A rotated box
+    is mapped to its enclosing rectangle. The result can be used as clip of the page's
+    text extraction (e.g. page.get_text("text", clip=...)).
+
+    Args:
+        page (fitz.Page): The PDF page.
+        box (tuple[int, int, int, int]): The box in pixels of the transformed image, as
+         (x_upper_left, y_upper_left, x_lower_right, y_lower_right).
+        dpi (int): The DPI resolution of the transformed image.
+        rotation (int): The rotation of the transformed image in degrees (°).
+
+    Returns:
+        fitz.Rect: The box's rectangle in (unrotated) PDF page points.
+    """
+    image_rect = (page.rect * fitz.Matrix(dpi / 72, dpi / 72)).irect
+    center_x = image_rect.width / 2
+    center_y = image_rect.height / 2
+    angle = math.radians(rotation)
+    cos_angle, sin_angle = math.cos(angle), math.sin(angle)
+    x_upper_left, y_upper_left, x_lower_right, y_lower_right = box
+    unrotated_points = []
+    for x, y in (
+        (x_upper_left, y_upper_left),
+        (x_lower_right, y_upper_left),
+        (x_upper_left, y_lower_right),
+        (x_lower_right, y_lower_right),
+    ):
+        dx, dy = x - center_x, y - center_y
+        unrotated_points.append(
+            (
+                center_x + dx * cos_angle - dy * sin_angle,
+                center_y + dx * sin_angle + dy * cos_angle,
+            )
+        )
+    image_box = fitz.Rect(
+        min(x for x, _ in unrotated_points),
+        min(y for _, y in unrotated_points),
+        max(x for x, _ in unrotated_points),
+        max(y for _, y in unrotated_points),
+    )
+    return image_box * fitz.Matrix(72 / dpi, 72 / dpi) * page.derotation_matrix
+
+
+def pixmap_to_image(*, pixmap: fitz.Pixmap) -> Image.Image:
+    """Converts the pixmap into a Pillow image directly from its raw sample buffer.
+
+    The sample buffer is read through a memoryview, i.e., no intermediate bytes copy
+    and no PNG encoding is involved. Pillow maps single-channel and RGBA buffers
+    without any copy; in this case, the returned image shares its memory with the
+    pixmap, so that the pixmap is attached to the image in order to keep it alive
+    as long as the image is used. RGB buffers are unpacked once into Pillow's own
+    pixel layout.
+
+    Args:
+        pixmap (fitz.Pixmap): The rendered pixmap.
+
+    Returns:
+        Image.Image: The Pillow image of the pixmap.
+    """
+    if pixmap.alpha:
+        mode = "RGBA"
+    elif pixmap.n == 1:
+        mode = "L"
+    else:
+        mode = "RGB"
+    image = Image.frombuffer(
+        mode,
+        (pixmap.width, pixmap.height),
+        pixmap.samples_mv,
+        "raw",
+        mode,
+        pixmap.stride,
+        1,
+    )
+    if image.readonly:
+        image.ocra_pixmap = pixmap
+    return image
+
+
+def rasterize_display_list(*, display_list: fitz.DisplayList, dpi: int) -> fitz.Pixmap:
+    """Renders the given PDF page's display list with the given DPI resolution.
+
+    The result is the same as the one of rasterize_page() on the display list's page.
+
+    Args:
+        display_list (fitz.DisplayList): The PDF page's display list.
+        dpi (int): The DPI resolution.
+
+    Returns:
+        fitz.Pixmap: The rendered page.
+    """
+    return display_list.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72))
+
+
+def rasterize_page(*, page: fitz.Page, dpi: int) -> fitz.Pixmap:
+    """Renders the given PDF page with the given DPI resolution.
+
+    Args:
+        page (fitz.Page): The PDF page.
+        dpi (int): The DPI resolution.
+
+    Returns:
+        fitz.Pixmap: The rendered page.
+    """
+    return page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72))
+
+
+def reduce_image(*, image: Image.Image, reduction: int) -> Image.Image:
+    """Returns the given image downscaled by the given integer factor.
+
+    Binarized images are reduced as grayscale images, which keeps thin strokes visible.
+
+    Args:
+        image (Image.Image): The full-resolution image.
+        reduction (int): The downscaling factor. If 1, the image itself is returned.
+
+    Returns:
+        Image.Image: The downscaled image.
+    """
+    if reduction == 1:
+        return image
+    if image.mode not in ("L", "RGB"):
+        image = image.convert("L" if image.mode in ("1", "LA") else "RGB")
+    return image.reduce(reduction)
+
+
+def render_page_image(
+    *,
+    page: fitz.Page,
+    dpi: int,
+    rotation: int,
+    is_binarized: bool,
+    binarization_method: str,
+    binarization_threshold: int,
+    timer: StageTimer | None = None,
+) -> Image.Image:
+    """Renders the given PDF page and applies the rotation and binarization in memory.
+
+    Pages which consist of nothing but one embedded image (e.g. scans) are not rendered,
+    but their image is extracted, see get_native_page_image().
+
+    Args:
+        page (fitz.Page): The PDF page.
+        dpi (int): The DPI resolution.
+        rotation (int): The rotation in degrees (°).
+        is_binarized (bool): If true, the image is binarized.
+        binarization_method (str): The binarization method, see binarization.py.
+        binarization_threshold (int): The threshold of the "global" binarization method.
+        timer (StageTimer | None, optional): If given, the stage durations are measured with it. Defaults to None.
+
+    Returns:
+        Image.Image: The transformed page image.
+    """
+    if timer is None:
+        timer = StageTimer()
+    with timer.stage("load_page"):
+        native_page_image = get_native_page_image(page=page)
+    if native_page_image is not None:
+        with timer.stage("extract_image"):
+            image = extract_native_page_image(
+                document=page.parent, native_page_image=native_page_image, dpi=dpi
+            )
+    else:
+        with timer.stage("rasterize"):
+            pixmap = rasterize_page(page=page, dpi=dpi)
+        with timer.stage("to_image"):
+            image = pixmap_to_image(pixmap=pixmap)
+    return transform_image(
+        image=image,
+        rotation=rotation,
+        is_binarized=is_binarized,
+        binarization_method=binarization_method,
+        binarization_threshold=binarization_threshold,
+        timer=timer,
+    )
+
+
+def transform_image(
+    *,
+    image: Image.Image,
+    rotation: int,
+    is_binarized: bool,
+    binarization_method: str,
+    binarization_threshold: int,
+    timer: StageTimer | None = None,
+) -> Image.Image:
+    """Applies the rotation and binarization to the given (rasterized) page image.
+
+    The given image is not changed. If no transformation is needed, it is returned as is.
+
+    Args:
+        image (Image.Image): The rasterized page image.
+        rotation (int): The rotation in degrees (°).
+        is_binarized (bool): If true, the image is binarized.
+        binarization_method (str): The binarization method, see binarization.py.
+        binarization_threshold (int): The threshold of the "global" binarization method.
+        timer (StageTimer | None, optional): If given, the stage durations are measured with it. Defaults to None.
+
+    Returns:
+        Image.Image: The transformed page image.
+    """
+    if timer is None:
+        timer = StageTimer()
+    if rotation % 360 != 0:
+        with timer.stage("rotate"):
+            image = image.rotate(rotation)
+    if is_binarized:
+        with timer.stage("binarize"):
+            image = binarize_image(
+                image=image,
+                method=binarization_method,
+                threshold=binarization_threshold,
+            )
+    return image
+
+
+# MAIN ROUTINE SECTION #
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Prints per-stage render timings of a PDF page, with and without the old PNG round-trips."
+    )
+    parser.add_argument("pdf_file_path")
+    parser.add_argument("--page", type=int, default=1)
+    parser.add_argument("--dpi", type=int, default=500)
+    parser.add_argument("--rotation", type=int, default=0)
+    parser.add_argument("--binarization_threshold", type=int, default=None)
+    parser.add_argument("--binarization_method", default="global")
+    args = parser.parse_args()
+
+    document = fitz.open(args.pdf_file_path)
+    pdf_page = document.load_page(args.page - 1)
+    is_binarized = args.binarization_threshold is not None
+    threshold = args.binarization_threshold or 0
+
+    in_memory_timer = StageTimer()
+    render_page_image(
+        page=pdf_page,
+        dpi=args.dpi,
+        rotation=args.rotation,
+        is_binarized=is_binarized,
+        binarization_method=args.binarization_method,
+        binarization_threshold=threshold,
+        timer=in_memory_timer,
+    )
+    print("In-memory pipeline:")
+    print(in_memory_timer.report())
+
+    round_trip_timer = StageTimer()
+    round_trip_path = f"{args.pdf_file_path}.timing.png"
+    with round_trip_timer.stage("rasterize"):
+        round_trip_pixmap = rasterize_page(page=pdf_page, dpi=args.dpi)
+    with round_trip_timer.stage("png_write"):
+        round_trip_pixmap.save(round_trip_path)
+    with round_trip_timer.stage("png_read"):
+        round_trip_image = Image.open(round_trip_path)
+        round_trip_image.load()
+    with round_trip_timer.stage("rotate"):
+        round_trip_image = round_trip_image.rotate(args.rotation)
+    if is_binarized:
+        with round_trip_timer.stage("binarize"):
+            round_trip_image = binarize_image(
+                image=round_trip_image,
+                method=args.binarization_method,
+                threshold=threshold,
+            )
+    with round_trip_timer.stage("png_write"):
+        round_trip_image.save(round_trip_path)
+    os.remove(round_trip_path)
+    print("\nPNG round-trip pipeline (previous behavior):")
+    print(round_trip_timer.report())
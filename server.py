@@ -1,22 +1,30 @@
 """Main script of the OCRA Flask&Socket.IO server.
 
-The server has its own global instance of OCRAproject,
-and stores all data coming from the browser there. All
-data shown in the browser is also stored and handled
-in the OCRAproject instance.
+Each connected browser has its own session (see sessions.py)
+with its own instance of OCRAproject, and the server stores
+all data coming from the browser there. All data shown in
+the browser is also stored and handled in the OCRAproject
+instance. Events are only sent to the browser whose session
+they belong to.
 """
 
 # IMPORTS SECTION #
 ## EXTERNAL IMPORTS ##
+import atexit
+import functools
 import os
 from platform import system
-from flask import Flask, render_template
+from flask import Flask, Response, abort, make_response, render_template, request
 from flask_socketio import SocketIO
 from tkinter import filedialog
-from typing import Any
+from typing import Any, Callable
 
 ## INTERNAL IMPORTS ##
+from jobs import ProgressCallback
+from metrics import g_event_seconds, g_metrics, g_payload_bytes, g_profiler
 from ocra import OCRAProject
+from render import PREVIEW_REDUCTIONS
+from sessions import ClientSession, SessionManager
 from utils import standardize_file_path, standardize_folder_path
 
 
@@ -26,12 +34,26 @@ async_mode = None
 app = Flask(__name__)
 app.config["SECRET_KEY"] = "secret!"
 socketio = SocketIO(app)
-## OCRA global variable
-g_ocra_project: OCRAProject = OCRAProject()
+## OCRA GLOBAL VARIABLES ##
+# Each browser's events are only sent to its own Socket.IO session (i.e., room)
+g_session_manager: SessionManager = SessionManager(
+    create_emit=lambda sid: lambda event, data: socketio.emit(event, data, to=sid)
+)
+# The projects' pending (write-behind) changes are written on shutdown
+atexit.register(g_session_manager.close)
 
 
 # FUNCTION DEFINITIONS SECTION #
 ## General utility functions ##
+def get_client_session() -> ClientSession:
+    """Returns the session of the browser whose Socket.IO event is handled.
+
+    Returns:
+        ClientSession: The browser's session.
+    """
+    return g_session_manager.get_session(sid=request.sid)
+
+
 def get_project_folder_path() -> str | None:
     """Using tkinter, the user is asked to choose an OCRA project folder path.
 
@@ -44,6 +66,32 @@ def get_project_folder_path() -> str | None:
     return project_folder_path
 
 
+def on_event(event: str) -> Callable[[Callable[..., None]], Callable[..., None]]:
+    """Registers the decorated function as handler of the given Socket.IO event.
+
+    In contrast to socketio.on(), the handler's durations are measured (see metrics.py)
+    and, if profiling is enabled, each call is profiled.
+
+    Args:
+        event (str): The Socket.IO event's name.
+
+    Returns:
+        Callable[[Callable[..., None]], Callable[..., None]]: The decorator.
+    """
+
+    def decorator(function: Callable[..., None]) -> Callable[..., None]:
+        @functools.wraps(function)
+        def handler(*args: Any) -> None:
+            with g_event_seconds.time(event=event), g_profiler.profile(
+                f"event_{event}"
+            ):
+                function(*args)
+
+        return socketio.on(event)(handler)
+
+    return decorator
+
+
 ## CLIENT<->SERVER<->CLIENT COMMUNICATION FUNCTIONS ##
 @app.route("/")
 def index() -> str:
@@ -55,63 +103,186 @@ def index() -> str:
     return render_template("index.html", sync_mode=socketio.async_mode)
 
 
-@socketio.on("new_page")
+@app.route("/metrics")
+def metrics() -> Response:
+    """Returns the server's timing, size and cache metrics in the Prometheus text format.
+
+    Returns:
+        Response: The metrics text response.
+    """
+    response = make_response(g_metrics.render())
+    response.mimetype = "text/plain"
+    response.headers["Content-Type"] = "text/plain; version=0.0.4; charset=utf-8"
+    return response
+
+
+@socketio.on("connect")
+def handle_connect() -> None:
+    """Handles a (re-)connected browser, which gets its own new session."""
+    get_client_session()
+
+
+@socketio.on("disconnect")
+def handle_disconnect() -> None:
+    """Handles a disconnected browser by closing its session."""
+    g_session_manager.remove_session(sid=request.sid)
+
+
+@app.route("/page_image/<image_version>")
+def page_image(image_version: str) -> Response:
+    """Returns a preview of the current transformed page image of the version's session.
+
+    The image's version (as sent in each image update) is part of the URL. As a version
+    always refers to the same image, browsers may cache it without revalidation. The
+    optional "reduction" query parameter selects the preview pyramid's level (see
+    PREVIEW_REDUCTIONS), i.e., the downscaling factor. If the given version is not the
+    current one or the reduction is unknown, 404 is returned.
+
+    Args:
+        image_version (str): The requested image version.
+
+    Returns:
+        Response: The image response.
+    """
+    reduction = request.args.get("reduction", default=1, type=int)
+    session = g_session_manager.get_session_by_image_version(
+        image_version=image_version
+    )
+    if (
+        (session is None)
+        or (image_version != session.project.get_current_image_version())
+        or (reduction not in PREVIEW_REDUCTIONS)
+    ):
+        abort(404)
+    image_bytes, mimetype = session.project.get_current_image_preview(
+        reduction=reduction
+    )
+    g_payload_bytes.observe(len(image_bytes), kind="page_image")
+    response = make_response(image_bytes)
+    response.mimetype = mimetype
+    response.set_etag(f"{image_version}-{reduction}")
+    response.cache_control.private = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+
+@app.route("/page_tile/<image_version>/<int:reduction>/<int:tile_x>/<int:tile_y>")
+def page_tile(image_version: str, reduction: int, tile_x: int, tile_y: int) -> Response:
+    """Returns a tile of the current transformed page image of the version's session (see tiles.py).
+
+    As with page_image(), the image version is part of the URL so that browsers may
+    cache the tile without revalidation. If the given version is not the current one,
+    the reduction is unknown or the tile is outside of the image, 404 is returned.
+
+    Args:
+        image_version (str): The requested image version.
+        reduction (int): The pyramid level's downscaling factor.
+        tile_x (int): The tile's column, starting with 0 at the left.
+        tile_y (int): The tile's row, starting with 0 at the top.
+
+    Returns:
+        Response: The tile image response.
+    """
+    session = g_session_manager.get_session_by_image_version(
+        image_version=image_version
+    )
+    if (
+        (session is None)
+        or (image_version != session.project.get_current_image_version())
+        or (reduction not in PREVIEW_REDUCTIONS)
+    ):
+        abort(404)
+    tile = session.project.get_current_image_tile(
+        reduction=reduction, tile_x=tile_x, tile_y=tile_y
+    )
+    if tile is None:
+        abort(404)
+    g_payload_bytes.observe(len(tile[0]), kind="page_tile")
+    response = make_response(tile[0])
+    response.mimetype = tile[1]
+    response.cache_control.private = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
+
+
+@on_event("new_page")
 def handle_new_page(number: int) -> None:
     """Handles going to a different page in the current project's PDF.
 
     Args:
         number (int): The new page's number in the PDF
     """
-    global g_ocra_project
-    g_ocra_project.move_to_page(new_page=number)
-    socketio.emit("data_update", g_ocra_project.data_update_json())
+    session = get_client_session()
 
+    def move_to_page(project: OCRAProject, report_progress: ProgressCallback) -> None:
+        project.move_to_page(new_page=number)
 
-@socketio.on("open_project_folder")
+    session.submit_project_job(
+        kind="page",
+        function=move_to_page,
+        on_done=lambda _: session.emit_data_updates(),
+    )
+
+
+@on_event("open_project_folder")
 def handle_open_ocra_project_folder() -> None:
     """Handles opening an OCRA project folder and its contents."""
-    global g_ocra_project
-    g_ocra_project = OCRAProject()
+    session = get_client_session()
+    ocra_project = g_session_manager.new_project(sid=session.sid)
     project_folder_path = get_project_folder_path()
     if not project_folder_path:
         return
     project_folder_path = standardize_folder_path(folder_path=project_folder_path)
-    g_ocra_project.load_ocra_project(folder_path=project_folder_path)
-    socketio.emit("data_update", g_ocra_project.data_update_json())
+    ocra_project.load_ocra_project(folder_path=project_folder_path)
+    session.emit_data_updates()
 
 
-@socketio.on("perform_ocr")
+@on_event("perform_ocr")
 def handle_perform_ocr() -> None:
-    """Handles performing a Tesseract OCR of the current page's Rects."""
-    global g_ocra_project
-    ocr_string = g_ocra_project.perform_ocr()
-    socketio.emit("get_ocr", ocr_string)
+    """Handles performing a Tesseract OCR of the current page's Rects as background job.
 
+    The OCR result is appended to the transcript of the page which was OCRed, so that
+    it does not depend on the browser's page. The browser gets it as data update.
+    """
+    session = get_client_session()
+
+    def perform_ocr(project: OCRAProject, report_progress: ProgressCallback) -> None:
+        page = project.current_page
+        ocr_string = project.perform_ocr(
+            report_progress=lambda finished_count, count: report_progress(
+                finished_count / count, f"{finished_count}/{count} Rects OCRed"
+            )
+        )
+        project.append_page_transcript(page=page, text=f"\n{ocr_string}")
+
+    session.submit_project_job(
+        kind="ocr",
+        function=perform_ocr,
+        on_done=lambda _: session.emit_data_updates(part_names=("transcript",)),
+    )
 
-@socketio.on("set_changed_image_config")
+
+@on_event("set_changed_image_config")
 def handle_set_changed_image_config(config_json: dict[str, Any]) -> None:
     """Sets the new changed current PDF page image confic in the OCRA project instance.
 
     Args:
         config_json (dict[str, Any]): The new image config, as detailed in data_update_json()
-         of OCRAProject.
+         of OCRAProject, together with its page and its client-side config version.
     """
-    global g_ocra_project
-    is_effectively_changed = g_ocra_project.set_changed_image_config_from_json(
-        config_json=config_json
-    )
-    if is_effectively_changed:
-        socketio.emit("data_update", g_ocra_project.data_update_json())
+    get_client_session().submit_image_config(config_json=config_json)
 
 
-@socketio.on("set_tesseract_path")
+@on_event("set_tesseract_path")
 def handle_set_tesseract_path() -> None:
     """Opens a tkinter dialog for the user to choose a new Tesseract path.
 
     This path should be, under Windows, the Tesseract .exe, otherwise,
     a path to an executable Tesseract executable.
     """
-    global g_ocra_project
+    session = get_client_session()
 
     # Set file type according to operating system
     if system() == "Windows":
@@ -129,29 +300,31 @@ def handle_set_tesseract_path() -> None:
 
     # Set the Tesseract path in the project
     file_path = standardize_file_path(file_path=file_path)
-    g_ocra_project.change_tesseract_path(tesseract_path=file_path)
+    session.project.change_tesseract_path(tesseract_path=file_path)
+    session.mark_data_update_parts_as_known("project")
 
     # Send the chosen Tesseract path back to the browser so that it
     # can be displayed there.
-    socketio.emit(
+    session.emit(
         "get_tesseract_path",
         file_path,
     )
 
 
 ## CLIENT->SERVER COMMUNICATION FUNCTIONS ##
-@socketio.on("change_tesseract_arguments")
+@on_event("change_tesseract_arguments")
 def handle_change_tesseract_arguments(string: str) -> None:
     """Catches the signal to change the Tesseract arguments and sends it to the main class.
 
     Args:
         string (str): The newly set Tesseract arguments which will overwrite the old ones.
     """
-    global g_ocra_project
-    g_ocra_project.change_tesseract_arguments(arguments=string)
+    session = get_client_session()
+    session.project.change_tesseract_arguments(arguments=string)
+    session.mark_data_update_parts_as_known("project")
 
 
-@socketio.on("change_tesseract_languages")
+@on_event("change_tesseract_languages")
 def handle_change_tesseract_languages(json: dict[str, str]) -> None:
     """Catches the signal to change the Tesseract arguments, sending it to the main class.
 
@@ -164,25 +337,43 @@ def handle_change_tesseract_languages(json: dict[str, str]) -> None:
         where "$LANGUAGE_1" and "$LANGUAGE_2" shall be but do not have to be
         valid Tesseract language identifiers.
     """
-    global g_ocra_project
-    g_ocra_project.change_tesseract_languages(
+    session = get_client_session()
+    session.project.change_tesseract_languages(
         languages_json=json,
     )
+    session.mark_data_update_parts_as_known("project")
+
 
+@on_event("change_tesseract_ocr_settings")
+def handle_change_tesseract_ocr_settings(json: dict[str, Any]) -> None:
+    """Catches the signal to change the OCR run settings, sending it to the main class.
 
-@socketio.on("changed_text")
-def handle_changed_text(string: str) -> None:
-    """Sends the changed image text (i.e., transcript) to the main class.
+    Args:
+        json (dict[str, Any]): A dictionary with the changed settings, see
+        OCRAProject.change_tesseract_ocr_settings().
+    """
+    session = get_client_session()
+    session.project.change_tesseract_ocr_settings(settings_json=json)
+    session.mark_data_update_parts_as_known("project")
+
+
+@on_event("changed_text")
+def handle_changed_text(json: dict[str, Any]) -> None:
+    """Sends the changed image text (i.e., transcript) of its page to the main class.
+
+    The text is written to its own page, even if the page changed in the meantime.
 
     Args:
-        string (str): The new image transcript text, including all
-        line breaks.
+        json (dict[str, Any]): The new image transcript "text", including all
+        line breaks, and its "page".
     """
-    global g_ocra_project
-    g_ocra_project.set_current_image_transcript(string)
+    session = get_client_session()
+    session.project.set_page_transcript(page=json["page"], text=json["text"])
+    if json["page"] == session.project.current_page:
+        session.mark_data_update_parts_as_known("transcript")
 
 
-@socketio.on("open_new_pdf")
+@on_event("open_new_pdf")
 def handle_open_new_pdf() -> None:
     """ Opens tkinter dialogs to create a new OCRA project from a PDF file.
 
@@ -192,7 +383,7 @@ def handle_open_new_pdf() -> None:
     Thirdly, The OCRA project is created in the given location.
     Lastly, the new OCRA project is sent to the server to be displayed.
     """
-    global g_ocra_project
+    session = get_client_session()
 
     # Select PDF file
     pdf_filetypes = (
@@ -213,26 +404,32 @@ def handle_open_new_pdf() -> None:
     project_folder_path = standardize_folder_path(folder_path=project_folder_path)
 
     # Create new OCRA project in selected location
-    g_ocra_project = OCRAProject()
-    g_ocra_project.create_project_from_pdf(
+    ocra_project = g_session_manager.new_project(sid=session.sid)
+    ocra_project.create_project_from_pdf(
         pdf_file_path=pdf_filepath,
         folder_path=project_folder_path,
     )
 
     # Send back new OCRA project so that it is displayed
-    socketio.emit("data_update", g_ocra_project.data_update_json())
+    session.emit_data_updates()
+
 
+@on_event("set_changed_rects")
+def handle_set_changed_rects(json: dict[str, Any]) -> None:
+    """Sets the changed drawn rects of their page sent from the server in the OCRA project.
 
-@socketio.on("set_changed_rects")
-def handle_set_changed_rects(rects_json: dict[str, Any]) -> None:
-    """Sets the changed drawn rects sent from the server in the OCRA project.
+    The Rects are set for their own page, even if the page changed in the meantime.
 
     Args:
-        rects_json (dict[str, Any]): A dictionary of the form as described
-        in OCRAProject's set_changed_rects_from_json() function.
+        json (dict[str, Any]): The "rects" in the form as described in OCRAProject's
+        set_changed_rects_from_json() function, and their "page".
     """
-    global g_ocra_project
-    g_ocra_project.set_changed_rects_from_json(rects_json=rects_json)
+    session = get_client_session()
+    session.project.set_changed_rects_from_json(
+        rects_json=json["rects"], page=json["page"]
+    )
+    if json["page"] == session.project.current_page:
+        session.mark_data_update_parts_as_known("rects")
 
 
 # MAIN ROUTINE SECTION #
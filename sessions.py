@@ -0,0 +1,431 @@
+"""Per-browser sessions of the OCRA server.
+
+Each connected browser (i.e., Socket.IO session ID) gets its own ClientSession
+with its own OCRAProject, data update tracker and background job executor, and
+its events are only sent to this browser. Thus, several users can work on
+different (or the same) projects with one server without overwriting each
+other's state.
+
+Projects of the same PDF file (e.g. the same project opened in two browsers)
+share one page image cache, as the rendered images only depend on the PDF
+and the image settings. The PDF file is identified by its real path, size
+and modification time, so that no PDF has to be read for this. As each loaded project keeps its PDF open (together with its
+prefetching worker processes), only the PDFs of the most recently used
+projects stay open. Those of idle sessions are released and reopened on
+their next use.
+"""
+
+# IMPORTS SECTION #
+## EXTERNAL IMPORTS ##
+import json
+import os
+import threading
+import time
+from typing import Any, Callable
+
+## INTERNAL IMPORTS ##
+from coalesce import LatestValueCoalescer
+from data_update import DataUpdateTracker
+from image_cache import PageImageCache
+from jobs import JobExecutor, ProgressCallback
+from metrics import g_payload_bytes
+from ocra import DATA_UPDATE_PART_NAMES, OCRAProject
+from utils import standardize_folder_path
+
+# TYPE ALIASES SECTION #
+EmitFunction = Callable[[str, Any], None]
+"""Sends an event with its data to one browser."""
+
+
+# CLASS DEFINITIONS SECTION #
+class ClientSession:
+    """The OCRA project and the server-side state of one connected browser."""
+
+    def __init__(self, *, sid: str, emit: EmitFunction, project: OCRAProject):
+        """Start-up of the session's state and its job executor.
+
+        Args:
+            sid (str): The browser's Socket.IO session ID.
+            emit (EmitFunction): Sends an event to the browser (and only to it).
+            project (OCRAProject): The session's initial (usually empty) project.
+        """
+        self.sid: str = sid
+        """The browser's Socket.IO session ID."""
+        self.emit: EmitFunction = emit
+        """Sends an event to the browser (and only to it)."""
+        self.project: OCRAProject = project
+        """The session's OCRA project."""
+        self.data_update_tracker: DataUpdateTracker = DataUpdateTracker()
+        """The data update parts which the browser already knows."""
+        # Renders, page moves and OCRs run one after another in the background, so that
+        # the Socket.IO handlers return at once
+        self.job_executor: JobExecutor = JobExecutor(emit=emit)
+        """Runs the session's renders, page moves and OCRs in the background."""
+        # The coalescer's keys are (project, page), so that configs of a replaced project
+        # are never applied to the current one
+        self.image_config_coalescer: LatestValueCoalescer = LatestValueCoalescer(
+            function=lambda key, config_json: self.apply_image_config(
+                project=key[0], page=key[1], config_json=config_json
+            ),
+            start=lambda process: self.job_executor.submit(
+                kind="render", function=lambda report_progress: process()
+            ),
+        )
+        """Coalesces bursts of image configs so that only the latest config of a page is rendered."""
+        self.last_access_time: float = time.monotonic()
+        """The monotonic time of the session's latest use."""
+
+    def apply_image_config(
+        self, *, project: OCRAProject, page: int, config_json: dict[str, Any]
+    ) -> None:
+        """Applies the given image config of the given project's page and sends the resulting updates.
+
+        If the project is no longer the session's project or the page is no longer the
+        current one, the config is discarded. If a newer config
+        of the page arrived during the rendering, the (outdated) result is not sent, as the
+        newer config is applied directly afterwards. Otherwise, the browser gets the changed
+        data update parts. Except for superseded configs, the browser finally gets an
+        "image_config_ack" with the config's version.
+
+        Args:
+            project (OCRAProject): The project which was the session's project when the
+             config was submitted.
+            page (int): The config's page.
+            config_json (dict[str, Any]): The image config.
+        """
+        if (project is self.project) and (page == project.current_page):
+            project.set_changed_image_config_from_json(config_json=config_json)
+            self.mark_data_update_parts_as_known("config")
+            if self.image_config_coalescer.is_superseded(key=(project, page)):
+                return
+            self.emit_data_updates(part_names=("rects", "image"))
+        self.emit(
+            "image_config_ack", {"config_version": config_json.get("config_version", 0)}
+        )
+
+    def close(self) -> None:
+        """Stops the session's job executor, writes its project's pending data and releases its PDF.
+
+        The waiting jobs are cancelled and the running one is waited for, so that no job
+        writes into the closed project store.
+        """
+        self.job_executor.shutdown(wait=True)
+        self.project.close_project_store()
+        self.project.release_pdf_document()
+
+    def emit_data_updates(
+        self, *, part_names: tuple[str, ...] = DATA_UPDATE_PART_NAMES
+    ) -> None:
+        """Emits each of the given data update parts which changed since it was last known by the browser.
+
+        Each part is sent as its own event "{part name}_update", see OCRAProject's
+        get_data_update_parts() for the parts.
+
+        Args:
+            part_names (tuple[str, ...], optional): The names of the parts which may have
+             changed. Defaults to all parts.
+        """
+        parts = self.project.get_data_update_parts(part_names=part_names)
+        changed_parts = self.data_update_tracker.get_changed_parts(parts=parts)
+        for part_name, part in changed_parts.items():
+            g_payload_bytes.observe(len(json.dumps(part)), kind=f"{part_name}_update")
+            self.emit(f"{part_name}_update", part)
+
+    def replace_project(self, *, project: OCRAProject) -> None:
+        """Replaces the session's project. The previous project's pending data is written and its PDF is released.
+
+        The browser is treated as knowing none of the new project's data. The waiting jobs
+        of the previous project are skipped (see submit_project_job()), and all of its jobs
+        are done before its project store is closed.
+
+        Args:
+            project (OCRAProject): The new project.
+        """
+        previous_project = self.project
+        self.project = project
+        self.data_update_tracker.reset()
+        self.job_executor.flush()
+        previous_project.close_project_store()
+        previous_project.release_pdf_document()
+
+    def submit_image_config(self, *, config_json: dict[str, Any]) -> None:
+        """Submits the given image config of the session's current project for its rendering job.
+
+        Bursts (e.g. from dragging a slider) are coalesced so that only the latest config
+        of a page is rendered, see apply_image_config().
+
+        Args:
+            config_json (dict[str, Any]): The image config, as detailed in OCRAProject's
+             data_update_json(), together with its page and its client-side config version.
+        """
+        project = self.project
+        self.image_config_coalescer.submit(
+            key=(project, config_json.get("page", project.current_page)),
+            value=config_json,
+        )
+
+    def submit_project_job(
+        self,
+        *,
+        kind: str,
+        function: Callable[[OCRAProject, ProgressCallback], Any],
+        on_done: Callable[[Any], None] | None = None,
+    ) -> str:
+        """Submits the given job of the session's current project, see JobExecutor's submit().
+
+        The project is taken at submission, i.e., a job never runs on a project which the
+        browser opened after submitting it. If the session's project is replaced before the
+        job runs, the job is skipped, as its project is already closed. If it is replaced
+        while the job runs, on_done is not called.
+
+        Args:
+            kind (str): The job's kind, e.g. "ocr".
+            function (Callable[[OCRAProject, ProgressCallback], Any]): The job itself. It
+             gets the project and a progress callback.
+            on_done (Callable[[Any], None] | None, optional): If given, it is called with
+             the job function's result. Defaults to None.
+
+        Returns:
+            str: The job's ID.
+        """
+        project = self.project
+
+        def run_job(report_progress: ProgressCallback) -> Any:
+            if project is not self.project:
+                return None
+            return function(project, report_progress)
+
+        def finish_job(result: Any) -> None:
+            if (on_done is not None) and (project is self.project):
+                on_done(result)
+
+        return self.job_executor.submit(kind=kind, function=run_job, on_done=finish_job)
+
+    def mark_data_update_parts_as_known(self, *part_names: str) -> None:
+        """Marks the given data update parts as known by the browser, e.g. because it sent them.
+
+        Args:
+            *part_names (str): The names of the parts.
+        """
+        self.data_update_tracker.mark_as_known(
+            parts=self.project.get_data_update_parts(part_names=part_names)
+        )
+
+
+class SessionManager:
+    """Thread-safe registry of the ClientSessions and of the image caches shared between them."""
+
+    def __init__(
+        self,
+        *,
+        create_emit: Callable[[str], EmitFunction],
+        max_open_projects: int = 4,
+        cache_memory_budget: int = 1024**3,
+        cache_disk_budget: int = 4 * 1024**3,
+        prefetch_radius: int = 2,
+        prefetch_workers: int = 2,
+        write_delay: float = 1.0,
+    ):
+        """Start-up of the (empty) session and image cache registries.
+
+        Args:
+            create_emit (Callable[[str], EmitFunction]): Returns the emit function of the
+             given Socket.IO session ID.
+            max_open_projects (int, optional): The maximal number of projects whose PDF is
+             kept open. Defaults to 4.
+            cache_memory_budget (int, optional): The memory budget of each shared page image
+             cache in bytes. Defaults to 1 GiB.
+            cache_disk_budget (int, optional): The disk budget of each shared page image
+             cache in bytes. If 0, the caches' disk tiers are not used. Defaults to 4 GiB.
+            prefetch_radius (int, optional): The projects' prefetch radius, see OCRAProject.
+             Defaults to 2.
+            prefetch_workers (int, optional): The number of prefetching worker processes of
+             each open project. Defaults to 2.
+            write_delay (float, optional): The delay in seconds after which the projects'
+             changed data is written, see OCRAProject. Defaults to 1.0.
+        """
+        self.create_emit: Callable[[str], EmitFunction] = create_emit
+        """Returns the emit function of a Socket.IO session ID."""
+        self.max_open_projects: int = max_open_projects
+        """The maximal number of projects whose PDF is kept open."""
+        self.cache_memory_budget: int = cache_memory_budget
+        """The memory budget of each shared page image cache in bytes."""
+        self.cache_disk_budget: int = cache_disk_budget
+        """The disk budget of each shared page image cache in bytes."""
+        self.prefetch_radius: int = prefetch_radius
+        """The projects' prefetch radius."""
+        self.prefetch_workers: int = prefetch_workers
+        """The number of prefetching worker processes of each open project."""
+        self.write_delay: float = write_delay
+        """The delay in seconds after which the projects' changed data is written."""
+        self._lock = threading.RLock()
+        self._sessions: dict[str, ClientSession] = {}
+        self._image_caches: dict[tuple[str, int, int], PageImageCache] = {}
+
+    def _create_project(self) -> OCRAProject:
+        return OCRAProject(
+            prefetch_radius=self.prefetch_radius,
+            prefetch_workers=self.prefetch_workers,
+            get_shared_image_cache=self.get_shared_image_cache,
+            write_delay=self.write_delay,
+        )
+
+    def _get_open_sessions(self) -> list[ClientSession]:
+        return [
+            session
+            for session in self._sessions.values()
+            if session.project.folder_path
+            and not session.project.pdf_document.is_closed
+        ]
+
+    def _remove_unused_image_caches(self) -> None:
+        used_image_cache_ids = {
+            id(session.project.image_cache) for session in self._sessions.values()
+        }
+        for file_key, image_cache in list(self._image_caches.items()):
+            if id(image_cache) not in used_image_cache_ids:
+                del self._image_caches[file_key]
+                image_cache.clear()
+
+    def _use_session(self, session: ClientSession) -> None:
+        # The used session's PDF stays open, while the PDFs of the least recently used
+        # idle sessions are released until at most max_open_projects are open
+        session.last_access_time = time.monotonic()
+        open_sessions = sorted(
+            self._get_open_sessions(), key=lambda x: x.last_access_time
+        )
+        excess_count = len(open_sessions) - self.max_open_projects
+        for open_session in open_sessions:
+            if excess_count <= 0:
+                return
+            if (open_session is session) or not open_session.job_executor.is_idle():
+                continue
+            open_session.project.release_pdf_document()
+            excess_count -= 1
+
+    def close(self) -> None:
+        """Closes and removes all sessions, e.g. on shutdown, so that their pending data is written."""
+        with self._lock:
+            for sid in list(self._sessions):
+                self.remove_session(sid=sid)
+
+    def get_open_project_count(self) -> int:
+        """Returns the number of sessions whose project's PDF is open.
+
+        Returns:
+            int: The number of open projects.
+        """
+        with self._lock:
+            return len(self._get_open_sessions())
+
+    def get_session(self, *, sid: str) -> ClientSession:
+        """Returns the session of the given Socket.IO session ID, which is created if it does not exist yet.
+
+        Args:
+            sid (str): The Socket.IO session ID.
+
+        Returns:
+            ClientSession: The session.
+        """
+        with self._lock:
+            session = self._sessions.get(sid)
+            if session is None:
+                session = ClientSession(
+                    sid=sid, emit=self.create_emit(sid), project=self._create_project()
+                )
+                self._sessions[sid] = session
+            self._use_session(session)
+            return session
+
+    def get_session_by_image_version(
+        self, *, image_version: str
+    ) -> ClientSession | None:
+        """Returns the session whose project created the given image version.
+
+        Image versions start with their project's token, see OCRAProject's
+        get_current_image_version().
+
+        Args:
+            image_version (str): The image version.
+
+        Returns:
+            ClientSession | None: The session or None if no project has the version's token.
+        """
+        project_token = image_version.split("-")[0]
+        with self._lock:
+            for session in self._sessions.values():
+                if session.project.project_token == project_token:
+                    self._use_session(session)
+                    return session
+        return None
+
+    def get_shared_image_cache(self, pdf_file_path: str) -> PageImageCache:
+        """Returns the page image cache of the given PDF file, which is created if it does not exist yet.
+
+        The file is identified by its real path, size and modification time, i.e., a
+        changed PDF gets a new cache. A new cache's disk tier is stored in the "image_cache" folder next to the PDF, i.e.,
+        in the folder of the first project which uses it.
+
+        Args:
+            pdf_file_path (str): The path of the project's PDF.
+
+        Returns:
+            PageImageCache: The shared page image cache.
+        """
+        file_stat = os.stat(pdf_file_path)
+        file_key = (
+            os.path.realpath(pdf_file_path),
+            file_stat.st_size,
+            file_stat.st_mtime_ns,
+        )
+        with self._lock:
+            image_cache = self._image_caches.get(file_key)
+            if image_cache is None:
+                image_cache = PageImageCache(
+                    memory_budget=self.cache_memory_budget,
+                    disk_budget=self.cache_disk_budget,
+                )
+                if self.cache_disk_budget > 0:
+                    image_cache.set_disk_folder_path(
+                        folder_path=standardize_folder_path(
+                            folder_path=f"{os.path.dirname(pdf_file_path)}/image_cache/"
+                        )
+                    )
+                self._image_caches[file_key] = image_cache
+            return image_cache
+
+    def new_project(self, *, sid: str) -> OCRAProject:
+        """Replaces the project of the given session with a new (empty) one.
+
+        The previous project's PDF is released and the browser is treated as knowing
+        none of the new project's data.
+
+        Args:
+            sid (str): The session's Socket.IO session ID.
+
+        Returns:
+            OCRAProject: The new project, e.g. for loading a project folder into it.
+        """
+        with self._lock:
+            session = self.get_session(sid=sid)
+            project = self._create_project()
+        # The previous project's running job is waited for without blocking other sessions
+        session.replace_project(project=project)
+        with self._lock:
+            self._remove_unused_image_caches()
+        return project
+
+    def remove_session(self, *, sid: str) -> None:
+        """Closes and removes the session of the given Socket.IO session ID, e.g. after a disconnect.
+
+        Args:
+            sid (str): The Socket.IO session ID.
+        """
+        with self._lock:
+            session = self._sessions.pop(sid, None)
+        if session is None:
+            return
+        # The session's running job is waited for without blocking other sessions
+        session.close()
+        with self._lock:
+            self._remove_unused_image_caches()
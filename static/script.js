@@ -26,7 +26,10 @@
  * @property {number} rotation - Current image rotation in degrees (°).
  * @property {boolean} is_binarized - Indicates whether or not the current page is black&white-binarized.
  * @property {number} binarization_threshold - If is_binarized is true, indicates the black&white binarization threshold.
+ * @property {string} binarization_method - If is_binarized is true, indicates the binarization method ("global", "otsu" or "sauvola").
  * @property {number} dpi -  The current page image's DPI. Changes of it also affect the coordinate sytem.
+ * @property {number} page - The page to which the image configuration belongs.
+ * @property {number} config_version - The configuration's client-side version, which the server acknowledges.
  */
 
 /**
@@ -59,6 +62,12 @@ const dom_tesseract_arguments = document.querySelector("#tesseract_arguments")
 const dom_tesseract_language_1 = document.querySelector("#tesseract_language_1")
 /** @type {HTMLInputElement} */
 const dom_tesseract_language_2 = document.querySelector("#tesseract_language_2")
+/** @type {HTMLInputElement} */
+const dom_tesseract_ocr_workers = document.querySelector("#tesseract_ocr_workers")
+/** @type {HTMLSelectElement} */
+const dom_tesseract_ocr_engine = document.querySelector("#tesseract_ocr_engine")
+/** @type {HTMLInputElement} */
+const dom_tesseract_is_text_layer_used = document.querySelector("#tesseract_is_text_layer_used")
 
 /* ## Open PDF/project DOM variables ## */
 /** @type {HTMLInputElement} */
@@ -86,6 +95,10 @@ const dom_ocr_overwrite = document.querySelector("#ocr_overwrite")
 /** @type {HTMLInputElement} */
 const dom_ocr_append = document.querySelector("#ocr_append")
 
+/* ## Background job status DOM variable ## */
+/** @type {HTMLOutputElement} */
+const dom_job_status = document.querySelector("#job_status")
+
 /* ## Clear rects DOM variable ## */
 /** @type {HTMLInputElement} */
 const dom_clear_all_rects = document.querySelector("#clear_all_rects")
@@ -119,6 +132,30 @@ const dom_ccontext = dom_canvas.getContext('2d')
 // -> The canvas's image itself
 /** @type {HTMLImageElement} */
 var g_base_image = new Image()
+/** @type {string} - The version of the currently shown image, as sent by the server. */
+var g_image_version = ""
+/** @type {number} - The full-DPI width of the current image, i.e., the width of the Rect coordinate space. */
+var g_image_width = 0
+/** @type {number} - The full-DPI height of the current image, i.e., the height of the Rect coordinate space. */
+var g_image_height = 0
+/** @type {number} - The version of the latest image configuration sent to the server. */
+var g_sent_config_version = 0
+/** @type {number} - The version of the latest image configuration acknowledged by the server. */
+var g_acked_config_version = 0
+/** @type {number} - The downscaling factor of the loaded preview of the current image. */
+var g_image_reduction = 0
+/** @type {number[]} - The available downscaling factors of the server's preview image pyramid. */
+const g_preview_reductions = [1, 2, 4, 8]
+/** @type {number} - The width and height of a server tile in pixels of its pyramid level. */
+const g_tile_size = 512
+/** @type {number} - Pyramid levels with more pixels than this are loaded as tiles of the visible area only. */
+const g_tiled_level_min_pixels = 4000000
+/** @type {boolean} - Is true if the current image is shown as tiles instead of a single preview image. */
+var g_is_tiled = false
+/** @type {Map<string, {image: HTMLImageElement, reduction: number, tile_x: number, tile_y: number}>} - The requested tiles of the current image version. */
+var g_tiles = new Map()
+/** @type {boolean} - Is true if a visible tiles update is already scheduled for the next animation frame. */
+var g_is_tile_update_scheduled = false
 // -> Rect drawing variables
 /** @type {boolean} */
 var g_leftMouseIsDown = false
@@ -171,6 +208,13 @@ const dom_binarization_value = document.querySelector("#binarization_value")
 var g_is_binarization_changed = false
 /** @type {number} */
 var g_binarization_threshold = Number(dom_binarization_input.value)
+/* ## Black & white binarization method variables ## */
+// -> DOM variable
+/** @type {HTMLSelectElement} */
+const dom_binarization_method = document.querySelector("#binarization_method")
+// -> Value variable
+/** @type {string} */
+var g_binarization_method = dom_binarization_method.value
 
 
 /* # 3. SERVER COMMUNICATION HANDLERS & FUNCTIONS SECTION # */
@@ -179,7 +223,8 @@ socket.on('connect', function () {
     // alert("Connected!")
 })
 
-socket.on("data_update", function (json) {
+/* The server sends each changed part of the shown data as its own event */
+socket.on("project_update", function (json) {
     // Set current page
     dom_current_page.value = json["current_page"]
     g_current_page = json["current_page"]
@@ -192,6 +237,12 @@ socket.on("data_update", function (json) {
     // Set tesseract languages
     dom_tesseract_language_1.value = json["tesseract_language_1"]
     dom_tesseract_language_2.value = json["tesseract_language_2"]
+    // Set OCR run settings
+    dom_tesseract_ocr_workers.value = json["tesseract_ocr_workers"]
+    dom_tesseract_ocr_engine.value = json["tesseract_ocr_engine"]
+    dom_tesseract_is_text_layer_used.checked = json["tesseract_is_text_layer_used"]
+})
+socket.on("config_update", function (json) {
     // Set X zoom
     g_x_zoom_factor = json["x_zoom"] / 100
     dom_x_zoom_input.value = json["x_zoom"]
@@ -200,8 +251,6 @@ socket.on("data_update", function (json) {
     g_y_zoom_factor = json["y_zoom"] / 100
     dom_y_zoom_input.value = json["y_zoom"]
     dom_y_zoom_value.textContent = json["y_zoom"]
-    // Set transcript text
-    dom_text_area.value = json["text"]
     // Set rotation
     g_rotation = json["rotation"]
     dom_rotation_input.value = json["rotation"]
@@ -217,7 +266,14 @@ socket.on("data_update", function (json) {
     g_binarization_threshold = json["binarization_threshold"]
     dom_binarization_input.value = json["binarization_threshold"]
     dom_binarization_value.textContent = json["binarization_threshold"]
-    // Set rects
+    // Set binarization method
+    g_binarization_method = json["binarization_method"]
+    dom_binarization_method.value = json["binarization_method"]
+    zoom_canvas()
+    redraw_canvas()
+    load_preview_image()
+})
+socket.on("rects_update", function (json) {
     /** @type {Rect[]} */
     let new_rects = []
     for (let rect_data of json["rects"]) {
@@ -233,21 +289,152 @@ socket.on("data_update", function (json) {
         new_rects.push(rect)
     }
     g_rects = new_rects
-    // Set transformed image
-    g_base_image.src = json["image_base64"]
-    g_base_image.onload = function () {
-        zoom_canvas()
-        redraw_canvas()
+    redraw_canvas()
+})
+socket.on("transcript_update", function (json) {
+    dom_text_area.value = json["text"]
+})
+socket.on("image_update", function (json) {
+    // Only sent if the image's version changed
+    g_image_version = json["image_version"]
+    g_image_width = json["image_width"]
+    g_image_height = json["image_height"]
+    g_image_reduction = 0
+    g_tiles = new Map()
+    if (g_acked_config_version < g_sent_config_version) {
+        // The image is already outdated, as a newer image configuration is not acknowledged yet
+        return
+    }
+    zoom_canvas()
+    redraw_canvas()
+    load_preview_image()
+})
+socket.on("image_config_ack", function (json) {
+    g_acked_config_version = Math.max(g_acked_config_version, json["config_version"])
+    if (g_acked_config_version < g_sent_config_version) {
+        return
     }
+    // Now, the latest image (if any) belongs to the latest image configuration
+    zoom_canvas()
+    redraw_canvas()
+    load_preview_image()
 })
-socket.on("get_ocr", function (string) {
-    append_string_to_textarea(string)
-    handle_changed_text()
+/* Render, page and OCR jobs run in the background on the server */
+socket.on("job_started", function (json) {
+    dom_job_status.textContent = json["kind"] + "..."
+})
+socket.on("job_progress", function (json) {
+    dom_job_status.textContent = json["kind"] + ": " + json["message"]
+})
+socket.on("job_done", function (json) {
+    dom_job_status.textContent = json["is_successful"] ? "" : json["kind"] + " failed: " + json["error"]
 })
 socket.on('get_tesseract_path', function (string) {
     dom_tesseract_path.textContent = string
 })
 
+/**
+ * Loads the current image's preview level which fits the current zoom, if it is not already loaded.
+ *
+ * The preview is only used for display. Rects are always in the full-DPI coordinate space,
+ * as the canvas is sized after the full-DPI image size.
+ */
+function load_preview_image() {
+    if (!g_image_version) {
+        return
+    }
+    /** @type {number} - The needed image scale in relation to the full-DPI image. */
+    let scale = Math.max(g_x_zoom_factor, g_y_zoom_factor) * (window.devicePixelRatio || 1)
+    /** @type {number} */
+    let reduction = 1
+    for (let candidate of g_preview_reductions) {
+        if (1 / candidate >= scale) {
+            reduction = candidate
+        }
+    }
+    g_is_tiled = (g_image_width / reduction) * (g_image_height / reduction) > g_tiled_level_min_pixels
+    if (g_is_tiled) {
+        g_image_reduction = reduction
+        load_visible_tiles()
+        return
+    }
+    if (reduction === g_image_reduction) {
+        return
+    }
+    g_image_reduction = reduction
+    g_base_image.onload = function () {
+        redraw_canvas()
+    }
+    g_base_image.src = "page_image/" + g_image_version + "?reduction=" + reduction
+}
+
+/**
+ * Loads all not yet requested tiles of the current pyramid level which intersect the visible canvas area.
+ */
+function load_visible_tiles() {
+    if (!g_is_tiled) {
+        return
+    }
+    /** @type {DOMRect} */
+    let canvas_rect = dom_canvas.getBoundingClientRect()
+    // Visible canvas area in canvas pixels
+    /** @type {number} */
+    let left = Math.max(0, -canvas_rect.left)
+    /** @type {number} */
+    let top = Math.max(0, -canvas_rect.top)
+    /** @type {number} */
+    let right = Math.min(dom_canvas.width, window.innerWidth - canvas_rect.left)
+    /** @type {number} */
+    let bottom = Math.min(dom_canvas.height, window.innerHeight - canvas_rect.top)
+    // Tile size in canvas pixels
+    /** @type {number} */
+    let tile_width = g_tile_size * g_image_reduction * g_x_zoom_factor
+    /** @type {number} */
+    let tile_height = g_tile_size * g_image_reduction * g_y_zoom_factor
+    if ((right <= left) || (bottom <= top) || (tile_width <= 0) || (tile_height <= 0)) {
+        return
+    }
+    for (let tile_y = Math.floor(top / tile_height); tile_y * tile_height < bottom; tile_y++) {
+        for (let tile_x = Math.floor(left / tile_width); tile_x * tile_width < right; tile_x++) {
+            /** @type {string} */
+            let tile_path = g_image_reduction + "/" + tile_x + "/" + tile_y
+            if (g_tiles.has(tile_path)) {
+                continue
+            }
+            /** @type {HTMLImageElement} */
+            let image = new Image()
+            /** @type {string} */
+            let image_version = g_image_version
+            image.onload = function () {
+                if (image_version === g_image_version) {
+                    redraw_canvas()
+                }
+            }
+            image.src = "page_tile/" + g_image_version + "/" + tile_path
+            g_tiles.set(tile_path, {
+                image: image,
+                reduction: g_image_reduction,
+                tile_x: tile_x,
+                tile_y: tile_y,
+            })
+        }
+    }
+}
+
+/**
+ * Schedules load_visible_tiles() for the next animation frame, so that scroll bursts only cause one update.
+ */
+function schedule_visible_tiles_update() {
+    if (g_is_tile_update_scheduled) {
+        return
+    }
+    g_is_tile_update_scheduled = true
+    window.requestAnimationFrame(function () {
+        g_is_tile_update_scheduled = false
+        load_visible_tiles()
+    })
+}
+
 /* ## Client->server functions ## */
 /* ### "Indirect" functions (used internally in other client->server functions) ### */
 /**
@@ -261,7 +448,10 @@ function handle_changed_image_config() {
         rotation: g_rotation,
         is_binarized: g_is_binarized,
         binarization_threshold: g_binarization_threshold,
+        binarization_method: g_binarization_method,
         dpi: g_dpi,
+        page: g_current_page,
+        config_version: ++g_sent_config_version,
     }
     socket.emit("set_changed_image_config", image_config)
 }
@@ -270,7 +460,8 @@ function handle_changed_image_config() {
  * Handles a newly changed Rect status.
  */
 function handle_changed_rects() {
-    socket.emit("set_changed_rects", g_rects)
+    // The page is sent along, as a page change may be processed before the Rects arrive
+    socket.emit("set_changed_rects", { rects: g_rects, page: g_current_page })
 }
 
 /**
@@ -284,12 +475,12 @@ function send_new_page(page) {
 
 /* ### "Direct" functions (reactiong to event and/or directly sending signal to server) ### */
 /**
- * Adds a newline to the OCRA text area's text and
- * sends the signal to perform the OCR to the
- * OCRA server.py.
+ * Sends the OCRA text area's text and then the signal
+ * to perform the OCR to the OCRA server.py. The server
+ * appends the OCR result to the page's text.
  */
 function handle_appending_ocr() {
-    append_string_to_textarea("\n")
+    handle_changed_text()
     socket.emit("perform_ocr")
 }
 dom_ocr_append.onclick = function (event) {
@@ -305,7 +496,8 @@ dom_ocr_append.onclick = function (event) {
  * of the area afterwards.
  */
 function handle_changed_text() {
-    socket.emit("changed_text", dom_text_area.value)
+    // The page is sent along, as a page change may be processed before the text arrives
+    socket.emit("changed_text", { text: dom_text_area.value, page: g_current_page })
 }
 dom_text_area.onchange = function (event) {
     if (!event) {
@@ -442,6 +634,35 @@ dom_tesseract_language_2.onchange = function (event) {
     }
     handle_change_tesseract_languages()
 }
+/**
+ * Handles changes of the OCR run settings (e.g. the number of OCR workers).
+ * Leads to an OCR server signal.
+ */
+function handle_change_tesseract_ocr_settings() {
+    socket.emit("change_tesseract_ocr_settings", {
+        "ocr_workers": Number(dom_tesseract_ocr_workers.value),
+        "ocr_engine": dom_tesseract_ocr_engine.value,
+        "is_text_layer_used": dom_tesseract_is_text_layer_used.checked,
+    })
+}
+dom_tesseract_ocr_workers.onchange = function (event) {
+    if (!event) {
+        return
+    }
+    handle_change_tesseract_ocr_settings()
+}
+dom_tesseract_ocr_engine.onchange = function (event) {
+    if (!event) {
+        return
+    }
+    handle_change_tesseract_ocr_settings()
+}
+dom_tesseract_is_text_layer_used.onchange = function (event) {
+    if (!event) {
+        return
+    }
+    handle_change_tesseract_ocr_settings()
+}
 
 /* # 4. INPUT EVENT LISTENERS FUNCTIONS SECTION # */
 // X zoom
@@ -455,6 +676,7 @@ dom_x_zoom_input.addEventListener("input", (event) => {
     g_x_zoom_factor = Number(target.value) / 100
     zoom_canvas()
     redraw_canvas()
+    load_preview_image()
     handle_changed_image_config()
 })
 
@@ -469,6 +691,7 @@ dom_y_zoom_input.addEventListener("input", (event) => {
     g_y_zoom_factor = Number(target.value) / 100
     zoom_canvas()
     redraw_canvas()
+    load_preview_image()
     handle_changed_image_config()
 })
 
@@ -527,6 +750,15 @@ dom_binarization_is_active.addEventListener("click", (event) => {
     handle_changed_image_config()
 })
 
+// Binarization method
+dom_binarization_method.addEventListener("change", (event) => {
+    if (!event) {
+        return
+    }
+    g_binarization_method = event.target.value
+    handle_changed_image_config()
+})
+
 // Binarization threshold
 dom_binarization_value.textContent = dom_binarization_input.value
 dom_binarization_input.addEventListener("input", (event) => {
@@ -660,9 +892,13 @@ function redraw_canvas() {
     // Clear canvas
     dom_ccontext.clearRect(0, 0, dom_canvas.width, dom_canvas.height)
     // Draw image
-    dom_ccontext.drawImage(
-        g_base_image, 0, 0, g_base_image.width, g_base_image.height, 0, 0, dom_canvas.width, dom_canvas.height
-    )
+    if (g_is_tiled) {
+        draw_tiles()
+    } else {
+        dom_ccontext.drawImage(
+            g_base_image, 0, 0, g_base_image.width, g_base_image.height, 0, 0, dom_canvas.width, dom_canvas.height
+        )
+    }
     // Draw all rects
     /** @type {number} */
     let rect_counter = 0
@@ -671,12 +907,33 @@ function redraw_canvas() {
         rect_counter++
     }
 }
+/**
+ * Draws all loaded tiles of the current image, coarser pyramid levels first so that finer tiles cover them.
+ */
+function draw_tiles() {
+    /** @type {Array<{image: HTMLImageElement, reduction: number, tile_x: number, tile_y: number}>} */
+    let tiles = Array.from(g_tiles.values()).filter((tile) => tile.image.complete && tile.image.naturalWidth > 0)
+    tiles.sort((a, b) => b.reduction - a.reduction)
+    for (let tile of tiles) {
+        /** @type {number} */
+        let x_factor = tile.reduction * g_x_zoom_factor
+        /** @type {number} */
+        let y_factor = tile.reduction * g_y_zoom_factor
+        dom_ccontext.drawImage(
+            tile.image,
+            tile.tile_x * g_tile_size * x_factor,
+            tile.tile_y * g_tile_size * y_factor,
+            tile.image.naturalWidth * x_factor,
+            tile.image.naturalHeight * y_factor,
+        )
+    }
+}
 /**
  * Zooms the canvas widget according to the current settings.
  */
 function zoom_canvas() {
-    dom_canvas.width = g_base_image.width * g_x_zoom_factor
-    dom_canvas.height = g_base_image.height * g_y_zoom_factor
+    dom_canvas.width = g_image_width * g_x_zoom_factor
+    dom_canvas.height = g_image_height * g_y_zoom_factor
 }
 /* ## Canvas input listeners ## */
 dom_canvas.onmousedown = function (event) {
@@ -781,9 +1038,14 @@ function clear_textarea() {
 }
 
 /* # 7. STARTUP ROUTINE SECTION # */
+// Load the newly visible tiles while scrolling through a tiled image
+window.addEventListener("scroll", schedule_visible_tiles_update)
+window.addEventListener("resize", schedule_visible_tiles_update)
 // Load empty standard image at start-up
 g_base_image.src = "static/Empty.png"
 g_base_image.onload = function () {
+    g_image_width = g_base_image.width
+    g_image_height = g_base_image.height
     zoom_canvas()
     redraw_canvas()
 }
@@ -0,0 +1,250 @@
+"""OCR engines which run Tesseract on in-memory Rect images.
+
+Two engines are available:
+* "pytesseract": One Tesseract process per image through pytesseract.
+* "batch": Images with the same language are OCRed together through a
+  single Tesseract process per worker, which gets all images as a file
+  list. Thereby, the language models are loaded once per batch instead of
+  once per image. If a batch fails, its images fall back to the
+  "pytesseract" engine one by one.
+Both engines keep a long-lived pool of worker threads, each of which
+waits for its own Tesseract process.
+"""
+
+# IMPORTS SECTION #
+## EXTERNAL IMPORTS ##
+import os
+import pytesseract
+import shlex
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from typing import Callable
+
+## INTERNAL IMPORTS ##
+from metrics import g_tesseract_seconds
+
+# CONSTANTS SECTION #
+OCR_ENGINE_NAMES: tuple[str, ...] = ("batch", "pytesseract")
+"""The names of the available OCR engines, see this module's description."""
+
+
+# PUBLIC FUNCTIONS SECTION #
+def format_ocr_error(*, error: Exception) -> str:
+    """Returns the error line which replaces the OCR result of a failed image.
+
+    Args:
+        error (Exception): The error of the image's OCR.
+
+    Returns:
+        str: The error line.
+    """
+    return f"[OCR ERROR: {type(error).__name__}: {error}]\n"
+
+
+def ocr_rect_image(*, image: Image.Image, lang: str, config: str) -> str:
+    """Performs a Tesseract OCR of the given Rect image through pytesseract.
+
+    Errors do not abort the OCR. Instead, they are returned as error line.
+
+    Args:
+        image (Image.Image): The in-memory Rect image.
+        lang (str): The Tesseract language string, e.g. 'eng' or 'eng+deu'.
+        config (str): The extra Tesseract arguments.
+
+    Returns:
+        str: The OCR result text or, if the OCR failed, an error line.
+    """
+    try:
+        with g_tesseract_seconds.time(mode="single"):
+            return pytesseract.image_to_string(image=image, lang=lang, config=config)
+    except Exception as error:
+        return format_ocr_error(error=error)
+
+
+# CLASS DEFINITIONS SECTION #
+class OCREngine:
+    """Base class of all OCR engines. Its default behavior is the one of the "pytesseract" engine."""
+
+    def __init__(self, *, command_path: str, workers: int):
+        """Start-up of the long-lived worker thread pool.
+
+        Args:
+            command_path (str): Full path to the Tesseract executable. If empty, 'tesseract' is used.
+            workers (int): The maximal number of concurrently running Tesseract processes.
+        """
+        self.command_path: str = command_path or "tesseract"
+        """Full path to the Tesseract executable."""
+        self.workers: int = max(1, workers)
+        """The maximal number of concurrently running Tesseract processes."""
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="ocra_ocr"
+        )
+
+    def ocr_images(
+        self,
+        *,
+        images: list[Image.Image],
+        langs: list[str],
+        config: str,
+        report_progress: Callable[[int, int], None] | None = None,
+    ) -> list[str]:
+        """Performs a Tesseract OCR of each given image.
+
+        Args:
+            images (list[Image.Image]): The images.
+            langs (list[str]): The Tesseract language string of each image.
+            config (str): The extra Tesseract arguments.
+            report_progress (Callable[[int, int], None] | None, optional): If given, it is
+             called with the numbers of finished and all images whenever images are
+             finished. Defaults to None.
+
+        Returns:
+            list[str]: The OCR result (or error line) of each image, in the order of the images.
+        """
+        pytesseract.pytesseract.tesseract_cmd = self.command_path
+        futures = [
+            self._executor.submit(ocr_rect_image, image=image, lang=lang, config=config)
+            for image, lang in zip(images, langs)
+        ]
+        results: list[str] = []
+        for future in futures:
+            results.append(future.result())
+            if report_progress is not None:
+                report_progress(len(results), len(images))
+        return results
+
+    def shutdown(self) -> None:
+        """Stops the worker threads after their current work is done."""
+        self._executor.shutdown(wait=False)
+
+
+class TesseractBatchEngine(OCREngine):
+    """The "batch" OCR engine. See this module's description."""
+
+    def _ocr_batch(
+        self, images: list[Image.Image], lang: str, config: str
+    ) -> list[str]:
+        results: list[str] = [""] * len(images)
+        with tempfile.TemporaryDirectory(prefix="ocra_ocr_") as temp_folder_path:
+            image_paths: list[str] = []
+            batch_image_indexes: list[int] = []
+            for image_index, image in enumerate(images):
+                if image.mode not in ("1", "L", "RGB"):
+                    image = image.convert("RGB")
+                image_path = os.path.join(temp_folder_path, f"{image_index}.pnm")
+                try:
+                    image.save(image_path, format="PPM")
+                except Exception as error:
+                    # E.g. the empty crop of a zero-size Rect, which fails on its own
+                    results[image_index] = format_ocr_error(error=error)
+                    continue
+                image_paths.append(image_path)
+                batch_image_indexes.append(image_index)
+            if not image_paths:
+                return results
+            file_list_path = os.path.join(temp_folder_path, "images.txt")
+            with open(file_list_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(image_paths) + "\n")
+
+            not_windows = sys.platform != "win32"
+            try:
+                with g_tesseract_seconds.time(mode="batch"):
+                    process = subprocess.run(
+                        [
+                            self.command_path,
+                            file_list_path,
+                            "stdout",
+                            "-l",
+                            lang,
+                            *shlex.split(config, posix=not_windows),
+                        ],
+                        capture_output=True,
+                    )
+                # Tesseract ends each page's text with the page separator \f
+                batch_results = process.stdout.decode("utf-8").split("\f")[:-1]
+                is_failed = (process.returncode != 0) or (
+                    len(batch_results) != len(batch_image_indexes)
+                )
+            except (OSError, UnicodeDecodeError):
+                is_failed = True
+        if is_failed:
+            # Fallback in this worker thread, i.e., without waiting for other workers
+            pytesseract.pytesseract.tesseract_cmd = self.command_path
+            for image_index in batch_image_indexes:
+                results[image_index] = ocr_rect_image(
+                    image=images[image_index], lang=lang, config=config
+                )
+        else:
+            for image_index, result in zip(batch_image_indexes, batch_results):
+                results[image_index] = f"{result}\f"
+        return results
+
+    def ocr_images(
+        self,
+        *,
+        images: list[Image.Image],
+        langs: list[str],
+        config: str,
+        report_progress: Callable[[int, int], None] | None = None,
+    ) -> list[str]:
+        """Performs a Tesseract OCR of each given image with one Tesseract process per batch.
+
+        The images are grouped by language, and each group is split into at most as many
+        batches as there are workers.
+
+        Args:
+            images (list[Image.Image]): The images.
+            langs (list[str]): The Tesseract language string of each image.
+            config (str): The extra Tesseract arguments.
+            report_progress (Callable[[int, int], None] | None, optional): If given, it is
+             called with the numbers of finished and all images whenever a batch is
+             finished. Defaults to None.
+
+        Returns:
+            list[str]: The OCR result (or error line) of each image, in the order of the images.
+        """
+        image_indexes_by_lang: dict[str, list[int]] = {}
+        for image_index, lang in enumerate(langs):
+            image_indexes_by_lang.setdefault(lang, []).append(image_index)
+
+        batches: list[tuple[str, list[int]]] = []
+        for lang, image_indexes in image_indexes_by_lang.items():
+            batch_count = min(self.workers, len(image_indexes))
+            for batch_index in range(batch_count):
+                batches.append((lang, image_indexes[batch_index::batch_count]))
+
+        futures = [
+            self._executor.submit(
+                self._ocr_batch, [images[x] for x in image_indexes], lang, config
+            )
+            for lang, image_indexes in batches
+        ]
+        results: list[str] = [""] * len(images)
+        finished_image_count = 0
+        for (_, image_indexes), future in zip(batches, futures):
+            for image_index, result in zip(image_indexes, future.result()):
+                results[image_index] = result
+            finished_image_count += len(image_indexes)
+            if report_progress is not None:
+                report_progress(finished_image_count, len(images))
+        return results
+
+
+# ENGINE CREATION SECTION #
+def create_ocr_engine(*, engine: str, command_path: str, workers: int) -> OCREngine:
+    """Returns a new OCR engine of the given type (see this module's description).
+
+    Args:
+        engine (str): Either "batch" or "pytesseract".
+        command_path (str): Full path to the Tesseract executable.
+        workers (int): The maximal number of concurrently running Tesseract processes.
+
+    Returns:
+        OCREngine: The OCR engine.
+    """
+    if engine == "batch":
+        return TesseractBatchEngine(command_path=command_path, workers=workers)
+    return OCREngine(command_path=command_path, workers=workers)
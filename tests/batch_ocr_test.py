@@ -0,0 +1,103 @@
+import os
+
+import batch_ocr
+from batch_ocr import (
+    get_batch_failures_file_path,
+    get_batch_progress_file_path,
+    run_batch_ocr,
+)
+from ocra import OCRAProject, Rect
+from utils import json_load
+
+
+def test_run_batch_ocr_writes_transcripts_and_resumes(
+    ocra_project, fake_tesseract_path
+):
+    ocra_project.change_tesseract_path(tesseract_path=fake_tesseract_path)
+    for page in (1, 2):
+        ocra_project.move_to_page(new_page=page)
+        ocra_project.set_changed_rects_from_json(
+            rects_json=[{"x": 0, "y": 0, "w": 20 + page, "h": 5, "language_state": "1"}]
+        )
+    ocra_project.current_image_config.dpi = 72
+    ocra_project.write_current_image_config()
+    folder_path = ocra_project.folder_path
+
+    assert run_batch_ocr(folder_path=folder_path, workers=2, print_function=str) in (
+        [1, 2],
+        [2, 1],
+    )
+    assert json_load(
+        file_path=get_batch_progress_file_path(folder_path=folder_path)
+    ) == [1, 2]
+    ocra_project.move_to_page(new_page=2)
+    assert ocra_project.get_current_image_transcript().startswith("~PAGE 2~")
+    assert run_batch_ocr(folder_path=folder_path, print_function=str) == []
+    assert run_batch_ocr(
+        folder_path=folder_path,
+        first_page=2,
+        is_restarted=True,
+        ocr_engine="pytesseract",
+        is_text_layer_used=True,
+        print_function=str,
+    ) == [2]
+    assert "↓↓↓↓↓START RECT # 0 (" in ocra_project.get_current_image_transcript()
+    # The run's overrides are not written into the project
+    tesseract_config_json = ocra_project.project_store.read_tesseract_config()
+    assert tesseract_config_json["ocr_engine"] == "batch"
+    assert not tesseract_config_json["is_text_layer_used"]
+
+
+def test_run_batch_ocr_records_failed_pages(ocra_project, fake_tesseract_path):
+    ocra_project.change_tesseract_path(tesseract_path=fake_tesseract_path)
+    for page in (1, 2):
+        ocra_project.move_to_page(new_page=page)
+        ocra_project.set_changed_rects_from_json(
+            rects_json=[{"x": 0, "y": 0, "w": 20, "h": 5, "language_state": "1"}]
+        )
+    ocra_project.image_writer.flush()
+    folder_path = ocra_project.folder_path
+    transformed_images_path = ocra_project.get_transformed_images_path()
+    for file_name in os.listdir(transformed_images_path):
+        os.remove(os.path.join(transformed_images_path, file_name))
+    # Page 2's transcript cannot be written
+    os.makedirs(os.path.join(ocra_project.get_image_transcripts_path(), "2.txt"))
+
+    assert run_batch_ocr(folder_path=folder_path, workers=2, print_function=str) == [1]
+    failures = json_load(
+        file_path=get_batch_failures_file_path(folder_path=folder_path)
+    )
+    assert list(failures) == ["2"]
+    assert json_load(
+        file_path=get_batch_progress_file_path(folder_path=folder_path)
+    ) == [1]
+    # The OCR works on in-memory images only
+    assert os.listdir(transformed_images_path) == []
+
+    os.rmdir(os.path.join(ocra_project.get_image_transcripts_path(), "2.txt"))
+    assert run_batch_ocr(folder_path=folder_path, print_function=str) == [2]
+    assert (
+        json_load(file_path=get_batch_failures_file_path(folder_path=folder_path)) == {}
+    )
+
+
+def test_batch_ocr_worker_keeps_no_rect_images(ocra_project, fake_tesseract_path):
+    ocra_project.change_tesseract_path(tesseract_path=fake_tesseract_path)
+    for page in (1, 2):
+        ocra_project.move_to_page(new_page=page)
+        ocra_project.set_changed_rects_from_json(
+            rects_json=[{"x": 0, "y": 0, "w": 40, "h": 20, "language_state": "1"}]
+        )
+    ocra_project.close_project_store()
+
+    # The worker functions run in this process, as one worker OCRs several pages
+    batch_ocr._init_worker(ocra_project.folder_path, None, None)
+    worker_project = batch_ocr._g_worker_project
+    try:
+        for page in (1, 2, 1):
+            assert batch_ocr._ocr_page(page) == page
+            assert worker_project.rect_image_store.get_memory_size() == 0
+    finally:
+        worker_project.close_project_store()
+        worker_project.release_pdf_document()
+        batch_ocr._g_worker_project = None
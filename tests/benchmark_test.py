@@ -0,0 +1,43 @@
+from benchmark import compare_benchmark_results, run_benchmarks
+
+
+def test_run_benchmarks_covers_the_hot_paths(tmp_path):
+    results = run_benchmarks(
+        folder_path=str(tmp_path),
+        rounds=1,
+        dpis=(72,),
+        rotations=(0,),
+        rect_count=3,
+        print_function=str,
+    )
+
+    names = set(results["benchmarks"])
+    assert "transform_current_image[dpi=72,rotation=0,binarization=sauvola]" in names
+    assert {
+        "create_rect_images",
+        "data_update_json",
+        "encode_preview[reduction=1]",
+        "perform_ocr",
+        "move_to_page[cold]",
+        "move_to_page[cached]",
+    } <= names
+    assert results["benchmarks"]["data_update_json"]["payload_bytes"] > 0
+
+
+def test_compare_benchmark_results_reports_regressions():
+    baseline = {"benchmarks": {"a": {"median_ms": 10.0}, "b": {"median_ms": 0.1}}}
+    results = {
+        "benchmarks": {
+            "a": {"median_ms": 20.0},
+            "b": {"median_ms": 0.5},
+            "c": {"median_ms": 1.0},
+        }
+    }
+
+    assert compare_benchmark_results(baseline=baseline, results=results) == [
+        "a: 10.00 ms -> 20.00 ms (+100%)"
+    ]
+    assert (
+        compare_benchmark_results(baseline=baseline, results=results, tolerance=1.5)
+        == []
+    )
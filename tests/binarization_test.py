@@ -0,0 +1,34 @@
+import numpy as np
+from PIL import Image
+
+from binarization import binarize_global, binarize_sauvola, get_otsu_threshold
+
+
+def test_binarize_global_applies_threshold():
+    gray = np.arange(256, dtype=np.uint8).reshape(16, 16)
+    binarized = binarize_global(
+        image=Image.fromarray(gray).convert("RGB"), threshold=100
+    )
+    assert binarized.mode == "1"
+    assert (np.asarray(binarized) == (gray > 100)).all()
+
+
+def test_get_otsu_threshold_separates_two_gray_values():
+    gray = np.array([[40] * 10 + [200] * 10] * 5, dtype=np.uint8)
+    threshold = get_otsu_threshold(image=Image.fromarray(gray))
+    assert 40 <= threshold < 200
+
+
+def test_binarize_sauvola_matches_direct_computation():
+    gray = np.random.default_rng(0).integers(0, 256, size=(30, 23), dtype=np.uint8)
+    binarized = binarize_sauvola(
+        image=Image.fromarray(gray), window_size=5, strip_height=7
+    )
+    padded = np.pad(gray.astype(np.float64), 2, mode="edge")
+    expected = np.zeros(gray.shape, dtype=bool)
+    for y in range(gray.shape[0]):
+        for x in range(gray.shape[1]):
+            window = padded[y : y + 5, x : x + 5]
+            threshold = window.mean() * (1 + 0.2 * (window.std() / 128 - 1))
+            expected[y, x] = gray[y, x] > threshold
+    assert (np.asarray(binarized) == expected).all()
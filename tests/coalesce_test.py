@@ -0,0 +1,28 @@
+import threading
+
+from coalesce import LatestValueCoalescer
+
+
+def test_only_latest_value_is_processed_after_a_burst():
+    processed_values = []
+    is_processing = threading.Event()
+    is_released = threading.Event()
+
+    def process(key, value):
+        processed_values.append(value)
+        if value == 0:
+            is_processing.set()
+            is_released.wait(timeout=5)
+            assert coalescer.is_superseded(key=key)
+
+    coalescer = LatestValueCoalescer(function=process)
+    first_submit = threading.Thread(target=lambda: coalescer.submit(key=1, value=0))
+    first_submit.start()
+    assert is_processing.wait(timeout=5)
+    for value in range(1, 4):
+        coalescer.submit(key=1, value=value)
+    is_released.set()
+    first_submit.join(timeout=5)
+
+    assert processed_values == [0, 3]
+    assert not coalescer.is_superseded(key=1)
@@ -0,0 +1,36 @@
+import fitz
+import pytest
+
+from benchmark import write_fake_tesseract
+from ocra import OCRAProject
+
+
+@pytest.fixture
+def fake_tesseract_path(tmp_path) -> str:
+    """A fake Tesseract executable which 'recognizes' the language and size of each image."""
+    return write_fake_tesseract(file_path=str(tmp_path / "tesseract"))
+
+
+@pytest.fixture
+def pdf_file_path(tmp_path) -> str:
+    """A two-page PDF with a line of text on each page."""
+    pdf_file_path = str(tmp_path / "file.pdf")
+    document = fitz.open()
+    for page_index in range(2):
+        page = document.new_page()
+        page.insert_text((72, 72), f"Page {page_index + 1}", fontsize=24)
+    document.save(pdf_file_path)
+    return pdf_file_path
+
+
+@pytest.fixture
+def ocra_project(tmp_path, pdf_file_path) -> OCRAProject:
+    """An OCRA project of the two-page PDF, rendered with 72 DPI and without prefetching."""
+    project = OCRAProject(prefetch_radius=0)
+    project.create_project_from_pdf(
+        pdf_file_path=pdf_file_path, folder_path=str(tmp_path / "project")
+    )
+    project.current_image_config.dpi = 72
+    project.write_current_image_config()
+    project.transform_current_image()
+    return project
@@ -0,0 +1,34 @@
+import fitz
+
+from display_lists import DisplayListCache, estimate_display_list_size
+from render import rasterize_display_list, rasterize_page
+
+
+def test_display_list_rasterization_equals_page_rasterization(pdf_file_path):
+    document = fitz.open(pdf_file_path)
+    document.load_page(0).set_rotation(90)
+    cache = DisplayListCache(memory_budget=1024**2)
+
+    display_list = cache.get(document=document, page=1)
+    assert cache.get(document=document, page=1) is display_list
+    direct_pixmap = rasterize_page(page=document.load_page(0), dpi=100)
+    replayed_pixmap = rasterize_display_list(display_list=display_list, dpi=100)
+    assert (replayed_pixmap.width, replayed_pixmap.height) == (
+        direct_pixmap.width,
+        direct_pixmap.height,
+    )
+    assert replayed_pixmap.samples == direct_pixmap.samples
+
+
+def test_display_lists_are_evicted_in_lru_order(pdf_file_path):
+    document = fitz.open(pdf_file_path)
+    size = estimate_display_list_size(document=document, page=document.load_page(0))
+    cache = DisplayListCache(memory_budget=size + 1)
+
+    cache.get(document=document, page=1)
+    cache.get(document=document, page=2)
+    assert cache.get_pages() == [2]
+    assert cache.get_memory_size() <= size + 1
+
+    cache.clear()
+    assert (cache.get_pages(), cache.get_memory_size()) == ([], 0)
@@ -0,0 +1,47 @@
+import os
+from PIL import Image
+
+from image_cache import PageImageCache
+
+
+def test_lru_eviction_moves_images_to_disk(tmp_path):
+    cache = PageImageCache(memory_budget=2 * 100 * 100, disk_budget=100 * 100)
+    cache.set_disk_folder_path(folder_path=str(tmp_path))
+    images = [Image.new("L", (100, 100), color=x) for x in range(4)]
+    for index, image in enumerate(images):
+        cache.put((index,), image)
+
+    assert cache.get_memory_size() == 2 * 100 * 100
+    assert cache.get((0,)) is None
+    assert cache.get((1,)).getpixel((0, 0)) == 1
+    assert cache.get((3,)) is images[3]
+
+
+def test_get_marks_as_recently_used():
+    cache = PageImageCache(memory_budget=2 * 10 * 10, disk_budget=0)
+    cache.put((1,), Image.new("L", (10, 10)))
+    cache.put((2,), Image.new("L", (10, 10)))
+    cache.get((1,))
+    cache.put((3,), Image.new("L", (10, 10)))
+
+    assert cache.get((1,)) is not None
+    assert cache.get((2,)) is None
+
+
+def test_put_replaces_the_disk_tier_image(tmp_path):
+    cache = PageImageCache(memory_budget=100 * 100, disk_budget=2 * 100 * 100)
+    cache.set_disk_folder_path(folder_path=str(tmp_path))
+    cache.put((0,), Image.new("L", (100, 100), color=0))
+    cache.put((1,), Image.new("L", (100, 100), color=1))
+    cache._writer.flush()
+    assert len(os.listdir(tmp_path)) == 1
+
+    # Key 0 is on disk and gets a new image
+    new_image = Image.new("L", (100, 100), color=2)
+    cache.put((0,), new_image)
+    cache._writer.flush()
+    assert cache.get((0,)) is new_image
+    # Key 1 was demoted instead, and the stale file of key 0 is gone
+    assert len(os.listdir(tmp_path)) == 1
+    assert cache.get((1,)).getpixel((0, 0)) == 1
+    assert cache.get((0,)).getpixel((0, 0)) == 2
@@ -0,0 +1,40 @@
+import os
+
+from metrics import EventProfiler, MetricsRegistry
+
+
+def test_metrics_are_rendered_in_prometheus_text_format():
+    registry = MetricsRegistry()
+    histogram = registry.histogram(
+        name="test_seconds", description="Test durations.", buckets=(0.1, 1.0)
+    )
+    counter = registry.counter(name="test_total", description="Test counts.")
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.5, stage="a")
+    histogram.observe(5.0, stage="a")
+    counter.inc(cache="x", result="hit")
+    counter.inc(2, cache="x", result="hit")
+
+    assert registry.render().splitlines() == [
+        "# HELP test_seconds Test durations.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{stage="a",le="0.1"} 1',
+        'test_seconds_bucket{stage="a",le="1"} 2',
+        'test_seconds_bucket{stage="a",le="+Inf"} 3',
+        'test_seconds_sum{stage="a"} 5.55',
+        'test_seconds_count{stage="a"} 3',
+        "# HELP test_total Test counts.",
+        "# TYPE test_total counter",
+        'test_total{cache="x",result="hit"} 3.0',
+    ]
+
+
+def test_event_profiler_dumps_one_profile_per_outermost_block(tmp_path):
+    with EventProfiler(folder_path=None).profile("disabled"):
+        pass
+    profiler = EventProfiler(folder_path=str(tmp_path))
+    with profiler.profile("outer"):
+        with profiler.profile("inner"):
+            sum(range(1000))
+
+    assert [x.split("_", 1)[1] for x in os.listdir(tmp_path)] == ["outer.prof"]
@@ -0,0 +1,60 @@
+import pytest
+
+from ocra import Rect
+
+
+@pytest.mark.parametrize("ocr_engine", ["batch", "pytesseract"])
+def test_perform_ocr_keeps_rect_order_and_reports_errors(
+    ocra_project, fake_tesseract_path, ocr_engine
+):
+    ocra_project.tesseract_config.ocr_engine = ocr_engine
+    ocra_project.tesseract_config.ocr_workers = 2
+    ocra_project.change_tesseract_path(tesseract_path=fake_tesseract_path)
+    ocra_project.change_tesseract_languages(
+        languages_json={"language_1": "deu", "language_2": "bad"}
+    )
+    ocra_project.current_image_config.rects = [
+        Rect(coord_x=0, coord_y=0, width=10 + x, height=5, language_state=state)
+        for x, state in enumerate(["1", "2", "1_and_2"] * 4)
+    ]
+    # A zero-size Rect, e.g. of a click without a drag
+    ocra_project.current_image_config.rects.append(
+        Rect(coord_x=20, coord_y=20, width=0, height=0, language_state="1")
+    )
+
+    lines = ocra_project.perform_ocr().replace("\f", "").split("\n")
+
+    assert lines[0] == "~PAGE 1~"
+    for rect_counter in range(12):
+        block = lines[1 + 3 * rect_counter : 4 + 3 * rect_counter]
+        assert block[0] == f"↓↓↓↓↓START RECT # {rect_counter}"
+        assert block[2] == f"↑↑↑↑↑END RECT # {rect_counter}"
+        if rect_counter % 3 != 0:
+            assert block[1].startswith("[OCR ERROR: TesseractError")
+        else:
+            assert block[1].endswith(f" {10 + rect_counter}x5")
+    block = lines[37:40]
+    assert block[0] == "↓↓↓↓↓START RECT # 12"
+    assert block[1].startswith("[OCR ERROR: ")
+    assert block[2] == "↑↑↑↑↑END RECT # 12"
+
+
+def test_perform_ocr_uses_text_layer(ocra_project, fake_tesseract_path):
+    ocra_project.change_tesseract_path(tesseract_path=fake_tesseract_path)
+    ocra_project.tesseract_config.is_text_layer_used = True
+    ocra_project.current_image_config.rotation = 3
+    ocra_project.current_image_config.rects = [
+        Rect(coord_x=40, coord_y=110, width=160, height=-70, language_state="1"),
+        Rect(coord_x=300, coord_y=400, width=20, height=10, language_state="1"),
+    ]
+
+    lines = ocra_project.perform_ocr().replace("\f", "").split("\n")
+
+    assert lines[1:7] == [
+        "↓↓↓↓↓START RECT # 0 (text layer)",
+        "Page 1",
+        "↑↑↑↑↑END RECT # 0",
+        "↓↓↓↓↓START RECT # 1 (tesseract)",
+        "eng 20x10",
+        "↑↑↑↑↑END RECT # 1",
+    ]
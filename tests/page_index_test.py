@@ -0,0 +1,30 @@
+from ocra import OCRAProject
+
+
+def test_page_index_serves_page_changes_and_queries(ocra_project, monkeypatch):
+    ocra_project.set_changed_rects_from_json(
+        rects_json=[{"x": 1, "y": 2, "w": 3, "h": 4, "language_state": "1"}]
+    )
+    ocra_project.move_to_page(new_page=2)
+    ocra_project.set_changed_rects_from_json(
+        rects_json=[{"x": 5, "y": 6, "w": 7, "h": 8, "language_state": "2"}]
+    )
+    ocra_project.set_current_image_transcript("Page 2")
+
+    project = OCRAProject(cache_disk_budget=0, prefetch_radius=0)
+    project.load_ocra_project(folder_path=ocra_project.folder_path)
+    assert project.page_index.get_pages_with_rects() == [1, 2]
+    assert project.page_index.get_untranscribed_pages_with_rects() == [1]
+
+    # Page changes are served from the index without reading the stored configs
+    def read_image_config(**kwargs):
+        raise AssertionError("The stored ImageConfig was read")
+
+    monkeypatch.setattr(project.project_store, "read_image_config", read_image_config)
+    project.move_to_page(new_page=1)
+    assert project.current_image_config.rects[0].width == 3
+    project.current_image_config.rects[0].width = 30
+    assert project.get_page_image_config(page=1).rects[0].width == 3
+
+    project.set_current_image_transcript("Page 1")
+    assert project.page_index.get_untranscribed_pages_with_rects() == []
@@ -0,0 +1,115 @@
+import threading
+from concurrent.futures import Future
+
+from image_cache import PageImageCache
+from ocra import OCRAProject
+from prefetch import PagePrefetcher
+
+
+class StubExecutor:
+    """Stands in for the worker pool: submitted renders stay pending until the test resolves them."""
+
+    def __init__(self):
+        self.submitted: list[tuple[tuple, Future]] = []
+
+    def submit(self, function, *args) -> Future:
+        future = Future()
+        self.submitted.append((args, future))
+        return future
+
+    def shutdown(self, wait: bool = True, cancel_futures: bool = False) -> None:
+        pass
+
+
+def create_stub_prefetcher(
+    *, pdf_file_path: str, image_cache: PageImageCache, radius: int
+) -> tuple[PagePrefetcher, StubExecutor]:
+    prefetcher = PagePrefetcher(
+        pdf_file_path=pdf_file_path,
+        image_cache=image_cache,
+        radius=radius,
+        max_workers=1,
+    )
+    # No worker process has been started yet, as the pool starts them on the first job
+    prefetcher._executor.shutdown()
+    stub_executor = StubExecutor()
+    prefetcher._executor = stub_executor
+    return prefetcher, stub_executor
+
+
+def test_prefetch_cancels_moved_away_and_changed_pages(pdf_file_path):
+    image_cache = PageImageCache(memory_budget=1024**2, disk_budget=0)
+    prefetcher, executor = create_stub_prefetcher(
+        pdf_file_path=pdf_file_path, image_cache=image_cache, radius=2
+    )
+    dpis = {page: 72 for page in range(1, 11)}
+    get_cache_key = lambda page: (page, dpis[page], 0, False, "global", 0)
+
+    prefetcher.prefetch(center_page=5, page_count=10, get_cache_key=get_cache_key)
+    assert [args[0] for args, _ in executor.submitted] == [6, 4, 7, 3]
+    futures = {args[0]: future for args, future in executor.submitted}
+
+    # Page 3 leaves the neighbourhood and page 7's settings change
+    dpis[7] = 100
+    prefetcher.prefetch(center_page=6, page_count=10, get_cache_key=get_cache_key)
+    assert futures[3].cancelled()
+    assert futures[7].cancelled()
+    assert not futures[4].cancelled()
+    assert [args for args, _ in executor.submitted[4:]] == [
+        (7, 100, 0, False, "global", 0),
+        (5, 72, 0, False, "global", 0),
+        (8, 72, 0, False, "global", 0),
+    ]
+
+    # Finished renders end up in the cache and are not scheduled again
+    futures[4].set_running_or_notify_cancel()
+    futures[4].set_result(("L", (2, 2), bytes(4)))
+    assert image_cache.contains(get_cache_key(4))
+    prefetcher.prefetch(center_page=5, page_count=10, get_cache_key=get_cache_key)
+    assert 4 not in [args[0] for args, _ in executor.submitted[7:]]
+
+
+def test_foreground_render_never_waits_for_prefetch(tmp_path, pdf_file_path):
+    project = OCRAProject(prefetch_radius=0)
+    project.create_project_from_pdf(
+        pdf_file_path=pdf_file_path, folder_path=str(tmp_path / "project")
+    )
+    project.current_image_config.dpi = 72
+    project.write_current_image_config()
+    project.prefetcher, executor = create_stub_prefetcher(
+        pdf_file_path=project.get_project_pdf_file_path(),
+        image_cache=project.image_cache,
+        radius=1,
+    )
+    project.prefetch_neighbour_pages()
+    ((_, page_2_future),) = executor.submitted
+    # The worker is busy with page 2 and never finishes
+    page_2_future.set_running_or_notify_cancel()
+
+    move_thread = threading.Thread(target=project.move_to_page, kwargs={"new_page": 2})
+    move_thread.start()
+    move_thread.join(timeout=30)
+
+    assert not move_thread.is_alive()
+    assert project.current_transformed_image_page == 2
+    assert "rasterize" in project.last_render_timer.durations
+    assert not page_2_future.done()
+
+
+def test_foreground_render_cancels_pending_prefetch(tmp_path, pdf_file_path):
+    project = OCRAProject(prefetch_radius=0)
+    project.create_project_from_pdf(
+        pdf_file_path=pdf_file_path, folder_path=str(tmp_path / "project")
+    )
+    project.prefetcher, executor = create_stub_prefetcher(
+        pdf_file_path=project.get_project_pdf_file_path(),
+        image_cache=project.image_cache,
+        radius=1,
+    )
+    project.prefetch_neighbour_pages()
+    ((_, page_2_future),) = executor.submitted
+
+    project.move_to_page(new_page=2)
+
+    assert page_2_future.cancelled()
+    assert project.current_transformed_image_page == 2
@@ -0,0 +1,118 @@
+import os
+import time
+
+from ocra import OCRAProject
+from project_store import (
+    ProjectStore,
+    SQLiteProjectStore,
+    copy_project,
+    get_sqlite_file_path,
+)
+
+
+def test_sqlite_project_round_trip(tmp_path, pdf_file_path):
+    folder_path = str(tmp_path / "project")
+    project = OCRAProject(cache_disk_budget=0, prefetch_radius=0)
+    project.create_project_from_pdf(
+        pdf_file_path=pdf_file_path, folder_path=folder_path, store_type="sqlite"
+    )
+    assert isinstance(project.project_store, SQLiteProjectStore)
+    assert not os.path.isdir(f"{project.folder_path}image_configs")
+    project.set_changed_rects_from_json(
+        rects_json=[{"x": 1, "y": 2, "w": 3, "h": 4, "language_state": "1"}]
+    )
+    project.set_current_image_transcript("Page 1")
+    project.change_tesseract_arguments(arguments="--psm 6")
+    project.move_to_page(new_page=2)
+
+    loaded_project = OCRAProject(cache_disk_budget=0, prefetch_radius=0)
+    loaded_project.load_ocra_project(folder_path=folder_path)
+    assert loaded_project.current_page == 2
+    assert loaded_project.tesseract_config.extra_arguments == "--psm 6"
+    assert loaded_project.get_page_image_config(page=1).rects[0].width == 3
+    loaded_project.move_to_page(new_page=1)
+    assert loaded_project.get_current_image_transcript() == "Page 1"
+
+
+def test_copy_project_between_stores(ocra_project, tmp_path):
+    ocra_project.set_changed_rects_from_json(
+        rects_json=[{"x": 1, "y": 2, "w": 3, "h": 4, "language_state": "2"}]
+    )
+    ocra_project.set_current_image_transcript("Text")
+    sqlite_folder_path = str(tmp_path / "sqlite_project")
+    folder_folder_path = str(tmp_path / "folder_project")
+
+    copy_project(
+        folder_path=ocra_project.folder_path,
+        destination_folder_path=sqlite_folder_path,
+        store_type="sqlite",
+    )
+    copy_project(
+        folder_path=sqlite_folder_path,
+        destination_folder_path=folder_folder_path,
+        store_type="folder",
+    )
+    assert os.path.isfile(get_sqlite_file_path(folder_path=sqlite_folder_path))
+    assert not os.path.isfile(get_sqlite_file_path(folder_path=folder_folder_path))
+
+    for folder_path in (sqlite_folder_path, folder_folder_path):
+        project = OCRAProject(cache_disk_budget=0, prefetch_radius=0)
+        project.load_ocra_project(folder_path=folder_path)
+        assert project.current_image_config == ocra_project.current_image_config
+        assert project.get_current_image_transcript() == "Text"
+
+
+def test_write_behind_store_writes_on_flush_timer_and_close(ocra_project):
+    folder_path = ocra_project.folder_path
+    project = OCRAProject(cache_disk_budget=0, prefetch_radius=0, write_delay=60.0)
+    project.load_ocra_project(folder_path=folder_path)
+    project.set_changed_rects_from_json(
+        rects_json=[{"x": 1, "y": 2, "w": 3, "h": 4, "language_state": "1"}]
+    )
+    project.set_current_image_transcript("Pending")
+
+    file_store = ProjectStore(folder_path=folder_path)
+    assert file_store.read_image_config(page=1)["rects"] == []
+    assert file_store.read_transcript(page=1) == ""
+    assert project.get_current_image_transcript() == "Pending"
+    assert project.project_store.read_image_configs()[1]["rects"][0]["width"] == 3
+
+    project.move_to_page(new_page=2)
+    assert file_store.read_image_config(page=1)["rects"][0]["width"] == 3
+    assert file_store.read_transcript(page=1) == "Pending"
+    assert file_store.read_current_page() == 1
+
+    project.project_store.flush()
+    project.project_store.delay = 0.01
+    project.set_current_image_transcript("Timer")
+    for _ in range(500):
+        if file_store.read_transcript(page=2) == "Timer":
+            break
+        time.sleep(0.01)
+    assert file_store.read_transcript(page=2) == "Timer"
+
+    project.close_project_store()
+    assert file_store.read_current_page() == 2
+    assert not [x for x in os.listdir(folder_path) if x.endswith(".tmp")]
+
+
+def test_folder_store_writes_with_umask_and_syncs_on_flush(tmp_path, monkeypatch):
+    synced_file_descriptors: list[int] = []
+    monkeypatch.setattr(os, "fsync", synced_file_descriptors.append)
+    project_store = ProjectStore(folder_path=str(tmp_path))
+    project_store.initialize()
+    project_store.write_transcript(page=1, text="Page 1")
+    project_store.write_image_config(page=1, image_config_json={"dpi": 72})
+
+    assert synced_file_descriptors == []
+    if os.name == "posix":
+        umask = os.umask(0)
+        os.umask(umask)
+        file_mode = os.stat(tmp_path / "image_transcripts" / "1.txt").st_mode
+        assert file_mode & 0o777 == 0o666 & ~umask
+    assert os.listdir(tmp_path / "image_transcripts") == ["1.txt"]
+
+    project_store.flush()
+    assert len(synced_file_descriptors) == 2
+    project_store.close()
+    assert len(synced_file_descriptors) == 2
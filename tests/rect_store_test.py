@@ -0,0 +1,81 @@
+import os
+from PIL import Image
+
+from ocra import Rect
+from rect_store import RectImageStore
+
+
+def test_rect_image_store_checks_source_and_truncates():
+    store = RectImageStore()
+    image = Image.new("L", (2, 2))
+    for rect_index in range(3):
+        store.put(
+            page=1, rect_index=rect_index, source_key=("a", rect_index), image=image
+        )
+
+    assert store.get(page=1, rect_index=1, source_key=("a", 1)) is image
+    assert store.get(page=1, rect_index=1, source_key=("b", 1)) is None
+    assert store.get(page=2, rect_index=1, source_key=("a", 1)) is None
+    store.truncate_page(page=1, rect_count=1)
+    assert store.get(page=1, rect_index=0, source_key=("a", 0)) is image
+    assert store.get(page=1, rect_index=2, source_key=("a", 2)) is None
+
+
+def test_rect_images_keep_rect_order(ocra_project):
+    # More than 10 Rects, so that a lexical file order would put 10 before 2
+    ocra_project.current_image_config.rects = [
+        Rect(coord_x=0, coord_y=0, width=10 + x, height=5, language_state="1")
+        for x in range(12)
+    ]
+
+    rect_images = ocra_project.get_current_rect_images()
+    assert [image.size for image in rect_images] == [(10 + x, 5) for x in range(12)]
+    assert ocra_project.get_current_rect_images()[11] is rect_images[11]
+    assert ocra_project.get_current_rect_images(rect_indexes=[11, 2]) == [
+        rect_images[11],
+        rect_images[2],
+    ]
+
+    ocra_project.current_image_config.rects[2].width = 30
+    assert ocra_project.get_current_rect_images()[2].size == (30, 5)
+
+
+def test_exported_rect_images_have_deterministic_names(ocra_project):
+    ocra_project.current_image_config.rects = [
+        Rect(coord_x=0, coord_y=0, width=10 + x, height=5, language_state="1")
+        for x in range(12)
+    ]
+    ocra_project.create_rect_images()
+
+    file_names = ocra_project.get_existing_current_rect_images()
+    assert file_names == [f"1_{x}.png" for x in range(12)]
+    for rect_index, file_name in enumerate(file_names):
+        file_path = os.path.join(ocra_project.get_rect_images_path(), file_name)
+        with Image.open(file_path) as image:
+            assert image.size == (10 + rect_index, 5)
+
+    # Re-exporting fewer Rects leaves no stale files behind
+    image_config = ocra_project.current_image_config
+    image_config.rects = image_config.rects[:3]
+    ocra_project.create_rect_images()
+    assert ocra_project.get_existing_current_rect_images() == [
+        "1_0.png",
+        "1_1.png",
+        "1_2.png",
+    ]
+    assert not os.path.exists(ocra_project.get_current_rect_image_path(3))
+
+
+def test_rect_image_store_keeps_only_the_current_page(ocra_project):
+    memory_sizes = []
+    for page in (1, 2, 1, 2):
+        ocra_project.move_to_page(new_page=page)
+        ocra_project.current_image_config.rects = [
+            Rect(coord_x=0, coord_y=0, width=100, height=50, language_state="1")
+        ]
+        ocra_project.get_current_rect_images()
+        memory_sizes.append(ocra_project.rect_image_store.get_memory_size())
+
+    assert memory_sizes == [100 * 50 * 4] * 4
+    ocra_project.move_to_page(new_page=1)
+    assert ocra_project.rect_image_store.get_memory_size() == 0
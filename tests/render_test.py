@@ -0,0 +1,179 @@
+import fitz
+from io import BytesIO
+from PIL import Image
+
+from ocra import OCRAProject
+from render import (
+    StageTimer,
+    encode_preview_image,
+    extract_native_page_image,
+    get_native_page_image,
+    get_pdf_clip_rect,
+    pixmap_to_image,
+    rasterize_page,
+)
+
+
+def test_pixmap_to_image(pdf_file_path):
+    page = fitz.open(pdf_file_path).load_page(0)
+    pixmap = rasterize_page(page=page, dpi=72)
+    image = pixmap_to_image(pixmap=pixmap)
+    assert image.size == (pixmap.width, pixmap.height)
+    assert image.getpixel((0, 0)) == pixmap.pixel(0, 0)
+
+
+def test_transform_current_image_writes_in_background(tmp_path, pdf_file_path):
+    project = OCRAProject()
+    project.create_project_from_pdf(
+        pdf_file_path=pdf_file_path, folder_path=str(tmp_path / "project")
+    )
+    project.set_changed_image_config_from_json(
+        config_json={
+            "x_zoom": 0.25,
+            "y_zoom": 0.25,
+            "rotation": 2,
+            "is_binarized": True,
+            "binarization_threshold": 130,
+            "dpi": 100,
+        }
+    )
+    assert "rasterize" in project.last_render_timer.durations
+    assert "binarize" in project.last_render_timer.durations
+    project.image_writer.flush()
+    file_path = project.get_current_transformed_image_file_path()
+    assert fitz.Pixmap(file_path).width == project.current_transformed_image.width
+
+
+def test_stage_timer_report():
+    timer = StageTimer()
+    with timer.stage("a"):
+        pass
+    with timer.stage("a"):
+        pass
+    assert list(timer.durations) == ["a"]
+    assert timer.report().splitlines()[-1].startswith("total")
+
+
+def test_encode_preview_image():
+    image = Image.new("1", (101, 50), color=1)
+    png_bytes, mimetype = encode_preview_image(image=image, reduction=1)
+    assert mimetype == "image/png"
+    assert Image.open(BytesIO(png_bytes)).size == (101, 50)
+    jpeg_bytes, mimetype = encode_preview_image(image=image, reduction=4)
+    assert mimetype == "image/jpeg"
+    assert Image.open(BytesIO(jpeg_bytes)).size == (26, 13)
+
+
+def test_threshold_change_only_reruns_binarization(ocra_project):
+    config_json = {
+        "x_zoom": 0.25,
+        "y_zoom": 0.25,
+        "rotation": 3,
+        "is_binarized": True,
+        "binarization_threshold": 130,
+        "dpi": 72,
+    }
+    ocra_project.set_changed_image_config_from_json(config_json=config_json)
+    assert "rotate" in ocra_project.last_render_timer.durations
+
+    ocra_project.set_changed_image_config_from_json(
+        config_json=config_json | {"binarization_threshold": 150}
+    )
+    durations = ocra_project.last_render_timer.durations
+    assert "binarize" in durations
+    assert "rasterize" not in durations
+    assert "rotate" not in durations
+
+
+def create_scan_pdf(*, file_path: str) -> None:
+    """Creates a PDF with a 150 DPI 'scan' page with invisible text and a mixed-content page."""
+    scan_bytes = BytesIO()
+    Image.effect_noise((1275, 1650), 64).save(scan_bytes, format="PNG")
+    document = fitz.open()
+    scan_page = document.new_page(width=612, height=792)
+    scan_page.insert_image(scan_page.rect, stream=scan_bytes.getvalue())
+    scan_page.insert_text((72, 72), "Invisible text layer", render_mode=3)
+    mixed_page = document.new_page(width=612, height=792)
+    mixed_page.insert_image(mixed_page.rect, stream=scan_bytes.getvalue())
+    mixed_page.insert_text((72, 72), "Visible text")
+    document.save(file_path)
+
+
+def test_native_page_image_extraction(tmp_path):
+    pdf_file_path = str(tmp_path / "scan.pdf")
+    create_scan_pdf(file_path=pdf_file_path)
+    document = fitz.open(pdf_file_path)
+
+    native_page_image = get_native_page_image(page=document.load_page(0))
+    assert native_page_image is not None
+    assert native_page_image.native_dpi == 150
+    assert get_native_page_image(page=document.load_page(1)) is None
+
+    for dpi in (150, 200):
+        image = extract_native_page_image(
+            document=document, native_page_image=native_page_image, dpi=dpi
+        )
+        pixmap = rasterize_page(page=document.load_page(0), dpi=dpi)
+        assert image.size == (pixmap.width, pixmap.height)
+    native_image = extract_native_page_image(
+        document=document, native_page_image=native_page_image, dpi=150
+    )
+    rasterized_image = pixmap_to_image(
+        pixmap=rasterize_page(page=document.load_page(0), dpi=150)
+    )
+    assert native_image.getpixel((10, 10)) == rasterized_image.getpixel((10, 10))[0]
+
+
+def test_scanned_page_is_extracted_with_native_dpi(tmp_path):
+    pdf_file_path = str(tmp_path / "scan.pdf")
+    create_scan_pdf(file_path=pdf_file_path)
+    project = OCRAProject(prefetch_radius=0)
+    project.create_project_from_pdf(
+        pdf_file_path=pdf_file_path, folder_path=str(tmp_path / "project")
+    )
+    assert project.current_image_config.dpi == 150
+    assert "extract_image" in project.last_render_timer.durations
+    assert "rasterize" not in project.last_render_timer.durations
+    assert project.current_transformed_image.size == (1275, 1650)
+
+    project.move_to_page(new_page=2)
+    assert project.current_image_config.dpi == 500
+    assert "rasterize" in project.last_render_timer.durations
+
+
+def test_get_pdf_clip_rect_of_rotated_page():
+    document = fitz.open()
+    page = document.new_page()
+    page.insert_text((250, 300), "Centered text", fontsize=24)
+    page.set_rotation(90)
+    image = pixmap_to_image(pixmap=rasterize_page(page=page, dpi=144)).convert("L")
+    # Asymmetric angles catch sign errors; the white fill keeps the corners out of the box
+    for rotation in (0, 30, -30, 180):
+        rotated_image = image.rotate(rotation, fillcolor=255)
+        rotated_box = Image.eval(rotated_image, lambda value: 255 - value).getbbox()
+        clip = get_pdf_clip_rect(page=page, box=rotated_box, dpi=144, rotation=rotation)
+        assert page.get_text("text", clip=clip + (-1, -1, 1, 1)) == "Centered text\n"
+
+
+def test_revisited_page_is_taken_from_the_stage_cache(ocra_project):
+    # Page 2 is rendered once, so that later visits add no cache entries
+    ocra_project.move_to_page(new_page=2)
+    ocra_project.move_to_page(new_page=1)
+    for rotation in (0, 90):
+        ocra_project.current_image_config.rotation = rotation
+        ocra_project.write_current_image_config()
+        ocra_project.transform_current_image()
+        image = ocra_project.current_transformed_image
+        memory_size = ocra_project.image_cache.get_memory_size()
+        ocra_project.image_writer.flush()
+        # A stale page image file is never read
+        Image.new("RGB", (3, 3)).save(
+            ocra_project.get_current_transformed_image_file_path()
+        )
+
+        ocra_project.move_to_page(new_page=2)
+        ocra_project.move_to_page(new_page=1)
+
+        assert ocra_project.current_transformed_image is image
+        assert "rasterize" not in ocra_project.last_render_timer.durations
+        assert ocra_project.image_cache.get_memory_size() == memory_size
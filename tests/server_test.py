@@ -0,0 +1,230 @@
+from io import BytesIO
+from PIL import Image
+
+import server
+from ocra import OCRAProject
+from tiles import TILE_SIZE
+
+
+def connect_client(ocra_project):
+    """Connects a Socket.IO test client whose session has the given project."""
+    client = server.socketio.test_client(server.app)
+    sid = server.socketio.server.manager.sid_from_eio_sid(client.eio_sid, "/")
+    session = server.g_session_manager.get_session(sid=sid)
+    session.project = ocra_project
+    client.get_received()
+    return client, session
+
+
+def test_page_image_route(ocra_project):
+    socketio_client, _ = connect_client(ocra_project)
+    client = server.app.test_client()
+    version = ocra_project.data_update_json()["image_version"]
+
+    response = client.get(f"/page_image/{version}")
+    assert response.status_code == 200
+    assert response.mimetype == "image/png"
+    assert response.data.startswith(b"\x89PNG")
+
+    response = client.get(
+        f"/page_image/{version}", headers={"If-None-Match": f"{version}-1"}
+    )
+    assert response.status_code == 304
+
+    response = client.get(f"/page_image/{version}?reduction=2")
+    assert response.mimetype == "image/jpeg"
+    assert client.get(f"/page_image/{version}?reduction=3").status_code == 404
+
+    ocra_project.current_image_config.rotation = 90
+    ocra_project.transform_current_image()
+    assert client.get(f"/page_image/{version}").status_code == 404
+
+    socketio_client.disconnect()
+    version = ocra_project.get_current_image_version()
+    assert client.get(f"/page_image/{version}").status_code == 404
+
+
+def test_emit_data_updates_sends_only_changed_parts(ocra_project):
+    client, session = connect_client(ocra_project)
+
+    session.emit_data_updates()
+    assert [x["name"] for x in client.get_received()] == [
+        "project_update",
+        "config_update",
+        "rects_update",
+        "transcript_update",
+        "image_update",
+    ]
+
+    client.emit(
+        "set_changed_rects",
+        {
+            "rects": [{"x": 1, "y": 2, "w": 3, "h": 4, "language_state": "1"}],
+            "page": 1,
+        },
+    )
+    client.emit("new_page", 2)
+    session.job_executor.flush()
+    received = {x["name"]: x["args"][0] for x in client.get_received()}
+    assert "transcript_update" not in received
+    assert received["rects_update"] == {"rects": []}
+    assert received["project_update"]["current_page"] == 2
+
+
+def test_page_tile_route(ocra_project):
+    socketio_client, _ = connect_client(ocra_project)
+    client = server.app.test_client()
+    version = ocra_project.get_current_image_version()
+    width, height = ocra_project.get_current_transformed_image().size
+
+    response = client.get(f"/page_tile/{version}/1/0/0")
+    assert response.status_code == 200
+    assert Image.open(BytesIO(response.data)).size == (
+        min(width, TILE_SIZE),
+        min(height, TILE_SIZE),
+    )
+    assert (
+        client.get(f"/page_tile/{version}/1/{width // TILE_SIZE + 1}/0").status_code
+        == 404
+    )
+
+    ocra_project.current_image_config.rotation = 90
+    ocra_project.transform_current_image()
+    assert client.get(f"/page_tile/{version}/1/0/0").status_code == 404
+    socketio_client.disconnect()
+
+
+def test_image_config_is_acknowledged(ocra_project):
+    client, session = connect_client(ocra_project)
+
+    config_json = ocra_project.get_data_update_parts(part_names=("config",))["config"]
+    client.emit(
+        "set_changed_image_config",
+        config_json
+        | {
+            "x_zoom": 0.25,
+            "y_zoom": 0.25,
+            "rotation": 90,
+            "page": 1,
+            "config_version": 7,
+        },
+    )
+    session.job_executor.flush()
+    received = client.get_received()
+    assert [x["name"] for x in received][-3:] == [
+        "image_update",
+        "image_config_ack",
+        "job_done",
+    ]
+    assert received[-2]["args"][0] == {"config_version": 7}
+    assert ocra_project.current_image_config.rotation == 90
+
+
+def test_perform_ocr_runs_as_job(ocra_project, fake_tesseract_path):
+    ocra_project.change_tesseract_path(tesseract_path=fake_tesseract_path)
+    ocra_project.set_changed_rects_from_json(
+        rects_json=[{"x": 0, "y": 0, "w": 10, "h": 5, "language_state": "1"}]
+    )
+    client, session = connect_client(ocra_project)
+
+    client.emit("changed_text", {"text": "Before", "page": 1})
+    client.emit("perform_ocr")
+    session.job_executor.flush()
+    received = client.get_received()
+    assert [x["name"] for x in received] == [
+        "job_started",
+        "job_progress",
+        "transcript_update",
+        "job_done",
+    ]
+    assert received[1]["args"][0]["progress"] == 1.0
+    text = received[2]["args"][0]["text"]
+    assert text.startswith("Before\n~PAGE 1~\n")
+    assert "10x5" in text
+    assert received[3]["args"][0]["is_successful"]
+
+
+def test_edits_stay_on_their_page_during_page_moves(ocra_project, fake_tesseract_path):
+    ocra_project.change_tesseract_path(tesseract_path=fake_tesseract_path)
+    ocra_project.set_changed_rects_from_json(
+        rects_json=[{"x": 0, "y": 0, "w": 10, "h": 5, "language_state": "1"}]
+    )
+    client, session = connect_client(ocra_project)
+
+    # OCR and then a page move are queued, while the page 1 edits arrive after the move
+    client.emit("perform_ocr")
+    client.emit("new_page", 2)
+    session.job_executor.flush()
+    assert ocra_project.current_page == 2
+    page_1_text = ocra_project.project_store.read_transcript(page=1)
+    client.emit("changed_text", {"text": page_1_text + "Edited", "page": 1})
+    client.emit(
+        "set_changed_rects",
+        {
+            "rects": [{"x": 1, "y": 2, "w": 30, "h": 40, "language_state": "2"}],
+            "page": 1,
+        },
+    )
+
+    assert page_1_text.startswith("\n~PAGE 1~\n")
+    assert "10x5" in page_1_text
+    assert ocra_project.get_current_image_transcript() == ""
+    assert ocra_project.current_image_config.rects == []
+    ocra_project.move_to_page(new_page=1)
+    assert ocra_project.get_current_image_transcript().endswith("Edited")
+    assert ocra_project.current_image_config.rects[0].width == 30
+    client.disconnect()
+
+
+def test_sessions_are_isolated(ocra_project, tmp_path, pdf_file_path):
+    client_1, session_1 = connect_client(ocra_project)
+    client_2, session_2 = connect_client(OCRAProject(prefetch_radius=0))
+    assert session_1 is not session_2
+
+    client_1.emit("new_page", 2)
+    session_1.job_executor.flush()
+    assert "project_update" in [x["name"] for x in client_1.get_received()]
+    assert client_2.get_received() == []
+    assert session_2.project.current_page == 1
+
+    client_2.disconnect()
+    client_1.disconnect()
+
+
+def test_metrics_route(ocra_project):
+    socketio_client, session = connect_client(ocra_project)
+    socketio_client.emit("new_page", 2)
+    session.job_executor.flush()
+
+    text = server.app.test_client().get("/metrics").get_data(as_text=True)
+    assert 'ocra_socketio_event_seconds_count{event="new_page"}' in text
+    assert 'ocra_job_seconds_count{kind="page"}' in text
+    assert 'ocra_render_stage_seconds_bucket{stage="rasterize",le="+Inf"}' in text
+    assert 'ocra_payload_bytes_count{kind="project_update"}' in text
+    assert 'ocra_cache_requests_total{cache="page_image",result="miss"}' in text
+    socketio_client.disconnect()
+
+
+def test_change_tesseract_ocr_settings(ocra_project):
+    client, session = connect_client(ocra_project)
+
+    client.emit(
+        "change_tesseract_ocr_settings", {"ocr_workers": 3, "ocr_engine": "pytesseract"}
+    )
+    assert ocra_project.tesseract_config.ocr_workers == 3
+    assert ocra_project.tesseract_config.ocr_engine == "pytesseract"
+    assert not ocra_project.tesseract_config.is_text_layer_used
+    client.emit("change_tesseract_ocr_settings", {"is_text_layer_used": True})
+    assert ocra_project.tesseract_config.is_text_layer_used
+    assert ocra_project.tesseract_config.ocr_workers == 3
+    assert ocra_project.project_store.read_tesseract_config()["ocr_workers"] == 3
+    project_json = ocra_project.get_data_update_parts(part_names=("project",))[
+        "project"
+    ]
+    assert project_json["tesseract_ocr_workers"] == 3
+    assert project_json["tesseract_ocr_engine"] == "pytesseract"
+    assert project_json["tesseract_is_text_layer_used"]
+    # The browser sent the settings itself, so they are not echoed back
+    session.emit_data_updates()
+    assert "project_update" not in [x["name"] for x in client.get_received()]
+    client.disconnect()
@@ -0,0 +1,122 @@
+import os
+import threading
+
+from project_store import open_project_store
+from sessions import SessionManager
+
+
+def create_session_manager(**kwargs) -> SessionManager:
+    return SessionManager(
+        create_emit=lambda sid: lambda event, data: None,
+        cache_disk_budget=0,
+        prefetch_radius=0,
+        **kwargs,
+    )
+
+
+def test_projects_of_the_same_pdf_file_share_their_image_cache(tmp_path, pdf_file_path):
+    session_manager = create_session_manager()
+    first_project = session_manager.new_project(sid="a")
+    first_project.create_project_from_pdf(
+        pdf_file_path=pdf_file_path, folder_path=str(tmp_path / "a")
+    )
+    first_project.close_project_store()
+    second_project = session_manager.new_project(sid="b")
+    second_project.load_ocra_project(folder_path=first_project.folder_path)
+    other_project = session_manager.new_project(sid="c")
+    other_project.create_project_from_pdf(
+        pdf_file_path=pdf_file_path, folder_path=str(tmp_path / "c")
+    )
+
+    assert first_project.image_cache is second_project.image_cache
+    # Another project has its own copy of the PDF
+    assert other_project.image_cache is not first_project.image_cache
+
+    # A changed PDF file gets a new cache
+    pdf_stat = os.stat(first_project.get_project_pdf_file_path())
+    os.utime(
+        first_project.get_project_pdf_file_path(),
+        ns=(pdf_stat.st_atime_ns, pdf_stat.st_mtime_ns + 10**9),
+    )
+    third_project = session_manager.new_project(sid="d")
+    third_project.load_ocra_project(folder_path=first_project.folder_path)
+    assert third_project.image_cache is not first_project.image_cache
+    for sid in ("a", "b", "c", "d"):
+        session_manager.remove_session(sid=sid)
+
+
+def test_idle_pdfs_are_released_in_lru_order(tmp_path, pdf_file_path):
+    session_manager = create_session_manager(max_open_projects=1)
+    first_project = session_manager.new_project(sid="a")
+    first_project.create_project_from_pdf(
+        pdf_file_path=pdf_file_path, folder_path=str(tmp_path / "a")
+    )
+    second_project = session_manager.new_project(sid="b")
+    second_project.create_project_from_pdf(
+        pdf_file_path=pdf_file_path, folder_path=str(tmp_path / "b")
+    )
+    assert session_manager.get_open_project_count() == 2
+
+    session_manager.get_session(sid="b")
+    assert first_project.pdf_document.is_closed
+    assert not second_project.pdf_document.is_closed
+
+    session_manager.get_session(sid="a")
+    assert len(first_project.get_pdf_document()) == 2
+    session_manager.get_session(sid="a")
+    assert second_project.pdf_document.is_closed
+    assert session_manager.get_open_project_count() == 1
+
+
+def test_jobs_run_on_the_project_of_their_submission(tmp_path, pdf_file_path):
+    session_manager = create_session_manager()
+    first_project = session_manager.new_project(sid="a")
+    first_project.create_project_from_pdf(
+        pdf_file_path=pdf_file_path,
+        folder_path=str(tmp_path / "a"),
+        store_type="sqlite",
+    )
+    session = session_manager.get_session(sid="a")
+    job_projects = []
+    done_results = []
+    session.submit_project_job(
+        kind="page",
+        function=lambda project, report_progress: job_projects.append(project),
+        on_done=done_results.append,
+    )
+    session.job_executor.flush()
+    assert job_projects == [first_project]
+    assert done_results == [None]
+
+    # The browser opens another project while a job of the first one runs and others wait
+    is_job_started = threading.Event()
+    is_job_released = threading.Event()
+
+    def block(project, report_progress):
+        is_job_started.set()
+        is_job_released.wait(timeout=30)
+        project.set_current_image_transcript("Written by the running job")
+
+    session.submit_project_job(kind="page", function=block, on_done=done_results.append)
+    session.submit_project_job(
+        kind="page",
+        function=lambda project, report_progress: job_projects.append(project),
+        on_done=done_results.append,
+    )
+    session.submit_image_config(config_json={"page": 1, "rotation": 90})
+    assert is_job_started.wait(timeout=30)
+    threading.Timer(0.2, is_job_released.set).start()
+    second_project = session_manager.new_project(sid="a")
+    second_project.create_project_from_pdf(
+        pdf_file_path=pdf_file_path, folder_path=str(tmp_path / "b")
+    )
+    session.job_executor.flush()
+
+    assert job_projects == [first_project]
+    assert done_results == [None]
+    assert second_project.current_image_config.rotation == 0
+    # The running job finished before the first project's store was closed
+    project_store = open_project_store(folder_path=str(tmp_path / "a"))
+    assert project_store.read_transcript(page=1) == "Written by the running job"
+    project_store.close()
+    session_manager.remove_session(sid="a")
@@ -0,0 +1,122 @@
+"""Server-side cache of the fixed-size tiles of transformed page images.
+
+For very high DPI renders, the browser does not load a whole page image.
+Instead, it requests only the tiles which intersect its visible canvas
+area. Each tile belongs to one level of the preview image pyramid (see
+render.PREVIEW_REDUCTIONS), i.e., a tile always has TILE_SIZE x TILE_SIZE
+pixels of its level (or less at the level's right and bottom edges).
+All tiles of one image version form a tile set. As an image version never
+changes, a tile set becomes invalid as a whole as soon as the ImageConfig
+changes; only the latest few tile sets are kept.
+"""
+
+# IMPORTS SECTION #
+## EXTERNAL IMPORTS ##
+import threading
+from collections import OrderedDict
+from PIL import Image
+from typing import Callable
+
+## INTERNAL IMPORTS ##
+from metrics import g_encode_seconds
+from render import encode_display_image, reduce_image
+
+# CONSTANTS SECTION #
+TILE_SIZE: int = 512
+"""The width and height of a tile in pixels of its pyramid level."""
+
+
+# CLASS DEFINITIONS SECTION #
+class TileSet:
+    """The downscaled pyramid levels and encoded tiles of one image version."""
+
+    def __init__(self):
+        """Start-up of the (empty) level and tile storages."""
+        self.levels: dict[int, Image.Image] = {}
+        """The downscaled images by their reduction."""
+        self.tiles: dict[tuple[int, int, int], tuple[bytes, str]] = {}
+        """The encoded tiles (and their MIME types) by (reduction, tile X, tile Y)."""
+
+
+class TileCache:
+    """Thread-safe LRU cache of the tile sets of the latest image versions."""
+
+    def __init__(self, *, max_tile_sets: int = 2):
+        """Start-up of the tile set storage.
+
+        Args:
+            max_tile_sets (int, optional): The number of kept tile sets. Defaults to 2,
+             so that toggling back to the previous image settings stays cached.
+        """
+        self.max_tile_sets: int = max_tile_sets
+        """The number of kept tile sets."""
+        self._lock = threading.Lock()
+        self._tile_sets: OrderedDict[str, TileSet] = OrderedDict()
+
+    def clear(self) -> None:
+        """Removes all tile sets."""
+        with self._lock:
+            self._tile_sets.clear()
+
+    def get_tile(
+        self,
+        *,
+        image_version: str,
+        reduction: int,
+        tile_x: int,
+        tile_y: int,
+        get_image: Callable[[], Image.Image],
+    ) -> tuple[bytes, str] | None:
+        """Returns the given encoded tile, which is cut and encoded if it is not cached yet.
+
+        Args:
+            image_version (str): The image's version.
+            reduction (int): The pyramid level's downscaling factor.
+            tile_x (int): The tile's column, starting with 0 at the left.
+            tile_y (int): The tile's row, starting with 0 at the top.
+            get_image (Callable[[], Image.Image]): Returns the full-resolution image of
+             the given version. Is only called if the level is not cached yet.
+
+        Returns:
+            tuple[bytes, str] | None: The encoded tile and its MIME type or None if the
+             tile is outside of the image.
+        """
+        tile_key = (reduction, tile_x, tile_y)
+        with self._lock:
+            tile_set = self._tile_sets.get(image_version)
+            if tile_set is None:
+                tile_set = TileSet()
+                self._tile_sets[image_version] = tile_set
+                while len(self._tile_sets) > self.max_tile_sets:
+                    self._tile_sets.popitem(last=False)
+            self._tile_sets.move_to_end(image_version)
+            if tile_key in tile_set.tiles:
+                return tile_set.tiles[tile_key]
+            level = tile_set.levels.get(reduction)
+        if level is None:
+            level = reduce_image(image=get_image(), reduction=reduction)
+            with self._lock:
+                tile_set.levels[reduction] = level
+
+        left = tile_x * TILE_SIZE
+        upper = tile_y * TILE_SIZE
+        if (
+            (tile_x < 0)
+            or (tile_y < 0)
+            or (left >= level.width)
+            or (upper >= level.height)
+        ):
+            return None
+        box = (
+            left,
+            upper,
+            min(left + TILE_SIZE, level.width),
+            min(upper + TILE_SIZE, level.height),
+        )
+        with g_encode_seconds.time(kind="tile", reduction=str(reduction)):
+            tile = encode_display_image(
+                image=level.crop(box), is_lossless=(reduction == 1)
+            )
+        with self._lock:
+            tile_set.tiles[tile_key] = tile
+        return tile
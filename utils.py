@@ -7,10 +7,42 @@ standardization and more.
 # IMPORTS SECTION #
 import json
 import os
+import threading
 from typing import Any
 
 
 # PUBLIC FUNCTIONS SECTION #
+def atomic_write(*, file_path: str, text: str) -> None:
+    """Writes the given text into the given file so that the file is never left truncated.
+
+    I.e., the text is written into a temporary file in the same folder, which then
+    replaces the given file in one step. If writing fails (e.g., through a crash),
+    the given file keeps its former content. The temporary file is created like any
+    other file, so that the written file gets the usual (umask-dependent) permissions.
+    The file is not synced to disk (see sync_file()).
+
+    Arguments
+    ----------
+    * file_path: str ~ The path of the file that shall be written
+    * text: str ~ The file's new content
+    """
+    folder_path, file_name = os.path.split(os.path.abspath(file_path))
+    # Unique per process and thread, as e.g. batch OCR workers may write the same file
+    temp_file_path = os.path.join(
+        folder_path, f".{file_name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    try:
+        with open(temp_file_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp_file_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_file_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
 def ensure_folder_existence(*, folder_path: str) -> None:
     """Checks if the given folder exists. If not, the folder is created.
 
@@ -69,15 +101,27 @@ def json_load(*, file_path: str) -> Any:
 def json_write(*, file_path: str, json_data: Any) -> None:
     """Writes a JSON file at the given path with the given dictionary as content.
 
+    The file is written atomically, see atomic_write().
+
     Arguments
     ----------
     * path: str ~  The path of the JSON file that shall be written
     * json_data: Any ~ The dictionary or list which shalll be the content of
       the created JSON file
     """
-    json_output = json.dumps(json_data, indent=4)
-    with open(file_path, "w+", encoding="utf-8") as f:
-        f.write(json_output)
+    atomic_write(file_path=file_path, text=json.dumps(json_data, indent=4))
+
+
+def sync_file(*, file_path: str) -> None:
+    """Forces the given file's written content onto the disk (fsync).
+
+    Arguments
+    ----------
+    * file_path: str ~ The path of the file that shall be synced
+    """
+    # Windows only syncs files which are opened for writing
+    with open(file_path, "r+b") as f:
+        os.fsync(f.fileno())
 
 
 def standardize_file_path(*, file_path: str) -> str: